@@ -15,8 +15,9 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 from harvdev_utils.chado_functions import (
-    get_cvterm, check_cvterm_has_prop, check_cvterm_is_allowed, CodingError
+    get_cvterm, preload_cv, set_cvterm_auto_warm, check_cvterm_has_prop, check_cvterm_is_allowed, CodingError
 )
+from harvdev_utils.chado_functions import cvterm as cvterm_module
 conn2 = False
 session = None
 
@@ -106,3 +107,27 @@ class TestSomething:
         cvterm = get_cvterm(session, 'FlyBase miscellaneous CV', 'pheno1')
         with pytest.raises(CodingError):
             allowed = check_cvterm_is_allowed(session, cvterm, ['FBcv:madeupcvterm'])
+
+    def test_preload_cv(self):
+        count = preload_cv(session, ['FlyBase miscellaneous CV'])
+        assert count > 0
+        assert 'pheno1' in cvterm_module.cv_cvterm['FlyBase miscellaneous CV']
+        cvterm = get_cvterm(session, 'FlyBase miscellaneous CV', 'pheno1')
+        assert cvterm.cvterm_id != 0
+        # Already loaded, so nothing more to do.
+        assert preload_cv(session, ['FlyBase miscellaneous CV']) == 0
+        with pytest.raises(CodingError):
+            get_cvterm(session, 'FlyBase miscellaneous CV', 'madeupcvterm')
+
+    def test_auto_warm_and_negative_lookups(self):
+        set_cvterm_auto_warm(True)
+        try:
+            cvterm = get_cvterm(session, 'property type', 'GO_internal_notes')
+            assert cvterm.cvterm_id != 0
+            assert 'property type' in cvterm_module.preloaded_cvs
+        finally:
+            set_cvterm_auto_warm(False)
+        for _ in range(2):
+            with pytest.raises(CodingError):
+                get_cvterm(session, 'SO', 'madeupcvterm')
+        assert 'madeupcvterm' in cvterm_module.cv_cvterm_missing['SO']
@@ -15,10 +15,10 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm.exc import NoResultFound
 
 from harvdev_utils.chado_functions import (
-    get_feature_by_uniquename, feature_name_lookup,
-    feature_symbol_lookup, feature_synonym_lookup,
+    get_feature_by_uniquename, get_features_by_uniquenames, feature_name_lookup,
+    feature_symbol_lookup, feature_synonym_lookup, feature_symbol_batch_lookup,
     get_organism, CodingError, DataError,
-    synonym_name_details, get_cvterm
+    synonym_name_details, get_cvterm, CACHE_MANAGER, SYMBOL_INDEX
 )
 
 from harvdev_utils.chado_functions.get_or_create import get_or_create
@@ -116,6 +116,23 @@ class TestSomething:
         with pytest.raises(NoResultFound):
             get_feature_by_uniquename(session, "Made_Ip", obsolete='t')
 
+    def test_batch_unique_lookup(self):
+        """Test uniquename batch lookups."""
+        features, missing, ambiguous = get_features_by_uniquenames(
+            session, ["FBgn0000001", "FBgn0000002", "FBgn0004500", "Made_Ip", "FBgn0000001"], chunk_size=2)
+        assert sorted(features.keys()) == ["FBgn0000001", "FBgn0000002", "FBgn0004500"]
+        assert features["FBgn0000001"].name == 'symbol-1'
+        assert missing == ["Made_Ip"]
+        assert ambiguous == []
+
+        # obsolete wrong.
+        features, missing, ambiguous = get_features_by_uniquenames(session, ["FBgn0004500"], obsolete='t')
+        assert features == {}
+        assert missing == ["FBgn0004500"]
+
+        with pytest.raises(CodingError):
+            get_features_by_uniquenames(session, ["FBgn0004600"], obsolete='madeup')
+
     def test_name_lookup_good(self):
         """Test name good lookups."""
         # check basic lookup
@@ -188,6 +205,38 @@ class TestSomething:
         feature = feature_symbol_lookup(session, None, 'C9orf72:n.intron14[30GGGGCC]', convert=False)
         assert feature.name == 'C9orf72:n.intron14[30GGGGCC]'
 
+    def test_symbol_batch_lookup(self):
+        """Test symbol batch lookups."""
+        pairs = [('gene', 'symbol-10'), ('gene', 'Hsap\\symbol-2'), ('gene', 'gene_with_&agr;1'),
+                 ('gene', 'made up'), (None, 'symbol-21'), ('gene', 'symbol-10')]
+        features, missing, ambiguous = feature_symbol_batch_lookup(session, pairs)
+        assert features[('gene', 'symbol-10')].name == 'symbol-10'
+        assert features[('gene', 'Hsap\\symbol-2')].name == 'Hsap\\symbol-2'
+        assert features[('gene', 'gene_with_&agr;1')].name == 'gene_with_alpha1'
+        assert features[(None, 'symbol-21')].name == 'symbol-21'
+        assert missing == [('gene', 'made up')]
+        assert ambiguous == []
+
+        with pytest.raises(CodingError):
+            feature_symbol_batch_lookup(session, pairs, obsolete='madeup')
+
+    def test_symbol_index_lookup(self):
+        """Test symbol lookups using the symbol index."""
+        organism = get_organism(session, short='Dmel')
+        assert SYMBOL_INDEX.load(session, ['gene'], organism_ids=[organism.organism_id]) > 0
+        CACHE_MANAGER.clear(['feature_cache'])
+        try:
+            feature = feature_symbol_lookup(session, 'gene', 'symbol-11')
+            assert feature.name == 'symbol-11'
+            assert SYMBOL_INDEX.hits == 1
+
+            # misses still go to the db.
+            with pytest.raises(NoResultFound):
+                feature_symbol_lookup(session, 'gene', 'made up')
+            assert SYMBOL_INDEX.misses == 1
+        finally:
+            SYMBOL_INDEX.disable()
+
     def test_symbol_lookup_bad(self):
         """Test symbol bad lookups."""
         # Lookup non existent symbol
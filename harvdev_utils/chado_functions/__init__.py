@@ -2,8 +2,9 @@
 from .get_or_create import get_or_create
 from .get_create_or_update import get_create_or_update
 from .external_lookups import ExternalLookup
+from .cache_manager import CACHE_MANAGER, CacheManager, LookupCache
 from .cvterm import (
-    get_cvterm, check_cvterm_has_prop, check_cvterm_is_allowed
+    get_cvterm, preload_cv, set_cvterm_auto_warm, check_cvterm_has_prop, check_cvterm_is_allowed
 )
 from .db import (
     get_db, get_dbxref
@@ -14,9 +15,10 @@ from .organism import (
     get_default_organism_id, get_default_organism,
     get_organism
 )
+from .symbol_index import SYMBOL_INDEX, SymbolIndex
 from .feature import (
-    get_feature_by_uniquename, get_feature_and_check_uname_symbol,
-    feature_name_lookup, feature_synonym_lookup, feature_symbol_lookup
+    get_feature_by_uniquename, get_features_by_uniquenames, get_feature_and_check_uname_symbol,
+    feature_name_lookup, feature_synonym_lookup, feature_symbol_lookup, feature_symbol_batch_lookup
 )
 from .general import (
     general_symbol_lookup
@@ -0,0 +1,337 @@
+"""Cache manager for the chado_functions lookup caches.
+
+.. module:: chado_functions.cache_manager
+   :synopsis: Bounded, session-aware caches behind the module level lookup dicts.
+
+The module level caches (cv_cvterm, feature_cache, organism_dict etc) are LookupCache
+objects registered with CACHE_MANAGER. They still act like the dicts they replace,
+including two level ones like cv_cvterm[cv_name][cvterm_name], but:
+
+1) Each cache holds at most max_size entries, dropping the least recently used.
+2) Entries are kept per scope: a session (default) or an engine. Lookup functions
+   call CACHE_MANAGER.bind(session) to switch to that scope's entries, so that ORM
+   objects loaded by one session are never handed to another, while switching
+   back and forth between sessions keeps each one's entries. A scope's entries go
+   when its session (or engine) is garbage collected.
+3) A rollback of a bound session (including a savepoint) empties its scope's
+   caches, as objects added in the rolled back transaction are no longer valid.
+   Caches can also be set to empty on commit, or when new objects of some
+   class are flushed (see clear_on_new).
+
+i.e.
+    CACHE_MANAGER.configure(max_sizes={'feature_cache': 50000})
+    CACHE_MANAGER.stats()
+"""
+from collections import OrderedDict
+from collections.abc import MutableMapping
+import weakref
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm.session import Session
+
+# Key of plain (single level) entries, to keep them apart from section entries.
+_TOP_LEVEL = object()
+
+
+class CacheSection(MutableMapping):
+    """Second level of a nested LookupCache, i.e. cv_cvterm[cv_name]."""
+
+    def __init__(self, cache: 'LookupCache', section: Any):
+        """Initialise a view of one section of a cache."""
+        self.cache = cache
+        self.section = section
+
+    def __getitem__(self, key: Any) -> Any:
+        return self.cache._get((self.section, key))
+
+    def __setitem__(self, key: Any, value: Any):
+        self.cache._set((self.section, key), value)
+
+    def __delitem__(self, key: Any):
+        self.cache._delete((self.section, key))
+
+    def __iter__(self) -> Iterator:
+        return iter([key for section, key in self.cache._entries if section == self.section])
+
+    def __len__(self) -> int:
+        return self.cache._section_counts.get(self.section, 0)
+
+    def __contains__(self, key: Any) -> bool:
+        return (self.section, key) in self.cache._entries
+
+
+class LookupCache(MutableMapping):
+    """Bounded LRU cache, usable as a dict (or dict of dicts if nested)."""
+
+    def __init__(self, name: str, max_size: Optional[int] = None, nested: bool = False,
+                 clear_on_rollback: bool = True, clear_on_commit: bool = False):
+        """Initialise cache.
+
+        name: (str) - name to register the cache under i.e. 'cv_cvterm'.
+        max_size: <optional> (int) - max number of entries per scope (None for no limit).
+        nested: (bool) - if True, dict values are stored as sections i.e. cache[type][name].
+        clear_on_rollback/clear_on_commit: (bool) - empty the cache on these session events.
+        """
+        self.name = name
+        self.max_size = max_size
+        self.nested = nested
+        self.clear_on_rollback = clear_on_rollback
+        self.clear_on_commit = clear_on_commit
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict = OrderedDict()  # For the current scope.
+        self._section_counts: Dict[Any, int] = {}
+        self._scopes: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()  # scope object => (entries, section counts)
+        self._evict_callbacks: List[Callable] = []
+
+    def on_evict(self, callback: Callable):
+        """Call callback(key) when an entry is dropped to keep within max_size.
+
+        key is (section, key) for section entries, else the plain key.
+        """
+        self._evict_callbacks.append(callback)
+
+    # Internal entry handling. Entries are keyed by (section, key), section being _TOP_LEVEL for plain entries.
+    def _get(self, entry_key: tuple) -> Any:
+        try:
+            value = self._entries[entry_key]
+        except KeyError:
+            self.misses += 1
+            raise KeyError(entry_key[1])
+        self._entries.move_to_end(entry_key)
+        self.hits += 1
+        return value
+
+    def _set(self, entry_key: tuple, value: Any):
+        if entry_key in self._entries:
+            self._entries.move_to_end(entry_key)
+        elif entry_key[0] is not _TOP_LEVEL:
+            self._section_counts[entry_key[0]] = self._section_counts.get(entry_key[0], 0) + 1
+        self._entries[entry_key] = value
+        if self.max_size is not None and len(self._entries) > self.max_size:
+            self._trim()
+
+    def _trim(self):
+        """Drop least recently used entries until within max_size."""
+        while len(self._entries) > self.max_size:
+            old_key, old_value = self._entries.popitem(last=False)
+            self._forget(old_key)
+            self.evictions += 1
+            for callback in self._evict_callbacks:
+                callback(old_key[1] if old_key[0] is _TOP_LEVEL else old_key)
+
+    def _delete(self, entry_key: tuple):
+        try:
+            del self._entries[entry_key]
+        except KeyError:
+            raise KeyError(entry_key[1])
+        self._forget(entry_key)
+
+    def _forget(self, entry_key: tuple):
+        """Update section counts for a removed entry (empty sections are kept, like empty dicts)."""
+        if entry_key[0] is not _TOP_LEVEL:
+            self._section_counts[entry_key[0]] -= 1
+
+    # dict interface.
+    def __getitem__(self, key: Any) -> Any:
+        if (_TOP_LEVEL, key) in self._entries:
+            return self._get((_TOP_LEVEL, key))
+        if key in self._section_counts:
+            return CacheSection(self, key)
+        self.misses += 1
+        raise KeyError(key)
+
+    def __setitem__(self, key: Any, value: Any):
+        if self.nested and isinstance(value, dict):
+            # As for a dict of dicts, this replaces any existing section.
+            if key in self._section_counts:
+                del self[key]
+            self._section_counts[key] = 0
+            for sub_key, sub_value in value.items():
+                self._set((key, sub_key), sub_value)
+        else:
+            self._set((_TOP_LEVEL, key), value)
+
+    def __delitem__(self, key: Any):
+        if key in self._section_counts:
+            for entry_key in [i for i in self._entries if i[0] == key]:
+                del self._entries[entry_key]
+            del self._section_counts[key]
+        else:
+            self._delete((_TOP_LEVEL, key))
+
+    def __contains__(self, key: Any) -> bool:
+        return (_TOP_LEVEL, key) in self._entries or key in self._section_counts
+
+    def __iter__(self) -> Iterator:
+        keys = [key for section, key in self._entries if section is _TOP_LEVEL]
+        return iter(keys + list(self._section_counts))
+
+    def __len__(self) -> int:
+        return len(self._entries) - sum(self._section_counts.values()) + len(self._section_counts)
+
+    def clear(self):
+        """Empty the cache (for the current scope)."""
+        self._entries.clear()
+        self._section_counts.clear()
+
+    # Scopes (see CacheManager.bind).
+    def _use_scope(self, scope_object: Any):
+        """Switch to the entries for a scope (a session or engine), new if not seen before."""
+        if scope_object not in self._scopes:
+            self._scopes[scope_object] = (OrderedDict(), {})
+        self._entries, self._section_counts = self._scopes[scope_object]
+
+    def _clear_scope(self, scope_object: Any):
+        """Empty the cache for a scope, current or not."""
+        if scope_object in self._scopes:
+            entries, section_counts = self._scopes[scope_object]
+            entries.clear()
+            section_counts.clear()
+
+    def _trim_all_scopes(self):
+        current = (self._entries, self._section_counts)
+        for scope_object in list(self._scopes):
+            self._use_scope(scope_object)
+            self._trim()
+        self._entries, self._section_counts = current
+        self._trim()
+
+    def _clear_all_scopes(self):
+        self.clear()
+        for scope_object in list(self._scopes):
+            self._clear_scope(scope_object)
+
+    def __repr__(self) -> str:
+        return '<LookupCache {}: {} entries, max {}>'.format(self.name, len(self._entries), self.max_size)
+
+
+class CacheManager(object):
+    """Registry of LookupCaches, tied to the current session or engine."""
+
+    def __init__(self):
+        """Initialise with no caches, scoped by session."""
+        self.caches: Dict[str, LookupCache] = {}
+        self.scope = 'session'
+        self._scope_ref: Optional[weakref.ref] = None
+        self._listened_sessions: weakref.WeakSet = weakref.WeakSet()
+        self._new_object_rules: List[tuple] = []  # (model class, cache names to empty)
+        self._transaction_end_callbacks: List[Callable] = []
+        self._flush_callbacks: List[Callable] = []
+
+    def register(self, name: str, max_size: Optional[int] = None, nested: bool = False,
+                 clear_on_rollback: bool = True, clear_on_commit: bool = False) -> LookupCache:
+        """Make and register a new cache (see LookupCache for args)."""
+        if name in self.caches:
+            raise ValueError("HarvdevError: cache '{}' is already registered.".format(name))
+        cache = LookupCache(name, max_size=max_size, nested=nested,
+                            clear_on_rollback=clear_on_rollback, clear_on_commit=clear_on_commit)
+        if self._scope_ref is not None and self._scope_ref() is not None:
+            cache._use_scope(self._scope_ref())
+        self.caches[name] = cache
+        return cache
+
+    def clear_on_new(self, model: type, names: List[str]):
+        """Empty the named caches when new objects of a model class are flushed in a bound session.
+
+        i.e. negative lookup caches, that a newly created object would make wrong.
+        """
+        self._new_object_rules.append((model, names))
+
+    def on_transaction_end(self, callback: Callable):
+        """Call callback(session) after a commit or rollback in any bound session, in scope or not.
+
+        Savepoints (begin_nested) being released or rolled back are not counted.
+        i.e. to drop data that is kept across scopes, like SYMBOL_INDEX.
+        """
+        self._transaction_end_callbacks.append(callback)
+
+    def on_flush(self, callback: Callable):
+        """Call callback(session) after a flush in any bound session, in scope or not.
+
+        session.new, session.dirty and session.deleted still list the objects flushed.
+        """
+        self._flush_callbacks.append(callback)
+
+    def configure(self, scope: Optional[str] = None, max_sizes: Optional[Dict[str, Optional[int]]] = None):
+        """Change scoping and/or cache size limits.
+
+        scope: <optional> (str) - 'session' or 'engine'.
+               Only use 'engine' for several sessions that never share ORM objects.
+        max_sizes: <optional> (dict) - cache name => max number of entries (None for no limit).
+        """
+        if scope is not None:
+            if scope not in ('session', 'engine'):
+                raise ValueError("HarvdevError: cache scope must be 'session' or 'engine', not '{}'.".format(scope))
+            if scope != self.scope:
+                self.scope = scope
+                self._scope_ref = None
+                for cache in self.caches.values():
+                    cache._scopes.clear()
+                    cache._entries, cache._section_counts = OrderedDict(), {}
+        for name, max_size in (max_sizes or {}).items():
+            cache = self.caches[name]
+            cache.max_size = max_size
+            if max_size is not None:
+                cache._trim_all_scopes()
+
+    def bind(self, session: Session):
+        """Make the caches use the entries for this session (or its engine), kept from any earlier use."""
+        scope_object = self._scope_object(session)
+        if self._scope_ref is None or self._scope_ref() is not scope_object:
+            for cache in self.caches.values():
+                cache._use_scope(scope_object)
+            self._scope_ref = weakref.ref(scope_object)
+        if session not in self._listened_sessions:
+            event.listen(session, 'after_soft_rollback', self._after_rollback)
+            event.listen(session, 'after_commit', self._after_commit)
+            event.listen(session, 'after_flush', self._after_flush)
+            self._listened_sessions.add(session)
+
+    def _scope_object(self, session: Session) -> Any:
+        return session if self.scope == 'session' else session.get_bind()
+
+    def _clear_scope(self, session: Session, names: List[str]):
+        """Empty the named caches for the scope of a session."""
+        scope_object = self._scope_object(session)
+        for name in names:
+            self.caches[name]._clear_scope(scope_object)
+
+    def _after_rollback(self, session: Session, previous_transaction: Any):
+        self._clear_scope(session, [name for name, cache in self.caches.items() if cache.clear_on_rollback])
+        if not previous_transaction.nested:
+            for callback in self._transaction_end_callbacks:
+                callback(session)
+
+    def _after_commit(self, session: Session):
+        self._clear_scope(session, [name for name, cache in self.caches.items() if cache.clear_on_commit])
+        # Also called when a savepoint is released.
+        if not session.in_nested_transaction():
+            for callback in self._transaction_end_callbacks:
+                callback(session)
+
+    def _after_flush(self, session: Session, flush_context: Any):
+        for model, names in self._new_object_rules:
+            if any(isinstance(obj, model) for obj in session.new):
+                self._clear_scope(session, names)
+        for callback in self._flush_callbacks:
+            callback(session)
+
+    def clear(self, names: Optional[List[str]] = None):
+        """Empty the named caches (default all), for all scopes."""
+        for name in names if names is not None else list(self.caches):
+            self.caches[name]._clear_all_scopes()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return cache name => dict of entries (for the current scope), max_size, hits, misses and evictions."""
+        return {
+            name: {'entries': len(cache._entries), 'max_size': cache.max_size, 'hits': cache.hits,
+                   'misses': cache.misses, 'evictions': cache.evictions}
+            for name, cache in self.caches.items()
+        }
+
+
+# The manager for all chado_functions lookup caches.
+CACHE_MANAGER = CacheManager()
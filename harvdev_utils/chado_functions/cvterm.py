@@ -5,26 +5,52 @@ Store easy lookup for Cvterm lookups and related methods.
 from sqlalchemy.orm.exc import NoResultFound
 
 from .chado_errors import CodingError
+from .cache_manager import CACHE_MANAGER
 from harvdev_utils.production import (
     Cv, Cvterm, Cvtermprop, Db, Dbxref
 )
 from sqlalchemy.orm.session import Session
-from typing import Union, Any
-
-# Caches
-cv_cvterm: dict = {}
-cvterm_id_to_props: dict = {}         # i.e. 123 => ['clone_qualifier', 'envoronment_qualifier']
+from typing import Union, Any, Iterable
+
+# Caches (see cache_manager)
+cv_cvterm = CACHE_MANAGER.register('cv_cvterm', max_size=50000, nested=True)
+# cv name => cvterm names not there.
+cv_cvterm_missing = CACHE_MANAGER.register('cv_cvterm_missing', max_size=50000, nested=True, clear_on_commit=True)
+# cv names with all non-obsolete cvterms in cv_cvterm; misses need no lookup.
+preloaded_cvs = CACHE_MANAGER.register('preloaded_cvs', clear_on_commit=True)
+# Cvterms created in the session (or committed) may be missing from both, so these are emptied then.
+CACHE_MANAGER.clear_on_new(Cvterm, ['cv_cvterm_missing', 'preloaded_cvs'])
+# A preloaded cv is no longer complete once any of its cvterms is dropped from cv_cvterm.
+cv_cvterm.on_evict(lambda key: preloaded_cvs.pop(key[0], None))
+auto_warm: bool = False               # If True, a miss in a cv loads the whole cv (see set_cvterm_auto_warm)
+cvterm_id_to_props = CACHE_MANAGER.register('cvterm_id_to_props', max_size=50000)  # i.e. 123 => ['clone_qualifier', 'envoronment_qualifier']
 db_propname_to_cvterm_ids: dict = {}  # i.e  FBcv:environment => Set cvterm_ids i.e. [123, 124]
 retained: dict = {}                   # Special name to all cvterm_id's for that as a Set
 
 
 def get_cvterm(session: Session, cv_name: str, cvterm_name: str) -> Cvterm:
-    """Lookup cvterm."""
+    """Lookup cvterm.
+
+    Repeated lookups, including those that fail, are answered from the cache.
+    With auto warm on (see set_cvterm_auto_warm), the first miss in a cv loads the whole cv (see preload_cv).
+    Failed lookups are forgotten when cvterms are created in the session, and on commit.
+    The cache (like all CACHE_MANAGER caches) is kept per session, unless
+    CACHE_MANAGER.configure(scope='engine') is set.
+    """
     global cv_cvterm
+    CACHE_MANAGER.bind(session)
     try:
         return cv_cvterm[cv_name][cvterm_name]
     except KeyError:
         pass
+    if auto_warm and cv_name not in preloaded_cvs:
+        preload_cv(session, [cv_name])
+        if cvterm_name in cv_cvterm[cv_name]:
+            return cv_cvterm[cv_name][cvterm_name]
+    known_missing = cv_name in preloaded_cvs or (cv_name in cv_cvterm_missing and cvterm_name in cv_cvterm_missing[cv_name])
+    # A new cvterm not yet flushed may be the one wanted: the query below flushes it first.
+    if known_missing and not any(isinstance(obj, Cvterm) for obj in session.new):
+        raise CodingError("HarvdevError: Could not find cv '{}', cvterm '{}'.".format(cv_name, cvterm_name))
     try:
         cvterm = session.query(Cvterm).join(Cv).\
             filter(Cvterm.name == cvterm_name,
@@ -34,9 +60,52 @@ def get_cvterm(session: Session, cv_name: str, cvterm_name: str) -> Cvterm:
             cv_cvterm[cv_name] = {}
         cv_cvterm[cv_name][cvterm_name] = cvterm
     except NoResultFound:
+        if cv_name not in cv_cvterm_missing:
+            cv_cvterm_missing[cv_name] = {}
+        cv_cvterm_missing[cv_name][cvterm_name] = True
         raise CodingError("HarvdevError: Could not find cv '{}', cvterm '{}'.".format(cv_name, cvterm_name))
     return cv_cvterm[cv_name][cvterm_name]
 
+
+def preload_cv(session: Session, cv_names: Iterable[str]) -> int:
+    """Load all non-obsolete cvterms of some cvs into the get_cvterm cache, in one query.
+
+    After this, get_cvterm lookups in these cvs need no queries, including for
+    cvterms that are not there. This lasts until a commit, rollback or cvterm creation,
+    and for cvterms found until a rollback; with the default 'session' cache scope,
+    only for this session.
+
+    cv_names: (list) - cv names i.e. ['SO', 'FlyBase miscellaneous CV', 'synonym type']
+
+    Return the number of cvterms loaded.
+    """
+    CACHE_MANAGER.bind(session)
+    cv_names = [cv_name for cv_name in cv_names if cv_name not in preloaded_cvs]
+    if not cv_names:
+        return 0
+    count = 0
+    for cv_name in cv_names:
+        if cv_name not in cv_cvterm:
+            cv_cvterm[cv_name] = {}
+        # Marked first, so that it is unmarked if the cache is too small to hold the whole cv.
+        preloaded_cvs[cv_name] = True
+    cvterms = session.query(Cvterm, Cv.name).join(Cv).\
+        filter(Cv.name.in_(cv_names),
+               Cvterm.is_obsolete == 0).all()
+    for cvterm, cv_name in cvterms:
+        cv_cvterm[cv_name][cvterm.name] = cvterm
+        count += 1
+    return count
+
+
+def set_cvterm_auto_warm(on: bool = True):
+    """Set whether a get_cvterm miss in a cv loads the whole cv (with preload_cv), rather than just the one cvterm.
+
+    Worth it for bulk loads that look up many cvterms from the same few cvs.
+    """
+    global auto_warm
+    auto_warm = on
+
 ########################
 # cvterm props functions
 ########################
@@ -51,6 +120,7 @@ def check_cvterm_has_prop(session: Session, cvterm: Cvterm, prop_value: str) ->
     Return True or False depending on wether it was found or not.
     """
     global cvterm_id_to_props
+    CACHE_MANAGER.bind(session)
     found = False
     cvterm_id = cvterm.cvterm_id
     if cvterm.cvterm_id in cvterm_id_to_props:
@@ -83,6 +153,7 @@ def check_cvterm_is_allowed(session: Session, cvterm: Cvterm, list_of_props: lis
                                  or does not find any cvterms (Useless addition).
     """
     global db_propname_to_cvterm_ids, retained
+    CACHE_MANAGER.bind(session)
 
     # create retained values for list of props
     if not retain_name:
@@ -3,14 +3,16 @@
 from ..production import Db, Dbxref
 from sqlalchemy.orm.exc import NoResultFound
 from .chado_errors import CodingError, DataError
+from .cache_manager import CACHE_MANAGER
 from sqlalchemy.orm.session import Session
 
-db_dict: dict = {}
+db_dict = CACHE_MANAGER.register('db_dict', max_size=10000)
 
 
 def get_db(session: Session, db_name: str):
     """Lookup db chado object given name."""
     global db_dict
+    CACHE_MANAGER.bind(session)
     try:
         return db_dict[db_name]
     except KeyError:
@@ -15,10 +15,12 @@ from harvdev_utils.chado_functions import (
     get_cvterm, DataError, CodingError,
     get_default_organism_id, synonym_name_details
 )
+from harvdev_utils.chado_functions.cache_manager import CACHE_MANAGER
+from harvdev_utils.chado_functions.symbol_index import SYMBOL_INDEX
 
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 from sqlalchemy.orm.session import Session
-from typing import Any, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 import logging
 log = logging.getLogger(__name__)
 
@@ -30,14 +32,15 @@ log = logging.getLogger(__name__)
 #       not want to risk overwritting/using wrong one.
 #       Symbol should be unique for a type.
 #
-feature_cache: dict = {}
+feature_cache = CACHE_MANAGER.register('feature_cache', max_size=200000, nested=True)
 
 # feature type cache.
-feature_type_cache: dict = {}
+feature_type_cache = CACHE_MANAGER.register('feature_type_cache', max_size=1000)
 
 
 def feature_type_lookup(session: Session, type_name: str):
     """Lookup feature type cvterm."""
+    CACHE_MANAGER.bind(session)
     if type_name in feature_type_cache:
         return feature_type_cache[type_name]
 
@@ -93,6 +96,7 @@ def get_feature_by_uniquename(session: Session, uniquename: str, type_name: str
 
        CodingError: obsolete not set to one of allowed values,
     """
+    CACHE_MANAGER.bind(session)
     feature = None
     check_obs = _check_obsolete(obsolete)
     if not type_name and not organism_id:
@@ -117,6 +121,76 @@ def get_feature_by_uniquename(session: Session, uniquename: str, type_name: str
     return feature
 
 
+def get_features_by_uniquenames(session: Session, uniquenames: Iterable[str], type_name: str = None,
+                                organism_id: int = None, obsolete: str = 'f',
+                                chunk_size: int = 1000) -> Tuple[Dict[str, Feature], List[str], List[str]]:
+    """Get features for many uniquenames, with a query per chunk of uniquenames rather than per uniquename.
+
+    Batch version of get_feature_by_uniquename: the same filters and cache, but
+    uniquenames that would raise an error there are returned in lists instead.
+
+    Args:
+        session (sqlalchemy.orm.session.Session object): db connection  to use.
+
+        uniquenames (list): feature uniquenames i.e. ['FBgn0000490', 'FBal0000001'].
+
+        type_name (str) : <optional> cvterm name for the type of feature.
+
+        organism_id (int): <optional> chado organism_id.
+
+        obsolete ('t', 'f', 'e'): <optional> is feature obsolete
+                                  t = true
+                                  f = false (default)
+                                  e = either not fussed.
+
+        chunk_size (int): <optional> max number of uniquenames per query.
+
+    Returns:
+        Tuple of: dict of uniquename => Feature object;
+                  list of uniquenames not found (NoResultFound in get_feature_by_uniquename);
+                  list of uniquenames found more than once (MultipleResultsFound).
+
+    Raises:
+       CodingError: obsolete not set to one of allowed values,
+    """
+    CACHE_MANAGER.bind(session)
+    check_obs = _check_obsolete(obsolete)
+    features: Dict[str, Feature] = {}
+    to_lookup = []
+    for uniquename in dict.fromkeys(uniquenames):  # unique, in order
+        if type_name and type_name in feature_cache and uniquename in feature_cache[type_name]:
+            features[uniquename] = feature_cache[type_name][uniquename]
+        else:
+            to_lookup.append(uniquename)
+
+    filter_spec: Any = ()
+    if check_obs:
+        filter_spec += (Feature.is_obsolete == obsolete,)
+    if organism_id:
+        filter_spec += (Feature.organism_id == organism_id,)
+    if type_name:
+        feature_type = feature_type_lookup(session, type_name)
+        filter_spec += (Feature.type_id == feature_type.cvterm_id,)
+
+    found: Dict[str, List[Feature]] = {}
+    for start in range(0, len(to_lookup), chunk_size):
+        chunk = to_lookup[start:start + chunk_size]
+        for feature in session.query(Feature).filter(Feature.uniquename.in_(chunk), *filter_spec):
+            found.setdefault(feature.uniquename, []).append(feature)
+
+    missing = []
+    ambiguous = []
+    for uniquename in to_lookup:
+        if uniquename not in found:
+            missing.append(uniquename)
+        elif len(found[uniquename]) > 1:
+            ambiguous.append(uniquename)
+        else:
+            features[uniquename] = found[uniquename][0]
+            add_to_cache(features[uniquename])
+    return features, missing, ambiguous
+
+
 def get_feature_and_check_uname_symbol(session: Session, uniquename: str, synonym: str, type_name: str = "", organism_id: Optional[int] = None):
     """Fetch the feature and check the symbol.
 
@@ -147,6 +221,7 @@ def get_feature_and_check_uname_symbol(session: Session, uniquename: str, synony
     Raises:
         DataError: if feature cannot be found uniquely.
     """
+    CACHE_MANAGER.bind(session)
     try:
         feature = get_feature_by_uniquename(session, uniquename, type_name=type_name, organism_id=organism_id)
         add_to_cache(feature)
@@ -203,6 +278,7 @@ def feature_name_lookup(session: Session, name: str, organism_id: Optional[int]
     Raises:
         DataError: if feature not found uniquely.
     """
+    CACHE_MANAGER.bind(session)
     check_obs = _check_obsolete(obsolete)
     if type_name and type_id:
         raise CodingError("Cannot specify type_name and type_id")
@@ -259,6 +335,9 @@ def feature_synonym_lookup(session: Session, type_name: str, synonym_name: str,
 
         is_current (str or None): feature synonym  t= True, f =False, None = no test
 
+    If SYMBOL_INDEX is loaded for the type and organism, unique current symbols are found
+    there (for check_unique, is_current 't' and non obsolete features only).
+
     Returns:
         List of feature objects or Feature depending on check_unique.
 
@@ -267,6 +346,7 @@ def feature_synonym_lookup(session: Session, type_name: str, synonym_name: str,
                    If feature cannot be found uniquely.
 
     """
+    CACHE_MANAGER.bind(session)
     check_obs = _check_obsolete(obsolete)
 
     # Default to Dros if not organism specified.
@@ -280,6 +360,13 @@ def feature_synonym_lookup(session: Session, type_name: str, synonym_name: str,
     if type_name in feature_cache and synonym_sgml in feature_cache[type_name]:
         return feature_cache[type_name][synonym_sgml]
 
+    # Check symbol index (only has unique current symbols of non obsolete features).
+    if check_unique and is_current in ('t', True) and obsolete == 'f' and not ignore_org and \
+            (cv_name, cvterm_name) == ('synonym type', 'symbol'):
+        feature = _symbol_index_lookup(session, type_name, organism_id, synonym_sgml)
+        if feature:
+            return feature
+
     # get feature type expected from type_name
     feature_type = feature_type_lookup(session, type_name)
     synonym_type = get_cvterm(session, cv_name, cvterm_name)
@@ -354,6 +441,9 @@ def feature_symbol_lookup(session: Session, type_name: str, synonym_name: str, o
     ONLY replace cvterm_name and cv_name if you know what exactly you are doing.
     symbol lookups are kind of special and initialized here for ease of use.
 
+    If SYMBOL_INDEX is loaded for the type and organism, unique symbols are found
+    there and only the feature itself is fetched (see chado_functions.symbol_index).
+
     Returns:
         Feature object or list of feature object if check_unique is passed as False.
 
@@ -362,6 +452,7 @@ def feature_symbol_lookup(session: Session, type_name: str, synonym_name: str, o
 
         MultipleResultsFound: If more than one feature found matching the synonym.
     """
+    CACHE_MANAGER.bind(session)
     # Default to Dros if not organism specified.
     if not organism_id:
         organism, plain_name, synonym_sgml = synonym_name_details(session, synonym_name)
@@ -376,6 +467,12 @@ def feature_symbol_lookup(session: Session, type_name: str, synonym_name: str, o
     if type_name in feature_cache and synonym_sgml in feature_cache[type_name]:
         return feature_cache[type_name][synonym_sgml]
 
+    # Check symbol index (only has unique current symbols of non obsolete features).
+    if check_unique and obsolete == 'f' and not ignore_org and (cv_name, cvterm_name) == ('synonym type', 'symbol'):
+        feature = _symbol_index_lookup(session, type_name, organism_id, synonym_sgml)
+        if feature:
+            return feature
+
     synonym_type = get_cvterm(session, cv_name, cvterm_name)
     check_obs = _check_obsolete(obsolete)
     filter_spec: Any = (Synonym.type_id == synonym_type.cvterm_id,
@@ -403,6 +500,21 @@ def feature_symbol_lookup(session: Session, type_name: str, synonym_name: str, o
     return feature
 
 
+def _symbol_index_lookup(session: Session, type_name: str, organism_id: int, synonym_sgml: str) -> Optional[Feature]:
+    """Get feature from SYMBOL_INDEX (if loaded for this type and organism) and add it to the cache.
+
+    Returns None if the symbol is not indexed uniquely, so the caller should query the db.
+    """
+    feature_id = SYMBOL_INDEX.probe(session, organism_id, type_name, synonym_sgml)
+    if feature_id is None:
+        return None
+    # By primary key, so from the session identity map if already loaded.
+    feature = session.query(Feature).get(feature_id)
+    if feature:
+        add_to_cache(feature, synonym_sgml)
+    return feature
+
+
 def _simple_uniquename_lookup(session: Session, uniquename: str, obsolete: str = 'f'):
     """
     Lookup feature by uniquename only. Will probably work most times.
@@ -434,3 +546,103 @@ def _check_obsolete(obsolete: str) -> bool:
     elif obsolete != 't' and obsolete != 'f':
         raise CodingError("If specifed obsolete must be 't', 'f' or 'e'")
     return check_obs
+
+
+def feature_symbol_batch_lookup(session: Session, type_symbols: Iterable[Tuple[Optional[str], str]], organism_id: Optional[int] = None,
+                                cv_name: str = 'synonym type', cvterm_name: str = 'symbol', obsolete: str = 'f',
+                                convert: bool = True, ignore_org: bool = False,
+                                chunk_size: int = 1000) -> Tuple[Dict[Tuple, Feature], List[Tuple], List[Tuple]]:
+    """Lookup features for many (type_name, symbol) pairs, with a query per organism and type rather than per symbol.
+
+    Batch version of feature_symbol_lookup (with check_unique): the same symbol
+    conversion, filters and cache, but pairs that would raise an error there are
+    returned in lists instead.
+
+    Args:
+        session (sqlalchemy.orm.session.Session object): db connection  to use.
+
+        type_symbols (list): (type_name, symbol) tuples i.e. [('gene', 'wg'), ('allele', 'wg[1]')]
+                             type_name can be None, as for feature_symbol_lookup.
+
+        organism_id (int): <optional> chado organism_id.
+                           If not given the organism comes from each symbol (default Dmel).
+
+        cv_name, cvterm_name, obsolete, convert, ignore_org: <optional> as for feature_symbol_lookup.
+
+        chunk_size (int): <optional> max number of symbols per query.
+
+    Returns:
+        Tuple of: dict of (type_name, symbol) => Feature object, for those found uniquely;
+                  list of (type_name, symbol) not found (NoResultFound in feature_symbol_lookup);
+                  list of (type_name, symbol) found for more than one feature (MultipleResultsFound).
+
+    Raises:
+       CodingError: obsolete not set to one of allowed values,
+    """
+    CACHE_MANAGER.bind(session)
+    check_obs = _check_obsolete(obsolete)
+    synonym_type = get_cvterm(session, cv_name, cvterm_name)
+
+    use_index = obsolete == 'f' and not ignore_org and (cv_name, cvterm_name) == ('synonym type', 'symbol')
+
+    # Convert all symbols, and group those not in the cache (or symbol index) by organism and type.
+    features: Dict[Tuple, Feature] = {}
+    groups: Dict[Tuple, Dict[str, List[Tuple]]] = {}  # (organism_id, type_name) => synonym_sgml => input pairs
+    input_order = {pair: index for index, pair in enumerate(dict.fromkeys(type_symbols))}  # unique, in order
+    for type_name, symbol in input_order:
+        this_organism_id = organism_id
+        if not organism_id:
+            organism, plain_name, synonym_sgml = synonym_name_details(session, symbol)
+            this_organism_id = organism.organism_id
+        else:
+            synonym_sgml = sgml_to_unicode(sub_sup_to_sgml(symbol))
+        if not convert:
+            synonym_sgml = symbol
+        if type_name in feature_cache and synonym_sgml in feature_cache[type_name]:
+            features[(type_name, symbol)] = feature_cache[type_name][synonym_sgml]
+            continue
+        if use_index:
+            feature = _symbol_index_lookup(session, type_name, this_organism_id, synonym_sgml)
+            if feature:
+                features[(type_name, symbol)] = feature
+                continue
+        group_key = (None if ignore_org else this_organism_id, type_name)
+        groups.setdefault(group_key, {}).setdefault(synonym_sgml, []).append((type_name, symbol))
+
+    missing = []
+    ambiguous = []
+    for (this_organism_id, type_name), sgml_pairs in groups.items():
+        filter_spec: Any = (Synonym.type_id == synonym_type.cvterm_id,
+                            FeatureSynonym.is_current == 't')
+        if not ignore_org:
+            filter_spec += (Feature.organism_id == this_organism_id,)
+        if check_obs:
+            filter_spec += (Feature.is_obsolete == obsolete,)
+        if not type_name or type_name == 'gene':
+            filter_spec += (~Feature.uniquename.contains('FBog'),)
+        if type_name:
+            feature_type = feature_type_lookup(session, type_name)
+            filter_spec += (Feature.type_id == feature_type.cvterm_id,)
+
+        found: Dict[str, Dict[int, Feature]] = {}  # synonym_sgml => feature_id => Feature
+        synonym_sgmls = list(sgml_pairs.keys())
+        for start in range(0, len(synonym_sgmls), chunk_size):
+            chunk = synonym_sgmls[start:start + chunk_size]
+            results = session.query(Feature, Synonym.synonym_sgml).join(FeatureSynonym).join(Synonym).\
+                filter(Synonym.synonym_sgml.in_(chunk), *filter_spec)
+            for feature, synonym_sgml in results:
+                found.setdefault(synonym_sgml, {})[feature.feature_id] = feature
+
+        for synonym_sgml, pairs in sgml_pairs.items():
+            if synonym_sgml not in found:
+                missing.extend(pairs)
+            elif len(found[synonym_sgml]) > 1:
+                ambiguous.extend(pairs)
+            else:
+                feature = list(found[synonym_sgml].values())[0]
+                add_to_cache(feature, synonym_sgml)
+                for pair in pairs:
+                    features[pair] = feature
+    missing.sort(key=input_order.get)
+    ambiguous.sort(key=input_order.get)
+    return features, missing, ambiguous
@@ -4,6 +4,7 @@ from harvdev_utils.chado_functions import (
     get_cvterm,  DataError, CodingError
 )
 from harvdev_utils.production.production import Cvterm
+from harvdev_utils.chado_functions.cache_manager import CACHE_MANAGER
 from sqlalchemy.orm.session import Session
 from typing import Optional, Union
 from harvdev_utils.production import (
@@ -19,10 +20,10 @@ from typing import Any
 #       not want to risk overwritting/using wrong one.
 #       Symbol should be unique for a type.
 #
-general_cache: dict = {}
+general_cache = CACHE_MANAGER.register('general_cache', max_size=200000, nested=True)
 
 # feature type cache.
-general_type_cache: dict = {}
+general_type_cache = CACHE_MANAGER.register('general_type_cache', max_size=1000)
 
 GeneralObjects = Union[Grp, CellLine]
 SynObjects = Union[GrpSynonym, CellLineSynonym]
@@ -30,6 +31,7 @@ SynObjects = Union[GrpSynonym, CellLineSynonym]
 
 def general_type_lookup(session: Session, type_name: str) -> Cvterm:
     """Lookup type cvterm."""
+    CACHE_MANAGER.bind(session)
     if type_name in general_type_cache:
         return general_type_cache[type_name]
 
@@ -99,6 +101,7 @@ def general_symbol_lookup(session: Session, sql_object_type: GeneralObjects,
         synonym_sgml = synonym_name
 
     # Check cache
+    CACHE_MANAGER.bind(session)
     if type_name in general_cache and synonym_sgml in general_cache[type_name]:
         return general_cache[type_name][synonym_sgml]
 
@@ -8,6 +8,7 @@
 
 from harvdev_utils.production import Organism
 from harvdev_utils.chado_functions import CodingError
+from harvdev_utils.chado_functions.cache_manager import CACHE_MANAGER
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.orm.session import Session
 from typing import Optional
@@ -16,7 +17,7 @@ from typing import Optional
 # store as the abbreviation i.e ['Dmel']
 #                           and ['Drosphila']['melanogastor']
 # to enable more flexibility. No much memory used, so should be fine.
-organism_dict: dict = {}
+organism_dict = CACHE_MANAGER.register('organism_dict', max_size=10000, nested=True)
 
 
 def get_default_organism_id(session: Session) -> int:
@@ -29,6 +30,7 @@ def get_default_organism_id(session: Session) -> int:
         organism_id (internal chado id).
     """
     global organism_dict
+    CACHE_MANAGER.bind(session)
 
     if 'Dmel' not in organism_dict:
         get_default_organism(session)
@@ -45,6 +47,7 @@ def get_default_organism(session: Session) -> Organism:
         organism object.
     """
     global organism_dict
+    CACHE_MANAGER.bind(session)
 
     if 'Dmel' not in organism_dict:
         get_organism(session, short='Dmel')
@@ -76,6 +79,7 @@ def get_organism(session: Session, short: Optional[str] = "", genus: Optional[st
 
     """
     global organism_dict
+    CACHE_MANAGER.bind(session)
     if not short and not (genus and species):
         raise CodingError("HarvdevError: get organism called with no short or (genus and species) specified")
 
@@ -0,0 +1,196 @@
+"""Symbol index, for in-memory current symbol lookups.
+
+.. module:: chado_functions.symbol_index
+   :synopsis: Opt-in preloaded index of current symbols for selected feature types.
+
+Loaders look up symbols for the same few feature types (gene, allele, insertion,
+construct) over and over. Once loaded, SYMBOL_INDEX maps the current symbol
+(synonym_sgml) of every non-obsolete feature of the selected types and organisms
+to its feature_id, and feature_symbol_lookup (and so get_feature_and_check_uname_symbol)
+and feature_synonym_lookup (for current symbols) probe it before querying synonyms.
+Only misses (and ambiguous symbols) go to the db.
+
+The index is a snapshot: like feature_cache, it does not see symbol changes made
+after it is loaded, so it is disabled by a flush of new, changed or deleted
+features or synonyms, or a commit or rollback (not of a savepoint), in any session
+on its db that has used the chado_functions lookups. It can be saved to a file, and is
+reused from there only while the db has no newer audit_chado entries for the
+tables it is built from. The file is unpickled, which can run code: it is only
+read if owned by (and only writable by) the current user.
+
+i.e.
+    SYMBOL_INDEX.load(session, ['gene', 'allele'], organism_ids=[get_default_organism_id(session)],
+                      filename='/src/output/symbol_index.pickle')
+"""
+import os
+import pickle
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm.session import Session
+
+from harvdev_utils.general_functions.private_files import read_private_file
+from harvdev_utils.production import (
+    Cvterm, Feature, FeatureSynonym, Synonym
+)
+from harvdev_utils.production.production import t_audit_chado
+from .cache_manager import CACHE_MANAGER
+from .cvterm import get_cvterm
+
+import logging
+log = logging.getLogger(__name__)
+
+# Value for symbols of more than one feature (feature_ids start at 1).
+AMBIGUOUS = 0
+# Tables the index is built from, whose audit_chado entries date it.
+INDEXED_TABLES = ['cvterm', 'feature', 'feature_synonym', 'synonym']
+# Classes whose flushed changes can change current symbols.
+SYMBOL_CLASSES = (Feature, FeatureSynonym, Synonym)
+
+
+def _database_name(session: Session) -> str:
+    """Identify the db a session is bound to (without password)."""
+    return session.get_bind().url.render_as_string(hide_password=True)
+
+
+def _database_freshness(session: Session) -> Optional[datetime]:
+    """Return the latest audit_chado timestamp for the indexed tables (None if never changed)."""
+    return session.query(func.max(t_audit_chado.c.transaction_timestamp)).\
+        filter(t_audit_chado.c.audited_table.in_(INDEXED_TABLES)).scalar()
+
+
+class SymbolIndex(object):
+    """Index of current symbols, by organism_id and feature type."""
+
+    def __init__(self):
+        """Initialise an empty (unused) index."""
+        self.database: Optional[str] = None
+        self.freshness: Optional[datetime] = None  # Latest audit_chado timestamp for the indexed tables, at load.
+        self.type_names: Tuple = ()
+        self.organism_ids: Optional[Tuple] = None  # None for all organisms.
+        self.index: Dict[Tuple[int, str], Dict[str, int]] = {}  # (organism_id, type_name) => synonym_sgml => feature_id
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, session: Session, type_names: Iterable[str], organism_ids: Optional[Iterable[int]] = None,
+             filename: Optional[str] = None, itersize: int = 50000) -> int:
+        """Load the index, from filename if that has it for this db (unchanged since), types and organisms, else from the db.
+
+        session: (Session) - db connection to use.
+        type_names: (list) - feature type names i.e. ['gene', 'allele', 'insertion', 'construct']
+        organism_ids: <optional> (list) - organism_ids to index (default all).
+        filename: <optional> (str) - file to load the index from, or save it to after loading it from the db.
+        itersize: <optional> (int) - number of rows to fetch at a time.
+
+        Return the number of symbols indexed.
+        """
+        self.database = _database_name(session)
+        self.freshness = _database_freshness(session)
+        self.type_names = tuple(sorted(set(type_names)))
+        self.organism_ids = None if organism_ids is None else tuple(sorted(set(organism_ids)))
+        key = (self.database, self.freshness, self.type_names, self.organism_ids)
+        if filename and os.path.exists(filename):
+            try:
+                saved_key, saved_index = pickle.loads(read_private_file(filename))
+            except PermissionError as error:
+                log.warning("Ignoring symbol index: {}".format(error))
+            else:
+                if saved_key == key:
+                    self.index = saved_index
+                    log.info("Loaded symbol index for {} from {}.".format(self.type_names, filename))
+                    return self.size()
+                log.info("Ignoring symbol index in {}: it is for other types, organisms or db, or the db has changed.".format(filename))
+
+        symbol_type = get_cvterm(session, 'synonym type', 'symbol')
+        filter_spec: tuple = (Synonym.type_id == symbol_type.cvterm_id,
+                              FeatureSynonym.is_current == True,  # noqa: E712
+                              Feature.is_obsolete == False,  # noqa: E712
+                              Cvterm.name.in_(self.type_names))
+        if self.organism_ids is not None:
+            filter_spec += (Feature.organism_id.in_(self.organism_ids),)
+        rows = session.query(Synonym.synonym_sgml, Feature.feature_id, Feature.organism_id, Feature.uniquename, Cvterm.name).\
+            join(FeatureSynonym, FeatureSynonym.synonym_id == Synonym.synonym_id).\
+            join(Feature, Feature.feature_id == FeatureSynonym.feature_id).\
+            join(Cvterm, Cvterm.cvterm_id == Feature.type_id).\
+            filter(*filter_spec).yield_per(itersize)
+        self.build(rows)
+        log.info("Loaded symbol index of {} symbols for {} from the db.".format(self.size(), self.type_names))
+        if filename:
+            self.save(filename)
+        return self.size()
+
+    def save(self, filename: str):
+        """Save the index (with its db, db freshness, types and organisms) for reuse by load."""
+        temp_filename = filename + '.tmp'
+        with open(temp_filename, 'wb') as index_file:
+            pickle.dump(((self.database, self.freshness, self.type_names, self.organism_ids), self.index), index_file,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_filename, filename)
+
+    def build(self, rows: Iterable[Tuple]):
+        """Build the index from (synonym_sgml, feature_id, organism_id, uniquename, type_name) rows."""
+        self.index = {}
+        for synonym_sgml, feature_id, organism_id, uniquename, type_name in rows:
+            symbols = self.index.setdefault((organism_id, type_name), {})
+            # FBog gene models are genes for feature_synonym_lookup, but not for feature_symbol_lookup:
+            # leave their symbols to the db.
+            if type_name == 'gene' and 'FBog' in uniquename:
+                feature_id = AMBIGUOUS
+            elif symbols.get(synonym_sgml, feature_id) != feature_id:
+                feature_id = AMBIGUOUS
+            symbols[synonym_sgml] = feature_id
+
+    def size(self) -> int:
+        """Return the number of symbols indexed."""
+        return sum(len(symbols) for symbols in self.index.values())
+
+    def disable(self):
+        """Empty the index; lookups go back to the db."""
+        self.__init__()
+
+    def transaction_ended(self, session: Session):
+        """Disable the index after a commit or rollback on its db, as symbols may have changed (i.e. by other code)."""
+        if self.index and _database_name(session) == self.database:
+            log.info("Disabling symbol index: a session on {} was committed or rolled back.".format(self.database))
+            self.disable()
+
+    def flushed(self, session: Session):
+        """Disable the index after a flush on its db that changes features or synonyms."""
+        if not self.index or _database_name(session) != self.database:
+            return
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(obj, SYMBOL_CLASSES):
+                log.info("Disabling symbol index: features or synonyms changed in a session on {}.".format(self.database))
+                self.disable()
+                return
+
+    def covers(self, session: Session, organism_id: int, type_name: str) -> bool:
+        """Return True if the index has all current symbols for this organism and type, in the session's db."""
+        if not self.index or type_name not in self.type_names:
+            return False
+        if self.organism_ids is not None and organism_id not in self.organism_ids:
+            return False
+        return _database_name(session) == self.database
+
+    def probe(self, session: Session, organism_id: int, type_name: str, synonym_sgml: str) -> Optional[int]:
+        """Return the feature_id for a current symbol, or None if not indexed uniquely (then look it up in the db)."""
+        if not self.covers(session, organism_id, type_name):
+            return None
+        feature_id = self.index.get((organism_id, type_name), {}).get(synonym_sgml, AMBIGUOUS)
+        if feature_id == AMBIGUOUS:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return feature_id
+
+    def stats(self) -> Dict[str, List]:
+        """Return symbol counts per (organism_id, type_name), plus hits and misses."""
+        return {'symbols': sorted((key, len(symbols)) for key, symbols in self.index.items()),
+                'hits': [self.hits], 'misses': [self.misses]}
+
+
+# The index used by feature_symbol_lookup; empty (unused) until loaded.
+SYMBOL_INDEX = SymbolIndex()
+CACHE_MANAGER.on_transaction_end(SYMBOL_INDEX.transaction_ended)
+CACHE_MANAGER.on_flush(SYMBOL_INDEX.flushed)
@@ -14,6 +14,7 @@ from .write_proforma import (
 from .read_csv_tsv_file import (
     extract_data_from_tsv, extract_date_from_filename
 )
+from .private_files import read_private_file
 from .checks import (
     xort_logfile_check, proforma_logfile_check, check_xml, new_proforma_logfile_check
 )
@@ -0,0 +1,34 @@
+"""Module:: private_files.
+
+Synopsis:
+    Reads files that must only have been written by the current user: e.g., pickled caches and checkpoints, which
+    can run code when unpickled. A file owned by anyone else, or that others can write to, is refused.
+
+Author(s):
+    Gil dos Santos dossantos@morgan.harvard.edu
+"""
+
+import os
+import stat
+
+
+def read_private_file(filename):
+    """Read a file, after checking that it is owned by the current user and not writable by group or others.
+
+    The check is made on the opened file, so the file cannot be swapped between the check and the read.
+
+    Args:
+        arg1 (str): The file to read.
+
+    Returns:
+        bytes: The file contents.
+
+    Raises:
+        Raises a PermissionError if the file is not private to the current user (and any error from opening it).
+
+    """
+    with open(filename, 'rb') as private_file:
+        file_stat = os.fstat(private_file.fileno())
+        if file_stat.st_uid != os.getuid() or file_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            raise PermissionError('Refusing to read {}: it is not owned by, and only writable by, the current user.'.format(filename))
+        return private_file.read()
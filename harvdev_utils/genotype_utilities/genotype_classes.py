@@ -26,6 +26,7 @@ Notes:
 """
 
 import re
+from sqlalchemy import and_, func, or_
 from sqlalchemy.orm import aliased
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 from collections import defaultdict
@@ -37,6 +38,7 @@ from harvdev_utils.production import (
 )
 from harvdev_utils.chado_functions import get_or_create
 from harvdev_utils.char_conversions import sgml_to_plain_text, greek_to_sgml, sub_sup_to_sgml
+from harvdev_utils.psycopg_functions.uniquename_regex import parse_uniquename_regex
 
 
 # Regex patterns as constants (easier to maintain/change if needed)
@@ -48,6 +50,23 @@ FBTI_REGEX = r'^FBti[0-9]{7}$'
 FBGN_REGEX = r'^FBgn[0-9]{7}$'
 
 
+def uniquename_regex_filter(column, regex):
+    """Get an index-friendly filter equivalent to "column.op('~')(regex)" for FlyBase ID regexes.
+
+    See harvdev_utils.psycopg_functions.uniquename_regex for details; unrecognized regexes get a plain regex filter.
+    """
+    regex_filter = column.op('~')(regex)
+    bounds = parse_uniquename_regex(regex)
+    if bounds is None:
+        return regex_filter
+    prefix_filter = or_(*[and_(column >= lower, column < upper) for lower, upper in bounds.prefix_ranges()])
+    if bounds.min_length == bounds.max_length:
+        length_filter = func.length(column) == bounds.min_length
+    else:
+        length_filter = func.length(column).between(bounds.min_length, bounds.max_length)
+    return and_(prefix_filter, length_filter, regex_filter)
+
+
 class ChadoCache:
     """Cache commonly used Chado DB objects to reduce repeated queries."""
     def __init__(self, session):
@@ -312,9 +331,9 @@ class GenotypeAnnotation(object):
         filters = (
             ai_rel.object_id == insertion_feature_id,
             allele.is_obsolete.is_(False),
-            allele.uniquename.op('~')(FBAL_REGEX),
+            uniquename_regex_filter(allele.uniquename, FBAL_REGEX),
             gene.is_obsolete.is_(False),
-            gene.uniquename.op('~')(FBGN_REGEX),
+            uniquename_regex_filter(gene.uniquename, FBGN_REGEX),
             ai_rel_type.name == 'associated_with',
             ag_rel_type.name == 'alleleof',
             Organismprop.value == 'drosophilid',
@@ -608,7 +627,7 @@ class ComplementationGroup(object):
             filters = (
                 Feature.is_obsolete.is_(False),
                 Feature.is_analysis.is_(False),
-                Feature.uniquename.op('~')(FEATURE_UNIQUENAME_REGEX),
+                uniquename_regex_filter(Feature.uniquename, FEATURE_UNIQUENAME_REGEX),
                 Feature.name == feature_dict['input_name'],
             )
             try:
@@ -677,7 +696,7 @@ class ComplementationGroup(object):
             filters = (
                 construct.feature_id == feature_dict['input_mapped_feature_id'],
                 insertion.is_obsolete.is_(False),
-                insertion.uniquename.op('~')(FBTI_REGEX),
+                uniquename_regex_filter(insertion.uniquename, FBTI_REGEX),
                 insertion.is_analysis.is_(False),
                 insertion.name.op('~')('unspecified$'),
                 Cvterm.name == 'producedby',
@@ -710,7 +729,7 @@ class ComplementationGroup(object):
         filters = (
             allele.feature_id == initial_feature.feature_id,
             insertion.is_obsolete.is_(False),
-            insertion.uniquename.op('~')(FBTI_REGEX),
+            uniquename_regex_filter(insertion.uniquename, FBTI_REGEX),
             insertion.is_analysis.is_(False),
             Cvterm.name == 'is_represented_at_alliance_as',
         )
@@ -740,10 +759,10 @@ class ComplementationGroup(object):
         filters = (
             allele.feature_id == initial_feature.feature_id,
             construct.is_obsolete.is_(False),
-            construct.uniquename.op('~')(FBTP_REGEX),
+            uniquename_regex_filter(construct.uniquename, FBTP_REGEX),
             construct.is_analysis.is_(False),
             insertion.is_obsolete.is_(False),
-            insertion.uniquename.op('~')(FBTI_REGEX),
+            uniquename_regex_filter(insertion.uniquename, FBTI_REGEX),
             insertion.is_analysis.is_(False),
             insertion.name.op('~')('unspecified$'),
             ac_rel_type.name == 'associated_with',
@@ -819,7 +838,7 @@ class ComplementationGroup(object):
         filters = (
             Feature.is_obsolete.is_(False),
             Feature.is_analysis.is_(False),
-            Feature.uniquename.op('~')(FEATURE_UNIQUENAME_REGEX),
+            uniquename_regex_filter(Feature.uniquename, FEATURE_UNIQUENAME_REGEX),
             Feature.feature_id == feature_dict['feature_id'],
             FeatureSynonym.is_current.is_(True),
             synonym_type.name == 'symbol',
@@ -863,7 +882,7 @@ class ComplementationGroup(object):
                     rel_type.name == 'alleleof',
                     Feature.is_obsolete.is_(False),
                     Feature.is_analysis.is_(False),
-                    Feature.uniquename.op('~')(FBGN_REGEX),
+                    uniquename_regex_filter(Feature.uniquename, FBGN_REGEX),
                 )
                 parent_gene_result = session.query(Feature).\
                     select_from(Feature).\
@@ -929,9 +948,9 @@ class ComplementationGroup(object):
                 tool_rel = aliased(Cvterm, name='tool_rel')
                 filters = (
                     allele_feature.feature_id == feature_dict['input_mapped_feature_id'],
-                    construct_feature.uniquename.op('~')(FBTP_REGEX),
+                    uniquename_regex_filter(construct_feature.uniquename, FBTP_REGEX),
                     construct_feature.is_obsolete.is_(False),
-                    insertion_feature.uniquename.op('~')(FBTI_REGEX),
+                    uniquename_regex_filter(insertion_feature.uniquename, FBTI_REGEX),
                     insertion_feature.is_obsolete.is_(False),
                     ai_rel_type.name == 'associated_with',
                     ic_rel_type.name == 'producedby',
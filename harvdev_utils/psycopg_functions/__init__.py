@@ -1,22 +1,54 @@
 """harvdev_utils.psycopg_functions init file."""
-from .establish_db_connection import establish_db_connection
-from .connect import connect
+from .establish_db_connection import SESSION_PROFILES, establish_db_connection, session_options
+from .query_profiler import PROFILER, QueryProfile, QueryProfiler, explain_query
+from .result_cache import RESULT_CACHE, QueryResultCache, normalize_sql
+from .stage_checkpoint import StageCheckpoints
+from .connect import connect, connect_stream, copy_query, parse_copy_bool
+from .connection_pool import DbConnectionPool, begin_snapshot_transaction, export_snapshot
 from .set_up_db_reading import set_up_db_reading
 from .fb_feature_classes import (
     Feature, Allele, Construct, Gene, SeqFeat, Tool
 )
+from .compact_feature_classes import (
+    COMPACT_CLASSES, CompactFeature, CompactAllele, CompactConstruct, CompactGene, CompactSeqFeat, CompactTool
+)
 from .fb_chado_classes import (
     Pubauthor, Pub, Reference, Resource, Cvterm
 )
+from .uniquename_regex import (
+    UniquenameRegexBounds, parse_uniquename_regex, uniquename_regex_sql,
+    rewrite_uniquename_regex_filters, rewrite_uniquename_regex_params
+)
 from .sql_queries import (
     current_features_by_uname_regex, current_feat_symbol_sgmls, current_feat_fullname_sgmls,
     rel_features, rel_features_rev, rel_dmel_features, rel_dmel_features_rev,
     feat_symbol_synonyms, feat_fullname_synonyms, feat_secondary_fbids,
     featureprops, feat_cvterm, feat_cvterm_cvtprop, orgid_abbr, orgid_genus,
-    feat_id_symbol_sgml, indirect_rel_features, gene_HGNC_ids, gene_MOD_ids
+    feat_id_symbol_sgml, indirect_rel_features, gene_HGNC_ids, gene_MOD_ids, feat_synonyms_and_ids,
+    pub_timelastmodified
+)
+from .query_registry import (
+    QUERY_REGISTRY, NamedQuery, register_query, get_named_query, prepare_named_query, run_named_query
+)
+from .feature_scope import (
+    DEFAULT_SCOPE_TABLE, load_feature_scope_table, scope_sql_query
 )
 from .get_db_info import (
-    get_features_by_uname_regex, confirm_attribute, get_dict_value, format_sql_query,
-    check_unique_results, check_key_overlap, get_key_value, build_uniq_db_result_dict,
-    build_list_db_result_dict, add_unique_info, add_list_info, add_unique_dict_info
+    query_db, get_features_by_uname_regex, confirm_attribute, get_dict_value, format_sql_query,
+    check_unique_results, check_unique_results_stream, check_key_overlap, get_key_value, build_uniq_db_result_dict,
+    build_list_db_result_dict, add_unique_info, add_list_info, merge_unique_info, merge_list_info,
+    add_unique_dict_info, add_synonym_and_id_info
+)
+from .enrichment_planner import (
+    ENRICHMENT_MODES, check_enrichment_specs, run_enrichment_plan
+)
+from .incremental_export import (
+    get_pub_timelastmodified, reference_export_dict, content_hash, load_export_snapshot, save_export_snapshot,
+    find_changed_pubs, update_export_snapshot
+)
+from .parallel_transform import run_transform_stage
+from .feature_graph import FeatureGraph, load_feature_graph
+from .release_diff import (
+    DIFF_EXCLUDED_ATTRIBUTES, exported_attributes, feature_export_dict, load_hash_manifest, save_hash_manifest, diff_hashes, diff_feature_dict
 )
+from .feature_snapshot import FeatureSnapshot, FeatureView, write_feature_snapshot
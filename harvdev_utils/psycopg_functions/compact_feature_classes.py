@@ -0,0 +1,157 @@
+"""Module:: compact_feature_classes.
+
+Synopsis:
+    Memory-compact variants of the FlyBase feature objects in fb_feature_classes.
+
+    Each "Compact" class has the same public attributes, validation and methods as its fb_feature_classes
+    counterpart, but stores attributes in __slots__ instead of a per-object __dict__. Attributes that the
+    original classes initialize to None (mostly AGR export fields) are left unset until assigned, and read
+    as None until then. Unlike the original classes, new attributes cannot be added ad hoc, and compact
+    objects are not instances of the original classes (e.g., isinstance(CompactGene(...), Gene) is False).
+
+Author(s):
+    Gil dos Santos dossantos@morgan.harvard.edu
+
+"""
+
+import logging
+from harvdev_utils.psycopg_functions.fb_feature_classes import (
+    Feature, Allele, Construct, Gene, SeqFeat, Tool
+)
+from harvdev_utils.psycopg_functions.row_constructors import check_row_columns, gc_paused
+
+log = logging.getLogger(__name__)
+
+# Attributes set from the chado feature table row, as for the Feature class. The first four are properties
+# whose values are kept in these name-mangled backing fields.
+FEATURE_BACKING_FIELDS = ('_Feature__feature_id', '_Feature__uniquename', '_Feature__analysis', '_Feature__obsolete')
+FEATURE_ROW_ATTRIBUTES = ('organism_id', 'name', 'feature_type')
+# Attributes always allocated, since they are mutable lists that methods append to.
+FEATURE_LIST_ATTRIBUTES = ('data_warnings', 'data_errors', 'agr_export_blockers')
+# Attributes initialized to None in fb_feature_classes; left unallocated until set.
+FEATURE_LAZY_ATTRIBUTES = (
+    'org_abbr', 'genus', 'symbol_sgml', 'fullname_sgml', 'agr_symbol', 'agr_symbol_text', 'symbol_synonym_list',
+    'fullname_synonym_list', 'all_synonym_set', 'secondary_id_list', 'feat_desc', 'for_agr_export'
+)
+ALLELE_LAZY_ATTRIBUTES = (
+    'gene_id', 'gene_symbol_sgml', 'expresses', 'targets', 'mut_origin', 'transgenic_class', 'fbtp_list', 'fbti_list',
+    'fbtp_via_fbti_list', 'has_reg_region', 'tagged_with', 'encodes_tool', 'carries_tool', 'molecular_info',
+    'aminoacid_rep', 'nucleotide_sub', 'description', 'insertion', 'transgenic', 'in_dmel', 'drosophilidae',
+    'classification', 'gene_action', 'gene_for_agr_export'
+)
+CONSTRUCT_LAZY_ATTRIBUTES = (
+    'fbal_list', 'fbti_list', 'has_reg_region', 'tagged_with', 'encodes_tool', 'carries_tool', 'expresses_list',
+    'targets_list'
+)
+GENE_LAZY_ATTRIBUTES = ('hgnc_id_list', 'mod_id_list', 'agr_gene_id', 'promoted_gene_type')
+SEQFEAT_LAZY_ATTRIBUTES = ()
+TOOL_LAZY_ATTRIBUTES = ('originates_from', )
+
+# Class namespace entries that must not be copied from an fb_feature_classes class to its compact variant.
+_UNCOPIED_NAMES = {'__init__', '__dict__', '__weakref__', '__doc__', '__module__', '__qualname__'}
+
+
+class CompactFeature(object):
+    """Define a memory-compact FlyBase Feature object (see Feature for details)."""
+
+    __slots__ = FEATURE_BACKING_FIELDS + FEATURE_ROW_ATTRIBUTES + FEATURE_LIST_ATTRIBUTES + FEATURE_LAZY_ATTRIBUTES
+    lazy_attributes = frozenset(FEATURE_LAZY_ATTRIBUTES)
+
+    def __init__(self, feature_id, organism_id, name, uniquename, feature_type, analysis, obsolete):
+        """Initialize a compact FlyBase Feature class object. Takes the same args as Feature."""
+        self.feature_id = feature_id
+        self.organism_id = organism_id
+        self.name = name
+        self.uniquename = uniquename
+        self.feature_type = feature_type
+        self.analysis = analysis
+        self.obsolete = obsolete
+        self.data_warnings = []
+        self.data_errors = []
+        self.agr_export_blockers = []
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Make many objects of this class from feature rows, validating whole columns at once (see Feature.from_rows)."""
+        rows = list(rows)
+        check_row_columns(cls.__name__, rows, len(cls.row_attributes), cls.row_column_checks())
+        # Set slots through their descriptors, bypassing property setters.
+        row_setters = [getattr(cls, attribute).__set__ for attribute in cls.row_attributes]
+        list_setters = [getattr(cls, attribute).__set__ for attribute in FEATURE_LIST_ATTRIBUTES]
+        new = object.__new__
+        objects = []
+        with gc_paused():
+            for row in rows:
+                this_object = new(cls)
+                for setter, value in zip(row_setters, row):
+                    setter(this_object, value)
+                for setter in list_setters:
+                    setter(this_object, [])
+                objects.append(this_object)
+        return objects
+
+    def __getattr__(self, name):
+        """Read an unset lazy attribute as None; only called when normal attribute lookup fails."""
+        if name in self.lazy_attributes:
+            return None
+        raise AttributeError('"{}" object has no attribute "{}"'.format(type(self).__name__, name))
+
+
+def _copy_class_namespace(feature_class):
+    """Get the methods and class attributes (e.g., "uniquename_regex") defined directly on a Feature class.
+
+    Args:
+        arg1 (class): A class from fb_feature_classes.
+
+    Returns:
+        dict: The class namespace, minus "__init__" and the per-object "__dict__" machinery.
+
+    """
+    return {key: value for key, value in vars(feature_class).items() if key not in _UNCOPIED_NAMES}
+
+
+def _make_compact_class(feature_class, compact_parent, lazy_attributes):
+    """Make a compact variant of a Feature class, with the same methods and validation but using __slots__.
+
+    Args:
+        arg1 (class): The fb_feature_classes class to copy (e.g., Allele).
+        arg2 (class): The compact variant of its parent class (e.g., CompactFeature).
+        arg3 (tuple): Names of attributes that the original class initializes to None.
+
+    Returns:
+        class: The compact class (e.g., CompactAllele).
+
+    """
+    namespace = _copy_class_namespace(feature_class)
+    inherited_slots = set()
+    for cls in compact_parent.__mro__:
+        inherited_slots.update(cls.__dict__.get('__slots__', ()))
+    namespace['__slots__'] = tuple(i for i in lazy_attributes if i not in inherited_slots)
+    namespace['lazy_attributes'] = compact_parent.lazy_attributes.union(lazy_attributes)
+    namespace['__doc__'] = 'Define a memory-compact FlyBase {} object (see {} for details).'.format(
+        feature_class.__name__, feature_class.__name__)
+    namespace['__module__'] = __name__
+    return type('Compact{}'.format(feature_class.__name__), (compact_parent, ), namespace)
+
+
+# Feature properties and methods are shared with the original class; they read and write the same backing fields.
+for _key, _value in _copy_class_namespace(Feature).items():
+    if _key not in CompactFeature.__dict__:
+        setattr(CompactFeature, _key, _value)
+del _key, _value
+
+CompactAllele = _make_compact_class(Allele, CompactFeature, ALLELE_LAZY_ATTRIBUTES)
+CompactConstruct = _make_compact_class(Construct, CompactFeature, CONSTRUCT_LAZY_ATTRIBUTES)
+CompactGene = _make_compact_class(Gene, CompactFeature, GENE_LAZY_ATTRIBUTES)
+CompactSeqFeat = _make_compact_class(SeqFeat, CompactFeature, SEQFEAT_LAZY_ATTRIBUTES)
+CompactTool = _make_compact_class(Tool, CompactFeature, TOOL_LAZY_ATTRIBUTES)
+
+# Map each fb_feature_classes class to its compact variant.
+COMPACT_CLASSES = {
+    Feature: CompactFeature,
+    Allele: CompactAllele,
+    Construct: CompactConstruct,
+    Gene: CompactGene,
+    SeqFeat: CompactSeqFeat,
+    Tool: CompactTool,
+}
@@ -8,6 +8,18 @@ Author(s):
 
 """
 
+import io
+import itertools
+import re
+import time
+from harvdev_utils.psycopg_functions.query_profiler import PROFILER, estimate_bytes
+
+# Default number of rows fetched per round trip by a named server-side cursor.
+DEFAULT_ITERSIZE = 2000
+
+# Named (server-side) cursors must have names unique within a session.
+_cursor_counter = itertools.count()
+
 
 def connect(sql, query_variable, db_connection):
     """Retrieve information from a postgres db using psycopg2.
@@ -21,6 +33,8 @@ def connect(sql, query_variable, db_connection):
         list: Query results as a list of tuples.
 
     """
+    if PROFILER.enabled:
+        profile = PROFILER.start_query(sql, query_variable, db_connection)
     cursor = db_connection.cursor()
     if query_variable == 'no_query':           # If SQL query lacks a variable.
         cursor.execute(sql)
@@ -28,5 +42,143 @@ def connect(sql, query_variable, db_connection):
         cursor.execute(sql, query_variable)    # If SQL query has a variable.
     records = cursor.fetchall()
     cursor.close()
+    if PROFILER.enabled:
+        profile.rows = len(records)
+        profile.bytes = estimate_bytes(records)
+        PROFILER.finish_query(profile)
 
     return records
+
+
+def connect_stream(sql, query_variable, db_connection, itersize=DEFAULT_ITERSIZE, batches=False):
+    """Stream information from a postgres db using a named, server-side psycopg2 cursor.
+
+    Unlike "connect()", results are not loaded into memory all at once. The server holds the result set and sends
+    "itersize" rows per network round trip as the generator is consumed. The cursor is closed once the generator is
+    exhausted (or garbage collected). The connection must not be in autocommit mode.
+
+    Args:
+        arg1 (string): An "sql" query.
+        arg2 (tuple): An optional "query_variable": e.g., ('wingless', )
+        arg3 (psycopg2.extensions.connection): A psycopg2 db connection.
+        itersize (int): The number of rows to fetch from the server per round trip.
+        batches (bool): If True, yield lists of up to "itersize" rows instead of single rows.
+
+    Yields:
+        tuple: A single row of query results (or a list of such tuples, if "batches" is True).
+
+    """
+    # When profiling, only time spent executing the query and fetching batches is counted.
+    profile = PROFILER.start_query(sql, query_variable, db_connection) if PROFILER.enabled else None
+    cursor_name = 'harvdev_stream_{}'.format(next(_cursor_counter))
+    cursor = db_connection.cursor(name=cursor_name)
+    cursor.itersize = itersize
+    try:
+        fetch_start = time.perf_counter()
+        if query_variable == 'no_query':           # If SQL query lacks a variable.
+            cursor.execute(sql)
+        else:
+            cursor.execute(sql, query_variable)    # If SQL query has a variable.
+        rows = cursor.fetchmany(itersize)
+        while rows:
+            if profile is not None:
+                profile.add_rows(rows, time.perf_counter() - fetch_start)
+            if batches is True:
+                yield rows
+            else:
+                yield from rows
+            fetch_start = time.perf_counter()
+            rows = cursor.fetchmany(itersize)
+        if profile is not None:
+            profile.add_rows(rows, time.perf_counter() - fetch_start)
+    finally:
+        cursor.close()
+        if profile is not None:
+            PROFILER.finish_query(profile, streamed=True)
+
+
+# Escape sequences used by the postgres COPY text format (other characters are sent as-is).
+_COPY_ESCAPES = {'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t', 'v': '\v', '\\': '\\'}
+_COPY_ESCAPE_PATTERN = re.compile(r'\\(.)')
+
+
+def _unescape_copy_field(field):
+    """Convert one field of COPY text output into a Python value (None for NULL)."""
+    if field == '\\N':
+        return None
+    if '\\' not in field:
+        return field
+    return _COPY_ESCAPE_PATTERN.sub(lambda match: _COPY_ESCAPES.get(match.group(1), match.group(1)), field)
+
+
+class _CopyRowParser(io.TextIOBase):
+    """File-like sink for "cursor.copy_expert()" that parses COPY text output into row tuples as it arrives.
+
+    Being a text file, psycopg2 decodes the COPY data (using the connection encoding) before calling "write()".
+    """
+
+    def __init__(self, converters=None):
+        super().__init__()
+        self.converters = converters
+        self.rows = []
+        self.chars_read = 0
+        self._partial_line = ''
+
+    def write(self, data):
+        self.chars_read += len(data)
+        lines = (self._partial_line + data).split('\n')
+        self._partial_line = lines.pop()
+        for line in lines:
+            self._add_row(line)
+        return len(data)
+
+    def _add_row(self, line):
+        row = [_unescape_copy_field(i) for i in line.split('\t')]
+        if self.converters is not None:
+            row = [value if value is None or converter is None else converter(value) for converter, value in zip(self.converters, row)]
+        self.rows.append(tuple(row))
+
+    def writable(self):
+        return True
+
+    def close(self):
+        if self._partial_line:
+            self._add_row(self._partial_line)
+            self._partial_line = ''
+        super().close()
+
+
+def parse_copy_bool(value):
+    """Convert a COPY text boolean ("t" or "f") into a Python bool; for use in "copy_query()" converters."""
+    return value == 't'
+
+
+def copy_query(sql, db_connection, converters=None):
+    """Retrieve information from a postgres db using "COPY (sql) TO STDOUT", which is much faster for big result sets.
+
+    Rows are parsed from the COPY text output as it streams in, so the raw text is never held in memory all at once.
+    All values come back as strings (or None for NULL) unless "converters" are given.
+
+    Args:
+        arg1 (string): An "sql" query (SELECT) with any values already filled in; a trailing ";" is allowed.
+        arg2 (psycopg2.extensions.connection): A psycopg2 db connection.
+        converters (list): Optional. One function (or None, to keep the string) per column: e.g., [int, str, parse_copy_bool].
+
+    Returns:
+        list: Query results as a list of tuples, the same shape as from "connect()".
+
+    """
+    if PROFILER.enabled:
+        profile = PROFILER.start_query(sql, db_connection=db_connection)
+    copy_sql = 'COPY ({}) TO STDOUT'.format(sql.strip().rstrip(';'))
+    parser = _CopyRowParser(converters=converters)
+    cursor = db_connection.cursor()
+    cursor.copy_expert(copy_sql, parser)
+    cursor.close()
+    parser.close()
+    if PROFILER.enabled:
+        profile.rows = len(parser.rows)
+        profile.bytes = parser.chars_read
+        PROFILER.finish_query(profile)
+
+    return parser.rows
@@ -0,0 +1,242 @@
+"""Module:: connection_pool.
+
+Synopsis:
+    A pool of psycopg2 connections to a postgres db, with checkout/return, health checks and reconnect-on-failure.
+    Lets a report script run independent queries on separate connections, and recover from dropped connections.
+    Optionally, all pooled connections can share one exported snapshot of the db (see "export_snapshot()"), so that
+    queries spread over many connections see the same data even while the db is being written to.
+
+Author(s):
+    Gil dos Santos dossantos@morgan.harvard.edu
+
+"""
+
+import logging
+from contextlib import contextmanager
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, QueryCanceledError
+from psycopg2.pool import ThreadedConnectionPool
+from harvdev_utils.psycopg_functions import connect, session_options
+
+log = logging.getLogger(__name__)
+
+
+def begin_snapshot_transaction(db_connection, snapshot_id=None):
+    """Start a read-only, repeatable-read transaction on a connection, optionally using an exported snapshot.
+
+    In a repeatable-read transaction, all queries see the db as it was at the start of the transaction (or as of the
+    imported snapshot), ignoring changes committed since. The transaction lasts until the connection is committed or
+    rolled back (e.g., by returning it to a DbConnectionPool).
+
+    Args:
+        arg1 (psycopg2.extensions.connection): A psycopg2 db connection, not in autocommit mode or in a transaction.
+        snapshot_id (str): Optional. A snapshot identifier from "export_snapshot()" on another connection.
+
+    Raises:
+        Raises an exception if the connection is in autocommit mode or already in a transaction; or (from postgres) if
+            the snapshot is no longer valid (i.e., the exporting transaction has ended).
+
+    """
+    if db_connection.autocommit is True:
+        raise ValueError('A snapshot transaction cannot be started on a connection in autocommit mode.')
+    if db_connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+        raise ValueError('A snapshot transaction must be started before any query in the current transaction: commit or rollback first.')
+    cursor = db_connection.cursor()
+    # psycopg2 opens the transaction implicitly; these must be its first statements.
+    cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY;')
+    if snapshot_id is not None:
+        cursor.execute('SET TRANSACTION SNAPSHOT %s;', (snapshot_id, ))
+    cursor.close()
+
+    return
+
+
+def export_snapshot(db_connection):
+    """Start a read-only, repeatable-read transaction on a (primary) connection, and export its snapshot.
+
+    The snapshot can be imported by other connections (e.g., via "DbConnectionPool.use_snapshot()") for as long as this
+    connection's transaction stays open: i.e., until it is committed or rolled back. Meanwhile, the connection is
+    read-only.
+
+    Args:
+        arg1 (psycopg2.extensions.connection): A psycopg2 db connection, not in autocommit mode or in a transaction.
+
+    Returns:
+        str: The snapshot identifier.
+
+    """
+    begin_snapshot_transaction(db_connection)
+    cursor = db_connection.cursor()
+    cursor.execute('SELECT pg_export_snapshot();')
+    snapshot_id = cursor.fetchone()[0]
+    cursor.close()
+    log.info('Exported db snapshot {}.'.format(snapshot_id))
+
+    return snapshot_id
+
+
+class DbConnectionPool(object):
+    """Define a pool of psycopg2 connections to some postgres db."""
+
+    def __init__(self, database_host, database, username, password, minconn=0, maxconn=4, max_retries=3, session_profile=None):
+        """Initialize a DbConnectionPool object.
+
+        Args:
+            arg1 (str): The "database_host" (server).
+            arg2 (str): The "database" name.
+            arg3 (str): The "username".
+            arg4 (str): The postgres "password".
+            minconn (int): The number of connections to open right away (others are opened on demand).
+            maxconn (int): The maximum number of connections the pool will hand out at once.
+            max_retries (int): How many times to replace a broken connection before giving up.
+            session_profile (str): Optional. The name of a session profile in SESSION_PROFILES, for all connections.
+
+        Returns:
+            DbConnectionPool: A pool of psycopg2 connections.
+
+        """
+        self.database_host = database_host
+        self.database = database
+        self.maxconn = maxconn
+        self.max_retries = max_retries
+        self.conn_string = "host={} dbname={} user={} password='{}'".format(database_host, database, username, password)
+        self.session_profile = session_profile
+        if session_profile is None:
+            self.pool = ThreadedConnectionPool(minconn, maxconn, self.conn_string)
+        else:
+            self.pool = ThreadedConnectionPool(minconn, maxconn, self.conn_string, options=session_options(session_profile))
+        self.reconnect_count = 0    # Number of broken connections replaced so far.
+        self.snapshot_id = None     # If set, each checked-out connection uses this exported snapshot.
+        log.info('Made a pool of up to {} connections to database {} on db_host {}.'.format(maxconn, database, database_host))
+
+    @staticmethod
+    def is_healthy(db_connection):
+        """Check that a connection is open and can still talk to the server.
+
+        Args:
+            arg1 (psycopg2.extensions.connection): A psycopg2 db connection.
+
+        Returns:
+            bool: True if a trivial query succeeds on the connection.
+
+        """
+        if db_connection.closed:
+            return False
+        try:
+            cursor = db_connection.cursor()
+            cursor.execute('SELECT 1;')
+            cursor.close()
+            db_connection.rollback()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
+        return True
+
+    def getconn(self):
+        """Check out a healthy connection from the pool, replacing broken connections as needed.
+
+        Returns:
+            psycopg2.extensions.connection: A psycopg2 db connection. Return it with "putconn()" when done.
+                If a snapshot is in use (see "use_snapshot()"), the connection is in a read-only transaction using it.
+
+        Raises:
+            Raises psycopg2.OperationalError if no healthy connection can be made after "max_retries" attempts.
+
+        """
+        for attempt in range(self.max_retries + 1):
+            db_connection = self.pool.getconn()
+            if self.is_healthy(db_connection):
+                if self.snapshot_id is not None:
+                    try:
+                        begin_snapshot_transaction(db_connection, self.snapshot_id)
+                    except Exception:
+                        self.pool.putconn(db_connection)
+                        raise
+                return db_connection
+            log.warning('Discarding broken connection to {} (attempt {}).'.format(self.database, attempt + 1))
+            self.pool.putconn(db_connection, close=True)
+            self.reconnect_count += 1
+        raise psycopg2.OperationalError('Could not get a healthy connection to {} after {} attempts.'.format(self.database, self.max_retries + 1))
+
+    def use_snapshot(self, snapshot_id):
+        """Make each connection checked out from now on use an exported snapshot, in a read-only, repeatable-read transaction.
+
+        Args:
+            arg1 (str): A snapshot identifier from "export_snapshot()"; or None, to stop using a snapshot.
+
+        """
+        self.snapshot_id = snapshot_id
+        if snapshot_id is None:
+            log.info('Pooled connections to {} no longer use an exported snapshot.'.format(self.database))
+        else:
+            log.info('Pooled connections to {} will use exported snapshot {}.'.format(self.database, snapshot_id))
+
+        return
+
+    def putconn(self, db_connection, close=False):
+        """Return a checked-out connection to the pool.
+
+        Any open transaction on the connection is rolled back by the pool, and connections in an unknown state are closed.
+        Health is re-checked at the next checkout, so this adds no round trip.
+
+        Args:
+            arg1 (psycopg2.extensions.connection): A psycopg2 db connection obtained from "getconn()".
+            close (bool): If True, close the connection instead of keeping it for reuse.
+
+        """
+        self.pool.putconn(db_connection, close=close)
+
+        return
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of a "with" block, then return it to the pool.
+
+        Yields:
+            psycopg2.extensions.connection: A psycopg2 db connection.
+
+        """
+        db_connection = self.getconn()
+        try:
+            yield db_connection
+        finally:
+            self.putconn(db_connection)
+
+    def run_query(self, sql, query_variable='no_query'):
+        """Run a query on a pooled connection, retrying on a fresh connection if the connection drops mid-query.
+
+        Args:
+            arg1 (str): An "sql" query.
+            arg2 (tuple): An optional "query_variable": e.g., ('wingless', )
+
+        Returns:
+            list: Query results as a list of tuples (see "connect()").
+
+        Raises:
+            Raises other db errors (e.g., a query cancelled by statement_timeout) right away, without retrying.
+
+        """
+        for attempt in range(self.max_retries + 1):
+            db_connection = self.getconn()
+            try:
+                records = connect(sql, query_variable, db_connection)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as error:
+                # Only a lost connection is worth a retry: a cancelled query (e.g., by statement_timeout) would just
+                # be cancelled again, and its connection is still fine.
+                lost = not isinstance(error, QueryCanceledError) and (isinstance(error, psycopg2.InterfaceError) or db_connection.closed != 0)
+                self.putconn(db_connection, close=lost)
+                if lost is False:
+                    raise
+                self.reconnect_count += 1
+                if attempt == self.max_retries:
+                    raise
+                log.warning('Lost connection to {} during query, retrying: {}'.format(self.database, error))
+                continue
+            self.putconn(db_connection)
+            return records
+
+    def closeall(self):
+        """Close all connections in the pool."""
+        self.pool.closeall()
+        log.info('Closed all pooled connections to database {}.'.format(self.database))
+
+        return
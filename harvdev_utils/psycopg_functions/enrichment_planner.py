@@ -0,0 +1,108 @@
+"""Module:: enrichment_planner.
+
+Synopsis:
+    Runs a batch of independent "add_unique_info()"/"add_list_info()"-type enrichment queries concurrently on pooled
+    db connections, then merges all results into the data_dict in the order given (only once all queries succeed).
+
+Author(s):
+    Gil dos Santos dossantos@morgan.harvard.edu
+
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from harvdev_utils.psycopg_functions import check_unique_results, format_sql_query, merge_list_info, merge_unique_info
+from harvdev_utils.psycopg_functions.query_profiler import PROFILER
+
+log = logging.getLogger(__name__)
+
+# Merge functions for each allowed enrichment mode.
+ENRICHMENT_MODES = {
+    'unique': merge_unique_info,
+    'list': merge_list_info,
+}
+
+
+def check_enrichment_specs(enrichment_specs):
+    """Check that each enrichment spec is well-formed before any queries are run.
+
+    Args:
+        arg1 (list): A list of (attribute, sql_query, args, mode) tuples. See "run_enrichment_plan()".
+
+    Returns:
+        None.
+
+    Raises:
+        Raises an exception if a spec does not have four elements, or has an unknown mode.
+
+    """
+    for spec in enrichment_specs:
+        if len(spec) != 4:
+            raise ValueError('Enrichment spec must be (attribute, sql_query, args, mode): {}'.format(spec))
+        if spec[3] not in ENRICHMENT_MODES:
+            raise ValueError('Enrichment mode must be one of {}, not "{}".'.format(sorted(ENRICHMENT_MODES.keys()), spec[3]))
+
+    return
+
+
+def _run_labeled_query(conn_pool, attribute, formatted_sql_query):
+    """Run a query on a pooled connection, reporting it to the query profiler under the given attribute."""
+    with PROFILER.label_queries(attribute):
+        return conn_pool.run_query(formatted_sql_query)
+
+
+def run_enrichment_plan(data_dict, conn_pool, enrichment_specs, max_workers=None):
+    """Add info from many independent db queries to each object in some ID-keyed data_dict.
+
+    Each spec is equivalent to one "add_unique_info()" or "add_list_info()" call. All queries run at once on a thread
+    pool, each on its own pooled connection, so wall time is close to that of the slowest query. Once all queries are
+    done (and unique results checked), results are merged into the data_dict one spec at a time, in the order given,
+    so the outcome does not depend on which query finishes first, and a failed query leaves the data_dict unchanged.
+
+    Args:
+        arg1 (dict): An FB-ID keyed dict of dicts or objects (e.g., Gene or Allele objects).
+        arg2 (DbConnectionPool): A pool of db connections: e.g., set_up_dict['conn_pool'].
+        arg3 (list): A list of (attribute, sql_query, args, mode) tuples.
+            "attribute" (str) is the attribute to fill in; "sql_query" (str) a query string with "{}" placeholders;
+            "args" (tuple) the values for those placeholders (may be empty); "mode" (str) is "unique" or "list".
+            Queries must not join a temporary table (e.g., from "feature_scope"): pooled connections don't have it.
+        max_workers (int): The number of queries to run at once. Defaults to (and is capped at) the max size of the
+            connection pool, which raises an error rather than waiting when it has no connection to hand out.
+
+    Returns:
+        dict: The input "data_dict", with all attributes filled in.
+
+    Raises:
+        Raises an exception if any spec is malformed, any query fails, or any "unique" spec has non-unique results.
+
+    """
+    check_enrichment_specs(enrichment_specs)
+    if max_workers is None:
+        max_workers = conn_pool.maxconn
+    elif max_workers > conn_pool.maxconn:
+        log.warning('Only {} pooled connections: running {} queries at a time, not {}.'.format(conn_pool.maxconn, conn_pool.maxconn, max_workers))
+        max_workers = conn_pool.maxconn
+    log.info('Running {} enrichment queries, {} at a time.'.format(len(enrichment_specs), max_workers))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = []
+        for attribute, sql_query, args, mode in enrichment_specs:
+            formatted_sql_query = format_sql_query(sql_query, *args)
+            log.debug('Queueing query for {}: {}'.format(attribute, formatted_sql_query))
+            futures.append(executor.submit(_run_labeled_query, conn_pool, attribute, formatted_sql_query))
+        # result() waits for each query (and re-raises any error from it).
+        all_db_results = [future.result() for future in futures]
+
+    # Check all results before merging any, so that a bad result does not leave the data_dict half-enriched.
+    for spec, db_results in zip(enrichment_specs, all_db_results):
+        if spec[3] == 'unique':
+            check_unique_results(db_results)
+
+    # Merge in spec order.
+    for spec, db_results in zip(enrichment_specs, all_db_results):
+        attribute, mode = spec[0], spec[3]
+        log.info('Adding {} db info to this attribute: {} ({} results).'.format(mode, attribute, len(db_results)))
+        with PROFILER.label_queries(attribute), PROFILER.profile_merge():
+            ENRICHMENT_MODES[mode](data_dict, attribute, db_results)
+
+    return data_dict
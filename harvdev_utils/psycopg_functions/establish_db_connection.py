@@ -1,7 +1,9 @@
 """Module:: establish_db_connection.
 
 Synopsis:
-    Establishes a psycopg2 connection to a postgres db.
+    Establishes a psycopg2 connection to a postgres db, optionally with a named session profile: a set of session
+    settings (GUCs) applied at connect time, tuned for a kind of work. For example, "bulk_read" gives large sorts and
+    hash joins enough work_mem to not spill to disk.
 
 Author(s):
     Chris Tabone ctabone@morgan.harvard.edu, Gil dos Santos dossantos@morgan.harvard.edu
@@ -13,8 +15,58 @@ import logging
 
 log = logging.getLogger(__name__)
 
+# Named sets of session settings. Read-only profiles reject all writes, including "CREATE TEMP TABLE" (e.g., by
+# "feature_scope"): use "loader" for scripts that need temp tables.
+# No profile sets idle_in_transaction_session_timeout: report connections are never committed, so they sit idle in an
+# open transaction while Python code runs between queries (and the exported snapshot of "--snapshot" needs that).
+SESSION_PROFILES = {
+    # Long analytic report queries: big sorts/hashes in memory; JIT compile time is not worth it for our queries.
+    'bulk_read': {
+        'work_mem': '1GB',
+        'jit': 'off',
+        'statement_timeout': '6h',
+        'default_transaction_read_only': 'on',
+    },
+    # Short lookups: fail fast rather than hold up a curator.
+    'interactive': {
+        'work_mem': '64MB',
+        'jit': 'off',
+        'statement_timeout': '5min',
+        'default_transaction_read_only': 'on',
+    },
+    # Scripts that write to the db: memory for index builds, no timeouts on long loads.
+    'loader': {
+        'work_mem': '256MB',
+        'maintenance_work_mem': '2GB',
+        'jit': 'off',
+        'statement_timeout': '0',
+        'default_transaction_read_only': 'off',
+    },
+}
 
-def establish_db_connection(database_host, database, username, password):
+
+def session_options(session_profile):
+    """Get the libpq "options" string that applies the settings of a session profile at connect time.
+
+    Args:
+        arg1 (str): A session profile name (a key of SESSION_PROFILES).
+
+    Returns:
+        str: An "options" string: e.g., "-c work_mem=1GB -c jit=off".
+
+    Raises:
+        Raises a ValueError for an unknown session profile.
+
+    """
+    try:
+        settings = SESSION_PROFILES[session_profile]
+    except KeyError:
+        raise ValueError('Unknown session profile "{}"; choose from {}.'.format(session_profile, sorted(SESSION_PROFILES.keys())))
+    # In libpq options, spaces within a value must be escaped with a backslash.
+    return ' '.join('-c {}={}'.format(name, str(value).replace('\\', '\\\\').replace(' ', '\\ ')) for name, value in settings.items())
+
+
+def establish_db_connection(database_host, database, username, password, session_profile=None):
     """Establish a connection to some postgres db.
 
     Args:
@@ -22,13 +74,19 @@ def establish_db_connection(database_host, database, username, password):
         arg2 (str): The "database" name.
         arg3 (str): The "username".
         arg4 (str): The postgres "password".
+        session_profile (str): Optional. The name of a session profile in SESSION_PROFILES: e.g., "bulk_read".
 
     Returns:
         psycopg2.extensions.connection: A psycopg2 database connection object.
 
     """
     conn_string = "host={} dbname={} user={} password='{}'".format(database_host, database, username, password)
-    db_connection = psycopg2.connect(conn_string)
-    conn_description = 'Made connection to database {} on db_host {}.'.format(database, database_host)
+    if session_profile is None:
+        db_connection = psycopg2.connect(conn_string)
+        conn_description = 'Made connection to database {} on db_host {}.'.format(database, database_host)
+    else:
+        db_connection = psycopg2.connect(conn_string, options=session_options(session_profile))
+        conn_description = 'Made connection to database {} on db_host {}, with the "{}" session profile.'.format(
+            database, database_host, session_profile)
 
     return db_connection, conn_description
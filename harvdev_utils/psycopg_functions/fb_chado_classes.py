@@ -13,6 +13,7 @@ import re
 import datetime
 import strict_rfc3339
 from harvdev_utils.char_conversions import sub_sup_sgml_to_html, sgml_to_unicode
+from harvdev_utils.psycopg_functions.row_constructors import is_int, objects_from_rows, regex_check
 
 log = logging.getLogger(__name__)
 
@@ -147,6 +148,37 @@ class Pub(object):
 
     obsolete = property(_get_obsolete, _set_obsolete)
 
+    # For bulk construction: the attributes (or property backing fields) holding each constructor arg.
+    row_attributes = (
+        '_Pub__pub_id', 'title', 'volumetitle', 'volume', 'series_name', 'issue', 'pyear', 'pages', 'miniref', 'type_id',
+        'is_obsolete', 'publisher', 'pubplace', 'uniquename'
+    )
+
+    @classmethod
+    def row_column_checks(cls):
+        """Get column checks equivalent to the property setter checks, for "from_rows()"."""
+        column_checks = [(0, 'pub_id', is_int, 'must be an integer')]
+        uniquename_regex = getattr(cls, 'uniquename_regex', None)
+        if uniquename_regex is not None:
+            column_checks.append((13, 'uniquename', regex_check(uniquename_regex), 'must match this regex: {}'.format(uniquename_regex)))
+        return column_checks
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Make many objects of this class from pub rows, validating whole columns at once.
+
+        Args:
+            arg1 (iterable): Row tuples, each having the Pub constructor args in order.
+
+        Returns:
+            list: A list of objects of this class, in row order.
+
+        Raises:
+            Raises a TypeError describing all bad rows, if any.
+
+        """
+        return objects_from_rows(cls, rows, cls.row_attributes, cls.row_column_checks())
+
 
 class Reference(Pub):
     """Define a FlyBase Reference object."""
@@ -225,6 +257,8 @@ class Reference(Pub):
 
     uniquename = property(_get_uniquename, _set_uniquename)
 
+    row_attributes = Pub.row_attributes[:-1] + ('_Reference__uniquename', )
+
     # Various methods for synthesizing and converting Reference attributes.
     def get_timelastmodified(self):
         """Collect all timestamps for the Reference object, take the latest, and convert to AGR spec."""
@@ -510,6 +544,8 @@ class Resource(Pub):
 
     uniquename = property(_get_uniquename, _set_uniquename)
 
+    row_attributes = Pub.row_attributes[:-1] + ('_Resource__uniquename', )
+
     # Various methods for synthesizing and converting Resource attributes.
     def get_agr_primary_id(self):
         """Pick and format primary ID for AGR reporting."""
@@ -710,6 +746,41 @@ class Cvterm(object):
 
     is_obsolete = property(_get_is_relationshiptype, _set_is_relationshiptype)
 
+    # For bulk construction: the attributes (or property backing fields) holding each constructor arg.
+    # Since "is_obsolete" is (re)defined with the "is_relationshiptype" getter/setter, is_obsolete values are kept in the
+    # "__is_relationshiptype" backing field, and is_relationshiptype values in a plain attribute.
+    row_attributes = (
+        '_Cvterm__cvterm_id', '_Cvterm__cv_id', 'definition', '_Cvterm__dbxref_id', '_Cvterm__is_relationshiptype',
+        'is_relationshiptype', 'name'
+    )
+
+    @classmethod
+    def row_column_checks(cls):
+        """Get column checks equivalent to the property setter checks, for "from_rows()"."""
+        column_checks = [
+            (0, 'cvterm_id', is_int, 'must be an integer'),
+            (1, 'cv_id', is_int, 'must be an integer'),
+            (3, 'dbxref_id', is_int, 'must be an integer'),
+            (4, 'is_obsolete', is_int, 'value must an integer'),
+        ]
+        return column_checks
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Make many Cvterm objects from cvterm rows, validating whole columns at once.
+
+        Args:
+            arg1 (iterable): Row tuples, each having the Cvterm constructor args in order.
+
+        Returns:
+            list: A list of Cvterm objects, in row order.
+
+        Raises:
+            Raises a TypeError describing all bad rows, if any.
+
+        """
+        return objects_from_rows(cls, rows, cls.row_attributes, cls.row_column_checks())
+
     def get_agr_term_id(self):
         """Determine CV term ID for AGR export, if applicable."""
         exportable_cvterm_db_list = ['DOID', 'FBbt', 'FBcv', 'FBdv', 'GO', 'SO']
@@ -11,6 +11,7 @@ Author(s):
 import logging
 import re
 from harvdev_utils.char_conversions import sub_sup_to_sgml, sub_sup_sgml_to_html, sgml_to_unicode
+from harvdev_utils.psycopg_functions.row_constructors import is_bool, is_int, objects_from_rows, regex_check
 
 log = logging.getLogger(__name__)
 
@@ -112,6 +113,39 @@ class Feature(object):
 
     obsolete = property(_get_obsolete, _set_obsolete)
 
+    # For bulk construction: the attributes (or property backing fields) holding each constructor arg.
+    row_attributes = (
+        '_Feature__feature_id', 'organism_id', 'name', '_Feature__uniquename', 'feature_type', '_Feature__analysis',
+        '_Feature__obsolete'
+    )
+
+    @classmethod
+    def row_column_checks(cls):
+        """Get column checks equivalent to the property setter checks, for "from_rows()"."""
+        column_checks = [
+            (0, 'feature_id', is_int, 'must be an integer'),
+            (3, 'uniquename', regex_check(cls.uniquename_regex), 'must match this regex: {}'.format(cls.uniquename_regex)),
+            (5, 'analysis', is_bool, 'value must be boolean'),
+            (6, 'obsolete', is_bool, 'value must be boolean'),
+        ]
+        return column_checks
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Make many objects of this class from feature rows, validating whole columns at once.
+
+        Args:
+            arg1 (iterable): Row tuples, each having the Feature constructor args in order.
+
+        Returns:
+            list: A list of objects of this class, in row order.
+
+        Raises:
+            Raises a TypeError describing all bad rows, if any.
+
+        """
+        return objects_from_rows(cls, rows, cls.row_attributes, cls.row_column_checks())
+
     # Methods for converting FB sub/superscripts to html, uniquefying synonym/ID lists.
     def get_agr_symbol(self):
         """Convert FB symbol_sgml to AGR format (proper html sub/superscripts."""
@@ -0,0 +1,320 @@
+"""Module:: feature_graph.
+
+Synopsis:
+    An in-memory index of feature_relationship edges, for multi-hop lookups without repeated db queries. Selected
+    relationship types are loaded once (current features only) into compact integer arrays: forward and reverse
+    adjacency in CSR (compressed sparse row) form, keyed by dense node indices, with a relationship type code per edge.
+
+    For example, alleles "associated_with" constructs via insertions:
+        graph = load_feature_graph(db_connection, ['associated_with', 'producedby'])
+        graph.hop(allele_feature_id, [('associated_with', False), ('producedby', False)])
+
+Author(s):
+    Gil dos Santos dossantos@morgan.harvard.edu
+
+"""
+
+import logging
+import re
+from array import array
+from harvdev_utils.psycopg_functions import NamedQuery, register_query, query_db
+
+log = logging.getLogger(__name__)
+
+# Edges between current features for the given relationship types, with feature uniquenames for naming nodes, and
+# is_analysis and organism_id for node filters.
+feature_relationships_by_type = NamedQuery('feature_relationships_by_type', """
+    SELECT fr.subject_id,
+           fr.object_id,
+           cvtfr.name,
+           s.uniquename,
+           o.uniquename,
+           s.is_analysis,
+           o.is_analysis,
+           s.organism_id,
+           o.organism_id
+    FROM feature_relationship fr
+    JOIN cvterm cvtfr ON cvtfr.cvterm_id = fr.type_id
+    JOIN feature s ON s.feature_id = fr.subject_id
+    JOIN feature o ON o.feature_id = fr.object_id
+    WHERE s.is_obsolete = false and
+          o.is_obsolete = false and
+          cvtfr.name = ANY(%(rel_types)s);
+    """)
+register_query(feature_relationships_by_type)
+
+# Rows fetched per round trip when loading edges.
+DEFAULT_LOAD_ITERSIZE = 50000
+
+
+class FeatureGraph(object):
+    """Define an immutable, typed, directed graph of features (subject -> object), with forward and reverse CSR indices."""
+
+    def __init__(self, edges):
+        """Build a FeatureGraph.
+
+        Args:
+            arg1 (iterable): Edge tuples of (subject feature_id, object feature_id, relationship type name), optionally
+                followed by (subject uniquename, object uniquename), then optionally by (subject is_analysis, object
+                is_analysis, subject organism_id, object organism_id).
+
+        Returns:
+            FeatureGraph: A "FeatureGraph" object.
+
+        """
+        self.rel_types = []                # Relationship type names, indexed by type code.
+        self._rel_type_codes = {}          # Relationship type name to type code.
+        self._node_indices = {}            # feature_id to dense node index.
+        self.node_feature_ids = array('q')    # Dense node index to feature_id.
+        self.node_uniquenames = []            # Dense node index to uniquename (None if not given).
+        self._uniquename_indices = {}         # Uniquename to dense node index.
+        self.node_is_analysis = array('B')    # Dense node index to is_analysis (0 if not given).
+        self.node_organism_ids = array('i')   # Dense node index to organism_id (0 if not given).
+        self.has_node_info = True             # False if any edge lacks is_analysis and organism_id.
+        subjects = array('i')
+        objects = array('i')
+        types = array('B')
+        for edge in edges:
+            if len(edge) > 8:
+                subject_info, object_info = (edge[5], edge[7]), (edge[6], edge[8])
+            else:
+                subject_info = object_info = (False, 0)
+                self.has_node_info = False
+            subjects.append(self._add_node(edge[0], edge[3] if len(edge) > 3 else None, *subject_info))
+            objects.append(self._add_node(edge[1], edge[4] if len(edge) > 4 else None, *object_info))
+            types.append(self._get_rel_type_code(edge[2], add=True))
+        node_cnt = len(self.node_feature_ids)
+        self.edge_cnt = len(subjects)
+        self._fwd_offsets, self._fwd_targets, self._fwd_types = self._build_csr(node_cnt, subjects, objects, types)
+        self._rev_offsets, self._rev_targets, self._rev_types = self._build_csr(node_cnt, objects, subjects, types)
+        log.info('Built feature graph of {} nodes and {} edges of {} types.'.format(node_cnt, self.edge_cnt, len(self.rel_types)))
+
+    def _add_node(self, feature_id, uniquename, is_analysis=False, organism_id=0):
+        try:
+            return self._node_indices[feature_id]
+        except KeyError:
+            index = len(self.node_feature_ids)
+            self._node_indices[feature_id] = index
+            self.node_feature_ids.append(feature_id)
+            self.node_uniquenames.append(uniquename)
+            self.node_is_analysis.append(1 if is_analysis else 0)
+            self.node_organism_ids.append(organism_id or 0)
+            if uniquename is not None:
+                self._uniquename_indices[uniquename] = index
+            return index
+
+    def _get_rel_type_code(self, rel_type, add=False):
+        try:
+            return self._rel_type_codes[rel_type]
+        except KeyError:
+            if add is False:
+                raise KeyError('The relationship type "{}" is not in the graph.'.format(rel_type))
+            if len(self.rel_types) == 256:
+                raise ValueError('A FeatureGraph can have at most 256 relationship types.')
+            self._rel_type_codes[rel_type] = len(self.rel_types)
+            self.rel_types.append(rel_type)
+            return self._rel_type_codes[rel_type]
+
+    @staticmethod
+    def _build_csr(node_cnt, sources, targets, types):
+        """Build CSR arrays by counting sort of edges on source node: edges from node n are at offsets[n]:offsets[n + 1]."""
+        offsets = array('q', bytes(8 * (node_cnt + 1)))
+        for source in sources:
+            offsets[source + 1] += 1
+        for i in range(node_cnt):
+            offsets[i + 1] += offsets[i]
+        csr_targets = array('i', bytes(4 * len(sources)))
+        csr_types = array('B', bytes(len(sources)))
+        next_slot = array('q', offsets[:-1])
+        for source, target, rel_type in zip(sources, targets, types):
+            slot = next_slot[source]
+            csr_targets[slot] = target
+            csr_types[slot] = rel_type
+            next_slot[source] = slot + 1
+        return offsets, csr_targets, csr_types
+
+    def __contains__(self, feature_id):
+        """Return True if the feature is in the graph (i.e., has any loaded relationship)."""
+        return feature_id in self._node_indices
+
+    def feature_id(self, uniquename):
+        """Get the feature_id for a uniquename, or None if not in the graph."""
+        index = self._uniquename_indices.get(uniquename)
+        return None if index is None else self.node_feature_ids[index]
+
+    def uniquename(self, feature_id):
+        """Get the uniquename for a feature_id, or None if not in the graph (or not loaded)."""
+        index = self._node_indices.get(feature_id)
+        return None if index is None else self.node_uniquenames[index]
+
+    def _neighbor_indices(self, index, type_code, reverse):
+        """Get the node indices one hop from a node index, optionally limited to one type code."""
+        if reverse is True:
+            offsets, targets, types = self._rev_offsets, self._rev_targets, self._rev_types
+        else:
+            offsets, targets, types = self._fwd_offsets, self._fwd_targets, self._fwd_types
+        start, end = offsets[index], offsets[index + 1]
+        if type_code is None:
+            return targets[start:end]
+        return [targets[i] for i in range(start, end) if types[i] == type_code]
+
+    def objects(self, feature_id, rel_type=None):
+        """Get the feature_ids of objects of a subject feature: i.e., "feature_id rel_type object".
+
+        Args:
+            arg1 (int): The subject feature_id.
+            rel_type (str): Optional. The relationship type; any type if not given.
+
+        Returns:
+            list: A list of object feature_ids (empty if the feature is not in the graph).
+
+        """
+        return self.hop(feature_id, [(rel_type, False)])
+
+    def subjects(self, feature_id, rel_type=None):
+        """Get the feature_ids of subjects of an object feature: i.e., "subject rel_type feature_id".
+
+        Args:
+            arg1 (int): The object feature_id.
+            rel_type (str): Optional. The relationship type; any type if not given.
+
+        Returns:
+            list: A list of subject feature_ids (empty if the feature is not in the graph).
+
+        """
+        return self.hop(feature_id, [(rel_type, True)])
+
+    def hop(self, feature_id, steps):
+        """Follow one or more relationship steps from a feature.
+
+        Args:
+            arg1 (int): The starting feature_id.
+            arg2 (list): A list of (rel_type, reverse) tuples: "rel_type" (str) is the relationship type (or None for
+                any type); "reverse" (bool) is False to go from subject to object, True to go from object to subject.
+
+        Returns:
+            list: A sorted list of unique feature_ids reached after the last step.
+
+        """
+        index = self._node_indices.get(feature_id)
+        if index is None:
+            return []
+        return sorted(self.node_feature_ids[i] for i in self._hop_indices(index, steps))
+
+    def _hop_indices(self, index, steps, keep_node=None):
+        """Get the node indices reached from a node index by some steps.
+
+        If given, keep_node(step_number, node_index) must be True for nodes reached by each step (except the last).
+        """
+        frontier = {index}
+        for step_number, (rel_type, reverse) in enumerate(steps):
+            type_code = None if rel_type is None else self._rel_type_codes.get(rel_type, -1)
+            next_frontier = set()
+            for node in frontier:
+                next_frontier.update(self._neighbor_indices(node, type_code, reverse))
+            if keep_node is not None and step_number < len(steps) - 1:
+                next_frontier = {i for i in next_frontier if keep_node(step_number, i)}
+            frontier = next_frontier
+        return frontier
+
+    def two_hop(self, feature_id, rel_type_1, rel_type_2, reverse=False):
+        """Get features two hops away: i.e., "feature_id rel_type_1 intermediate rel_type_2 object" (or the reverse).
+
+        Args:
+            arg1 (int): The starting feature_id.
+            arg2 (str): The relationship type of the first step.
+            arg3 (str): The relationship type of the second step.
+            reverse (bool): Optional. If True, follow both steps from object to subject.
+
+        Returns:
+            list: A sorted list of unique feature_ids.
+
+        """
+        return self.hop(feature_id, [(rel_type_1, reverse), (rel_type_2, reverse)])
+
+    def _node_matches(self, index, pattern=None, exclude_analysis=False, organism_id=None):
+        """Check a node against optional filters: uniquename regex, is_analysis = false, and organism_id."""
+        if pattern is not None:
+            uniquename = self.node_uniquenames[index]
+            if uniquename is None or not pattern.search(uniquename):
+                return False
+        if exclude_analysis is True and self.node_is_analysis[index]:
+            return False
+        if organism_id is not None and self.node_organism_ids[index] != organism_id:
+            return False
+        return True
+
+    def uniquename_pairs(self, steps, start_regex=None, end_regex=None, intermediate_regexes=None, exclude_analysis=False,
+                         start_organism_id=None, end_organism_id=None):
+        """Get (start uniquename, end uniquename) pairs for features linked by some steps, as from the "rel_features"-type queries.
+
+        The pairs can be merged with "merge_list_info()". As all loaded features are current, these give the same pairs
+        as the queries below (where "rel" is the relationship type, and each regex is that of the query):
+            rel_features:           [(rel, False)], start_regex=subject regex, end_regex=object regex
+            rel_features_rev:       [(rel, True)], start_regex=object regex, end_regex=subject regex
+            rel_dmel_features:      as rel_features, with end_organism_id=1
+            rel_dmel_features_rev:  as rel_features_rev, with end_organism_id=1
+            indirect_rel_features:  [(rel_1, False), (rel_2, False)], start_regex=subject regex,
+                                    intermediate_regexes=[intermediate regex], end_regex=object regex,
+                                    exclude_analysis=True
+
+        Args:
+            arg1 (list): A list of (rel_type, reverse) steps, as for "hop()".
+            start_regex (str): Optional. A regex that starting feature uniquenames must match.
+            end_regex (str): Optional. A regex that ending feature uniquenames must match.
+            intermediate_regexes (list): Optional. For each step but the last, a regex (or None) that uniquenames of
+                features reached by that step must match.
+            exclude_analysis (bool): Optional. If True, leave out paths through any feature with is_analysis = true.
+            start_organism_id (int): Optional. The organism_id that starting features must have.
+            end_organism_id (int): Optional. The organism_id that ending features must have.
+
+        Returns:
+            list: A list of (uniquename, uniquename) tuples, sorted.
+
+        Raises:
+            Raises an exception if is_analysis or organism filters are used on a graph built without that info, or if
+                there are too many intermediate regexes.
+
+        """
+        if (exclude_analysis is True or start_organism_id is not None or end_organism_id is not None) and self.has_node_info is False:
+            raise ValueError('This feature graph has no is_analysis/organism_id info to filter on.')
+        intermediate_regexes = list(intermediate_regexes or [])
+        if len(intermediate_regexes) > max(len(steps) - 1, 0):
+            raise ValueError('Only {} intermediate regexes are possible for {} steps.'.format(max(len(steps) - 1, 0), len(steps)))
+        intermediate_patterns = [re.compile(i) if i is not None else None for i in intermediate_regexes]
+        intermediate_patterns += [None] * (len(steps) - 1 - len(intermediate_patterns))
+        start_pattern = re.compile(start_regex) if start_regex is not None else None
+        end_pattern = re.compile(end_regex) if end_regex is not None else None
+
+        def keep_intermediate(step_number, index):
+            return self._node_matches(index, intermediate_patterns[step_number], exclude_analysis)
+
+        pairs = []
+        for index, start_uniquename in enumerate(self.node_uniquenames):
+            if start_uniquename is None or not self._node_matches(index, start_pattern, exclude_analysis, start_organism_id):
+                continue
+            for end_index in self._hop_indices(index, steps, keep_intermediate):
+                end_uniquename = self.node_uniquenames[end_index]
+                if end_uniquename is None or not self._node_matches(end_index, end_pattern, exclude_analysis, end_organism_id):
+                    continue
+                pairs.append((start_uniquename, end_uniquename))
+        return sorted(pairs)
+
+
+def load_feature_graph(db_connection, rel_types, itersize=DEFAULT_LOAD_ITERSIZE):
+    """Load feature_relationship edges of some types between current features into a FeatureGraph.
+
+    Args:
+        arg1 (psycopg2.extensions.connection): A psycopg2 db connection.
+        arg2 (list): The relationship type names (cvterm.name) to load: e.g., ['associated_with', 'producedby'].
+        itersize (int): Optional. The number of rows to fetch per round trip.
+
+    Returns:
+        FeatureGraph: The graph of loaded edges.
+
+    """
+    log.info('Loading feature relationships of these types: {}'.format(rel_types))
+    query_variable = {'rel_types': list(rel_types)}
+    db_results = query_db(db_connection, feature_relationships_by_type.sql, itersize=itersize, query_variable=query_variable)
+
+    return FeatureGraph(db_results)
@@ -0,0 +1,92 @@
+"""Module:: feature_scope.
+
+Synopsis:
+    Loads a selected set of feature_ids into a session-scoped temporary table (via COPY), and rewrites enrichment
+    queries to join against that table instead of re-filtering the whole feature table by uniquename regex.
+    Temporary tables exist only for the connection (db session) that created them: run scoped queries on that same
+    connection, and don't roll back the transaction that created the table. So scoped queries cannot go through a
+    DbConnectionPool or "run_enrichment_plan()", which run each query on some other pooled connection.
+    Creating the table is a write: the connection must not be read-only (i.e., not the "bulk_read" or "interactive"
+    session profiles, nor a "--snapshot" transaction); use the "loader" profile.
+
+Author(s):
+    Gil dos Santos dossantos@morgan.harvard.edu
+
+"""
+
+import hashlib
+import io
+import logging
+import re
+from harvdev_utils.psycopg_functions.result_cache import RESULT_CACHE
+
+log = logging.getLogger(__name__)
+
+# Default name for the temporary table of feature_ids.
+DEFAULT_SCOPE_TABLE = 'harvdev_feature_scope'
+
+
+def load_feature_scope_table(db_connection, feature_ids, scope_table=DEFAULT_SCOPE_TABLE):
+    """Load feature_ids into a temporary table for the current db session, replacing any previous contents.
+
+    Args:
+        arg1 (psycopg2.extensions.connection): A psycopg2 db connection.
+        arg2 (iterable): The feature.feature_id values (integers) to load.
+        scope_table (str): The name of the temporary table.
+
+    Returns:
+        int: The number of feature_ids loaded.
+
+    Raises:
+        Raises a ValueError for an invalid table name, or if the connection is in a read-only transaction.
+
+    """
+    if not re.match(r'^[A-Za-z_][A-Za-z0-9_]*$', scope_table):
+        raise ValueError('Invalid temporary table name: {}'.format(scope_table))
+    feature_ids = sorted(set(feature_ids))
+    cursor = db_connection.cursor()
+    cursor.execute('SHOW transaction_read_only;')
+    if cursor.fetchone()[0] == 'on':
+        cursor.close()
+        raise ValueError('Cannot create temporary table {} in a read-only transaction (e.g., a "bulk_read" or "interactive" '
+                         'session profile, or a snapshot): use the "loader" session profile.'.format(scope_table))
+    cursor.execute('CREATE TEMPORARY TABLE IF NOT EXISTS {} (feature_id integer PRIMARY KEY);'.format(scope_table))
+    cursor.execute('TRUNCATE {};'.format(scope_table))
+    id_text = ''.join('{}\n'.format(i) for i in feature_ids)
+    cursor.copy_from(io.StringIO(id_text), scope_table, columns=('feature_id', ))
+    # Give the planner row counts for the new table.
+    cursor.execute('ANALYZE {};'.format(scope_table))
+    cursor.close()
+    # Cached results of queries joining the table are only valid for the same table contents.
+    RESULT_CACHE.note_table_contents(scope_table, hashlib.sha256(id_text.encode('ascii')).hexdigest())
+    log.info('Loaded {} feature_ids into temporary table {}.'.format(len(feature_ids), scope_table))
+
+    return len(feature_ids)
+
+
+def scope_sql_query(sql_query, scope_table=DEFAULT_SCOPE_TABLE, alias='f'):
+    """Rewrite an sql query so that some aliased feature table is restricted to the feature_ids in a scope table.
+
+    Each "FROM feature <alias>" becomes "FROM <scope_table> JOIN feature <alias> ON <alias>.feature_id = ...", so the
+    query starts from the small, already-filtered set of feature_ids. Other filters (e.g., uniquename regex) are kept
+    and become cheap rechecks. Works on ".format()" templates as well as formatted queries.
+
+    Args:
+        arg1 (str): An sql query: e.g., sql_queries.feat_symbol_synonyms.
+        scope_table (str): The name of the temporary table loaded by "load_feature_scope_table()".
+        alias (str): The alias of the feature table to restrict: e.g., "f"; or "s" for the subject of "rel_features".
+
+    Returns:
+        str: The scoped sql query, to run on the connection that loaded the scope table (not via a connection pool).
+
+    Raises:
+        Raises an exception if the query has no "FROM feature <alias>" to restrict.
+
+    """
+    pattern = re.compile(r'\bFROM feature {}\b'.format(re.escape(alias)), re.IGNORECASE)
+    replacement = 'FROM {0} {0}_{1} JOIN feature {1} ON {1}.feature_id = {0}_{1}.feature_id'.format(scope_table, alias)
+    scoped_sql_query, count = pattern.subn(replacement, sql_query)
+    if count == 0:
+        raise ValueError('The sql query has no "FROM feature {}" clause to scope.'.format(alias))
+
+    return scoped_sql_query
@@ -0,0 +1,344 @@
+"""Module:: feature_snapshot.
+
+Synopsis:
+    A memory-mapped, columnar file of enriched feature objects, for reuse across scripts without db queries. One
+    script builds a feature dict (e.g., all FBgn, with symbols and synonyms) and saves it with
+    "write_feature_snapshot()"; others open it with "FeatureSnapshot", which maps the file read-only and decodes values
+    only when accessed, so that opening takes about as long as reading the header.
+
+    File layout: an 8-byte magic string; the header length (uint64); a JSON header describing the columns; then the
+    column sections, each 8-byte aligned. Rows are sorted by uniquename, so that lookups are binary searches. Columns
+    are typed: "int" (int64 values), "bool" (int8 values), "str" (int64 offsets into a UTF-8 string pool), and
+    "str_list"/"str_set" (int64 offsets into a list of strings); each also has a null flag per row.
+
+    Typical use:
+        write_feature_snapshot(gene_dict, '/src/output/FBgn_snapshot.fbs', database=set_up_dict['database'])
+        with FeatureSnapshot('/src/output/FBgn_snapshot.fbs') as genes:
+            genes['FBgn0284084'].symbol_sgml
+
+Author(s):
+    Gil dos Santos dossantos@morgan.harvard.edu
+
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left
+from harvdev_utils.psycopg_functions import fb_feature_classes, exported_attributes, DIFF_EXCLUDED_ATTRIBUTES
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b'HVFSNAP1'
+SNAPSHOT_VERSION = 1
+# Always stored (if set), though left out of release diffs.
+SNAPSHOT_EXTRA_ATTRIBUTES = ('feature_id', 'organism_id')
+# Column types, by Python type of the values.
+COLUMN_TYPES = {bool: 'bool', int: 'int', str: 'str', list: 'str_list', tuple: 'str_list', set: 'str_set', frozenset: 'str_set'}
+
+
+def _column_type(attribute, values):
+    """Get the column type for a list of attribute values (None values are allowed in any column)."""
+    value_types = {COLUMN_TYPES.get(type(value)) for value in values if value is not None}
+    if not value_types:
+        return None
+    if len(value_types) > 1 or None in value_types:
+        raise TypeError('Cannot store "{}" values of types {} in a feature snapshot column.'.format(
+            attribute, sorted({type(value).__name__ for value in values if value is not None})))
+    column_type = value_types.pop()
+    if column_type in ('str_list', 'str_set'):
+        for value in values:
+            if value is not None and not all(isinstance(item, str) for item in value):
+                raise TypeError('Only lists or sets of str can be stored in a feature snapshot: "{}" has {}.'.format(attribute, value))
+    return column_type
+
+
+def _string_pool(strings):
+    """Encode strings as (int64 offsets, UTF-8 data): string i is data[offsets[i]:offsets[i + 1]]."""
+    offsets = array('q', [0])
+    data = bytearray()
+    for string in strings:
+        data += string.encode('utf-8')
+        offsets.append(len(data))
+    return offsets, data
+
+
+def _encode_column(column_type, values):
+    """Encode a column's values as a dict of named sections (bytes-like objects)."""
+    sections = {'nulls': bytes(value is None for value in values)}
+    if column_type == 'int':
+        sections['values'] = array('q', (0 if value is None else value for value in values))
+    elif column_type == 'bool':
+        sections['values'] = array('b', (0 if value is None else int(value) for value in values))
+    elif column_type == 'str':
+        sections['offsets'], sections['data'] = _string_pool('' if value is None else value for value in values)
+    else:
+        list_offsets = array('q', [0])
+        items = []
+        for value in values:
+            if value is not None:
+                items.extend(sorted(value) if column_type == 'str_set' else value)
+            list_offsets.append(len(items))
+        sections['list_offsets'] = list_offsets
+        sections['offsets'], sections['data'] = _string_pool(items)
+    return sections
+
+
+def write_feature_snapshot(data_dict, filename, attributes=None, database=None):
+    """Write a dict of feature objects to a memory-mappable snapshot file (written to a temp file, then renamed).
+
+    Args:
+        arg1 (dict): A uniquename-keyed dict of Feature (or subclass) objects, all of the same class.
+        arg2 (str): The output snapshot file.
+        attributes (list): Optional. The attributes to store. By default, all public attributes (including properties
+            like "uniquename") whose values are int, bool, str, or lists/sets of str; others are skipped.
+        database (str): Optional. The source database name, for the record.
+
+    Raises:
+        Raises a TypeError if objects are of different classes, or if requested attributes have unsupported values.
+
+    """
+    uniquenames = sorted(data_dict.keys())
+    feature_classes = {type(data_dict[uniquename]) for uniquename in uniquenames}
+    if len(feature_classes) > 1:
+        raise TypeError('Feature snapshot objects must all be of one class, not {}.'.format(sorted(i.__name__ for i in feature_classes)))
+    # All public attributes of the objects, stored or not: views give None for those not stored.
+    class_attributes = set(SNAPSHOT_EXTRA_ATTRIBUTES)
+    for feature in data_dict.values():
+        class_attributes.update(exported_attributes(feature))
+    if uniquenames:
+        class_attributes.update(i for i in DIFF_EXCLUDED_ATTRIBUTES if hasattr(data_dict[uniquenames[0]], i))
+    requested_attributes = attributes
+    if attributes is None:
+        attributes = class_attributes - DIFF_EXCLUDED_ATTRIBUTES | set(SNAPSHOT_EXTRA_ATTRIBUTES)
+    attributes = sorted(set(attributes) | {'uniquename'})
+    columns = {}
+    for attribute in attributes:
+        values = [getattr(data_dict[uniquename], attribute, None) for uniquename in uniquenames]
+        try:
+            column_type = _column_type(attribute, values)
+        except TypeError:
+            if requested_attributes is not None:
+                raise
+            log.debug('Not storing "{}" in the feature snapshot: its values are not of a supported type.'.format(attribute))
+            continue
+        if column_type is not None:
+            columns[attribute] = (column_type, _encode_column(column_type, values))
+
+    # Lay out the column sections after the header, each 8-byte aligned.
+    header = {
+        'version': SNAPSHOT_VERSION,
+        'feature_class': feature_classes.pop().__name__.replace('Compact', '') if uniquenames else 'Feature',
+        'database': database,
+        'row_count': len(uniquenames),
+        'class_attributes': sorted(class_attributes | {'uniquename'}),
+        'columns': {},
+    }
+    section_list = []
+    position = 0
+    for attribute, (column_type, sections) in columns.items():
+        header['columns'][attribute] = {'type': column_type, 'sections': {}}
+        for section_name, section in sections.items():
+            section_bytes = memoryview(section).cast('B')
+            header['columns'][attribute]['sections'][section_name] = [position, len(section_bytes)]
+            section_list.append(section_bytes)
+            position += len(section_bytes) + (-len(section_bytes) % 8)
+    header_bytes = json.dumps(header).encode('utf-8')
+    header_bytes += b' ' * (-(len(SNAPSHOT_MAGIC) + 8 + len(header_bytes)) % 8)
+    temp_filename = filename + '.tmp'
+    with open(temp_filename, 'wb') as snapshot_file:
+        snapshot_file.write(SNAPSHOT_MAGIC)
+        snapshot_file.write(struct.pack('<Q', len(header_bytes)))
+        snapshot_file.write(header_bytes)
+        for section_bytes in section_list:
+            snapshot_file.write(section_bytes)
+            snapshot_file.write(bytes(-len(section_bytes) % 8))
+    os.replace(temp_filename, filename)
+    log.info('Wrote snapshot of {} features ({} attributes) to {}.'.format(len(uniquenames), len(columns), filename))
+
+    return
+
+
+class FeatureView(object):
+    """Define a read-only, Feature-like view of one row of a FeatureSnapshot; attributes are decoded when read."""
+
+    __slots__ = ('_snapshot', '_row')
+
+    def __init__(self, snapshot, row):
+        """Initialize a FeatureView for a row of a FeatureSnapshot."""
+        object.__setattr__(self, '_snapshot', snapshot)
+        object.__setattr__(self, '_row', row)
+
+    def __getattr__(self, name):
+        """Read an attribute from the snapshot; only called for names other than "_snapshot" and "_row".
+
+        Attributes of the original objects that were not stored (e.g., all None, or of an unsupported type) are None.
+        """
+        try:
+            return self._snapshot.value(name, self._row)
+        except KeyError:
+            if name in self._snapshot.class_attributes:
+                return None
+            raise AttributeError('"{}" feature snapshot has no attribute "{}"'.format(self._snapshot.feature_class, name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Feature snapshot views are read-only.')
+
+    def __repr__(self):
+        return '<{} view of {}>'.format(self._snapshot.feature_class, self.uniquename)
+
+    def materialize(self):
+        """Get a new, writable feature object (of the original class, e.g., Gene) with the stored attributes."""
+        feature_class = getattr(fb_feature_classes, self._snapshot.feature_class)
+        row_values = [getattr(self, i, None) for i in ('feature_id', 'organism_id', 'name', 'uniquename', 'feature_type', 'analysis', 'obsolete')]
+        feature = feature_class(*row_values)
+        for attribute in self._snapshot.attributes:
+            setattr(feature, attribute, self._snapshot.value(attribute, self._row))
+        return feature
+
+
+class _UniquenameColumn(object):
+    """Sequence of uniquenames, decoded on access, for binary search."""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def __len__(self):
+        return self.snapshot.row_count
+
+    def __getitem__(self, row):
+        return self.snapshot.value('uniquename', row)
+
+
+class FeatureSnapshot(object):
+    """Define a read-only, uniquename-keyed mapping of FeatureView objects, from a memory-mapped snapshot file."""
+
+    def __init__(self, filename):
+        """Open a feature snapshot file written by "write_feature_snapshot()".
+
+        Args:
+            arg1 (str): The snapshot file.
+
+        Returns:
+            FeatureSnapshot: A "FeatureSnapshot" object; close it (or use it as a context manager) when done.
+
+        Raises:
+            Raises a ValueError if the file is not a feature snapshot of a supported version.
+
+        """
+        self.filename = filename
+        with open(filename, 'rb') as snapshot_file:
+            self._mmap = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            self._mmap.close()
+            raise ValueError('{} is not a feature snapshot file.'.format(filename))
+        header_start = len(SNAPSHOT_MAGIC) + 8
+        header_length = struct.unpack('<Q', self._mmap[len(SNAPSHOT_MAGIC):header_start])[0]
+        header = json.loads(self._mmap[header_start:header_start + header_length].decode('utf-8'))
+        if header['version'] != SNAPSHOT_VERSION:
+            self._mmap.close()
+            raise ValueError('{} is a version {} feature snapshot; only version {} is supported.'.format(
+                filename, header['version'], SNAPSHOT_VERSION))
+        self.feature_class = header['feature_class']
+        self.database = header['database']
+        self.row_count = header['row_count']
+        self.column_types = {attribute: column['type'] for attribute, column in header['columns'].items()}
+        self.attributes = sorted(self.column_types.keys())
+        self.class_attributes = frozenset(header.get('class_attributes', self.attributes))
+        data_start = header_start + header_length
+        self._buffer = memoryview(self._mmap)
+        self._sections = {}
+        for attribute, column in header['columns'].items():
+            for section_name, (offset, length) in column['sections'].items():
+                section = self._buffer[data_start + offset:data_start + offset + length]
+                if section_name in ('offsets', 'list_offsets', 'values'):
+                    section = section.cast('b' if column['type'] == 'bool' and section_name == 'values' else 'q')
+                self._sections[attribute, section_name] = section
+        self._uniquenames = _UniquenameColumn(self)
+        log.info('Opened snapshot of {} {} features from database {}.'.format(self.row_count, self.feature_class, self.database))
+
+    def _string(self, attribute, index):
+        offsets = self._sections[attribute, 'offsets']
+        return str(self._sections[attribute, 'data'][offsets[index]:offsets[index + 1]], 'utf-8')
+
+    def value(self, attribute, row):
+        """Get the value of an attribute for a row.
+
+        Args:
+            arg1 (str): The attribute name.
+            arg2 (int): The row number.
+
+        Returns:
+            The decoded value: an int, bool, str, list or set; or None.
+
+        Raises:
+            Raises a KeyError if the attribute is not in the snapshot.
+
+        """
+        column_type = self.column_types[attribute]
+        if self._sections[attribute, 'nulls'][row]:
+            return None
+        if column_type == 'int':
+            return self._sections[attribute, 'values'][row]
+        if column_type == 'bool':
+            return self._sections[attribute, 'values'][row] == 1
+        if column_type == 'str':
+            return self._string(attribute, row)
+        list_offsets = self._sections[attribute, 'list_offsets']
+        items = [self._string(attribute, i) for i in range(list_offsets[row], list_offsets[row + 1])]
+        return set(items) if column_type == 'str_set' else items
+
+    def _find_row(self, uniquename):
+        row = bisect_left(self._uniquenames, uniquename)
+        if row < self.row_count and self._uniquenames[row] == uniquename:
+            return row
+        return None
+
+    def __len__(self):
+        return self.row_count
+
+    def __contains__(self, uniquename):
+        return self._find_row(uniquename) is not None
+
+    def __getitem__(self, uniquename):
+        row = self._find_row(uniquename)
+        if row is None:
+            raise KeyError(uniquename)
+        return FeatureView(self, row)
+
+    def get(self, uniquename, default=None):
+        """Get the FeatureView for a uniquename, or a default if not in the snapshot."""
+        row = self._find_row(uniquename)
+        return default if row is None else FeatureView(self, row)
+
+    def __iter__(self):
+        return (self._uniquenames[row] for row in range(self.row_count))
+
+    def keys(self):
+        """Iterate over uniquenames, in sorted order."""
+        return iter(self)
+
+    def values(self):
+        """Iterate over FeatureViews, in uniquename order."""
+        return (FeatureView(self, row) for row in range(self.row_count))
+
+    def items(self):
+        """Iterate over (uniquename, FeatureView) tuples, in uniquename order."""
+        return ((self._uniquenames[row], FeatureView(self, row)) for row in range(self.row_count))
+
+    def close(self):
+        """Unmap the file; views from the snapshot can no longer be read."""
+        for section in self._sections.values():
+            section.release()
+        self._buffer.release()
+        self._mmap.close()
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -9,19 +9,81 @@ Author(s):
 """
 
 import logging
+from itertools import islice
 from harvdev_utils.psycopg_functions import (
-    connect, current_features_by_uname_regex, Allele, Construct, Feature, Gene, SeqFeat, Tool
+    connect, connect_stream, copy_query, feat_synonyms_and_ids, get_named_query, rewrite_uniquename_regex_filters,
+    rewrite_uniquename_regex_params,
+    load_feature_scope_table, Allele, Construct, Feature, Gene, SeqFeat, Tool, COMPACT_CLASSES
 )
+from harvdev_utils.psycopg_functions.query_profiler import PROFILER
+from harvdev_utils.psycopg_functions.result_cache import RESULT_CACHE
 
 log = logging.getLogger(__name__)
 
 
-def get_features_by_uname_regex(db_connection, feat_regex):
+def query_db(db_connection, formatted_sql_query, itersize=None, query_variable='no_query', use_copy=False):
+    """Run a formatted sql query, either fetching all results at once or streaming them.
+
+    Args:
+        arg1 (psycopg2.extensions.connection): A psycopg2 db connection.
+        arg2 (str): A string representing an sql query (with any "{}" placeholders already filled in).
+        itersize (int): Optional. If given, stream results from a server-side cursor, fetching this many rows at a time.
+        query_variable (tuple or dict): Optional bind parameter values for the query (see "connect()").
+        use_copy (bool): Optional. If True, fetch all results via "COPY ... TO STDOUT" (see "copy_query()").
+            Much faster for big result sets, but all values come back as strings (or None).
+
+    Returns:
+        list or generator: A list of tuples (db_results); or, if "itersize" is given, a generator of such tuples.
+
+    Raises:
+        Raises an exception if "use_copy" is combined with "itersize" or "query_variable".
+
+    Notes:
+        If the result cache is enabled (see "result_cache"), fetched results are cached, and cached results are used
+        instead of querying the db. Streamed queries (with "itersize") are not cached.
+
+    """
+    log.debug('Using this query string: {}'.format(formatted_sql_query))
+    if query_variable != 'no_query':
+        log.debug('Using these query values: {}'.format(query_variable))
+    if use_copy is True and (itersize is not None or query_variable != 'no_query'):
+        raise ValueError('The "use_copy" option cannot be combined with "itersize" or "query_variable".')
+    if RESULT_CACHE.enabled and itersize is None:
+        cache_key = RESULT_CACHE.make_key(formatted_sql_query, query_variable, mode='copy' if use_copy else 'fetchall')
+        db_results = RESULT_CACHE.get(cache_key)
+        if db_results is not None:
+            log.info('Found {} results for this query (cached).'.format(len(db_results)))
+            return db_results
+    else:
+        cache_key = None
+
+    if use_copy is True:
+        db_results = copy_query(formatted_sql_query, db_connection)
+        log.info('Found {} results for this query (via COPY).'.format(len(db_results)))
+    elif itersize is None:
+        db_results = connect(formatted_sql_query, query_variable, db_connection)
+        log.info('Found {} results for this query.'.format(len(db_results)))
+    else:
+        log.info('Streaming results for this query, {} rows at a time.'.format(itersize))
+        db_results = connect_stream(formatted_sql_query, query_variable, db_connection, itersize=itersize)
+
+    if cache_key is not None:
+        RESULT_CACHE.put(cache_key, db_results)
+
+    return db_results
+
+
+def get_features_by_uname_regex(db_connection, feat_regex, itersize=None, scope_table=None, compact=False):
     """Get all current, non-analysis features for a given uniquename regex.
 
     Args:
         arg1 (psycopg2.extensions.connection): A psycopg2 db connection.
         arg2 (str): The regex for a FlyBase feature type of interest: e.g., r'^FBgn[0-9]{7}$'.
+        itersize (int): Optional. If given, stream features from the db this many rows at a time (see "query_db()").
+        scope_table (str): Optional. If given, load the feature_ids found into a temporary table of this name, so
+            that later queries on this connection can join to it (see "feature_scope.scope_sql_query()"). The
+            connection must not be read-only (see "feature_scope.load_feature_scope_table()").
+        compact (bool): Optional. If True, make memory-compact objects (see "compact_feature_classes").
 
     Returns:
         dict: A feature.uniquename-keyed dict of Feature-type objects (appropriate object type for FB-ID type).
@@ -45,22 +107,31 @@ def get_features_by_uname_regex(db_connection, feat_regex):
         ThisFeature = Feature
         log.info('The feature.uniquename regex "{}" does not correspond to a specific Feature type. \
                   Using generic Feature Class: "{}".'.format(feat_regex, str(ThisFeature)))
+    if compact is True:
+        ThisFeature = COMPACT_CLASSES[ThisFeature]
 
-    formatted_sql_query = current_features_by_uname_regex.format(feat_regex)
-    log.debug('Using this query string: {}'.format(formatted_sql_query))
-    db_results = connect(formatted_sql_query, 'no_query', db_connection)
-    log.info('Found {} results for this query.'.format(len(db_results)))
+    # The regex is passed as a bind parameter, so it need not be escaped.
+    named_query = get_named_query('current_features_by_uname_regex')
+    query_variable = {'uname_regex': feat_regex}
+    sql_query = rewrite_uniquename_regex_params(named_query.sql, query_variable)
+    db_results = query_db(db_connection, sql_query, itersize=itersize, query_variable=query_variable)
 
+    # Rows are (feature_id, organism_id, name, uniquename, type, is_analysis, is_obsolete): as for Feature class args.
+    # Objects are made in bulk, a batch of rows at a time if streaming.
     feature_dict = {}
-    for row in db_results:
-        feat_id = row[0]
-        org_abbr = row[1]
-        fname = row[2]
-        uname = row[3]
-        ftype = row[4]
-        analysis = row[5]
-        obsolete = row[6]
-        feature_dict[uname] = ThisFeature(feat_id, org_abbr, fname, uname, ftype, analysis, obsolete)
+    batch_size = itersize
+    db_results = iter(db_results)
+    while True:
+        batch = list(islice(db_results, batch_size))
+        if not batch:
+            break
+        for feature in ThisFeature.from_rows(batch):
+            feature_dict[feature.uniquename] = feature
+        if batch_size is None:
+            break
+
+    if scope_table is not None:
+        load_feature_scope_table(db_connection, [i.feature_id for i in feature_dict.values()], scope_table=scope_table)
 
     log.info('Returning feature dict with {} entries.\n'.format(len(feature_dict.keys())))
 
@@ -124,12 +195,14 @@ def format_sql_query(sql_query, *arguments):
 
     Returns:
         str: A formatted sql query that combines query with arguments (if needed).
+            Uniquename regex filters for FlyBase ID patterns are made index-friendly (see "uniquename_regex").
 
     """
     if len(arguments) == 0:
         formatted_sql_query = sql_query
     else:
         formatted_sql_query = sql_query.format(*arguments)
+    formatted_sql_query = rewrite_uniquename_regex_filters(formatted_sql_query)
 
     return formatted_sql_query
 
@@ -156,6 +229,26 @@ def check_unique_results(db_results):
     return
 
 
+def check_unique_results_stream(db_results):
+    """Pass through streamed db results, checking that keys (column 1 values) appear only once.
+
+    Args:
+        arg1 (iterable): An iterable of tuples (sql db results), e.g., a generator from "connect_stream()".
+
+    Yields:
+        tuple: Each row of the input db results, unchanged.
+
+    Raises:
+        Will raise an exception as soon as a value in column 1 is seen a second time.
+    """
+    seen_keys = set()
+    for row in db_results:
+        if row[0] in seen_keys:
+            raise ValueError('Values in the first column are not unique. Try "add_list_info" function instead.')
+        seen_keys.add(row[0])
+        yield row
+
+
 def check_key_overlap(data_dict, db_results):
     """Check overlap of "data_dict" keys with "db_results" keys (column 1).
 
@@ -255,7 +348,7 @@ def build_list_db_result_dict(db_results):
     return db_dict
 
 
-def add_unique_info(data_dict, attribute, db_connection, sql_query, *arguments):
+def add_unique_info(data_dict, attribute, db_connection, sql_query, *arguments, itersize=None, use_copy=False):
     """Add a unique value for a given attribute to each object in some ID-keyed data_dict.
 
     For example, get current symbol for each Gene object.
@@ -268,6 +361,8 @@ def add_unique_info(data_dict, attribute, db_connection, sql_query, *arguments):
         arg4 (str): A string representing an sql query.
         *arg: A list of arguments to be added into sql query by the .format() method.
         The data_dict FB-ID keys will be matched up to values in column 1 of db results for info transfer.
+        itersize (int): Optional. If given, stream db results this many rows at a time (see "query_db()").
+        use_copy (bool): Optional. If True, fetch db results via COPY; values will be strings (see "query_db()").
 
     Returns:
         dict: The input "data_dict", but now with values from the db added to "attribute" specified for objects.
@@ -278,7 +373,8 @@ def add_unique_info(data_dict, attribute, db_connection, sql_query, *arguments):
         Raises a warning if no overlap of data_dict keys with db_results, via "check_key_overlap()".
 
     Raises:
-        Raises an exception if values in column 1 of db_results are not unique, via "check_unique_results()".
+        Raises an exception if values in column 1 of db_results are not unique, via "check_unique_results()" (the data_dict is then
+            left unchanged, even for streamed results).
             In other words, the expectation is that each FB ID-keyed object has only one result in the db.
             For example, finding multiple "current symbols" for a gene would be unexpected - raise in that case.
 
@@ -286,18 +382,81 @@ def add_unique_info(data_dict, attribute, db_connection, sql_query, *arguments):
     # Perform the query.
     log.info('Adding unique db info to this attribute: {}'.format(attribute))
     formatted_sql_query = format_sql_query(sql_query, *arguments)
-    log.debug('Using this query string: {}'.format(formatted_sql_query))
-    db_results = connect(formatted_sql_query, 'no_query', db_connection)
-    log.info('Found {} results for this query.'.format(len(db_results)))
+    with PROFILER.label_queries(attribute):
+        db_results = query_db(db_connection, formatted_sql_query, itersize=itersize, use_copy=use_copy)
+        with PROFILER.profile_merge():
+            data_dict = merge_unique_info(data_dict, attribute, db_results, streamed=itersize is not None)
 
-    # Check there's only one row per "db_results" key (i.e, row's first value).
-    check_unique_results(db_results)
+    return data_dict
 
-    # Check that data_dict keys overlap with values in column one of db results.
-    check_key_overlap(data_dict, db_results)
 
-    # Now add the results.
-    add_cnt = 0
+def add_list_info(data_dict, attribute, db_connection, sql_query, *arguments, itersize=None, use_copy=False):
+    """Add a list of values for a given attribute to each object in some ID-keyed data_dict.
+
+    For example, get a list of pubs for each Gene object.
+    Contrast with "add_unique_info()" function, which adds a single value for a given attribute.
+    Note - this new list will overwrite any previous values (usually the attribute starts as "None").
+
+    Args:
+        arg1 (dict): An FB-ID keyed dict of dicts or objects (e.g., Gene or Allele objects).
+        arg2 (str): An attribute for which db info will be added to each object in the input data_dict.
+        arg3 (psycopg2.extensions.connection): A psycopg2 db connection.
+        arg4 (str): A string representing an sql query.
+        *arg: A list of arguments to be added into sql query by the .format() method.
+        The data_dict FB-ID keys will be matched up to values in column 1 of db results for info transfer.
+        itersize (int): Optional. If given, stream db results this many rows at a time (see "query_db()").
+        use_copy (bool): Optional. If True, fetch db results via COPY; values will be strings (see "query_db()").
+
+    Returns:
+        dict: The input "data_dict", but now with values from the db added to "attribute" specified for objects.
+            There will be a list of values for the specified attribute.
+            That value can be a tuple, as determined by "get_key_value()".
+
+    Warnings:
+        Raises a warning if no overlap of data_dict keys with db_results, via "check_key_overlap()".
+
+    """
+    # Perform the query.
+    log.info('Adding list of db info to this attribute: {}'.format(attribute))
+    formatted_sql_query = format_sql_query(sql_query, *arguments)
+    with PROFILER.label_queries(attribute):
+        db_results = query_db(db_connection, formatted_sql_query, itersize=itersize, use_copy=use_copy)
+        with PROFILER.profile_merge():
+            data_dict = merge_list_info(data_dict, attribute, db_results, streamed=itersize is not None)
+
+    return data_dict
+
+
+def merge_unique_info(data_dict, attribute, db_results, streamed=False):
+    """Merge db results having a unique value per key into the given attribute of each object in some ID-keyed data_dict.
+
+    This is the merge step of "add_unique_info()", for db results that have already been retrieved.
+
+    Args:
+        arg1 (dict): An FB-ID keyed dict of dicts or objects (e.g., Gene or Allele objects).
+        arg2 (str): An attribute for which db info will be added to each object in the input data_dict.
+        arg3 (list): A list of tuples (db_results); or, if "streamed" is True, any iterable of such tuples.
+        streamed (bool): Set to True if "db_results" is a generator that can only be read once.
+
+    Returns:
+        dict: The input "data_dict", with values from the db added to "attribute" (see "add_unique_info()").
+
+    Raises:
+        Raises an exception if values in column 1 of db_results are not unique (leaving the data_dict unchanged).
+
+    """
+    if streamed is False:
+        # Check there's only one row per "db_results" key (i.e, row's first value).
+        check_unique_results(db_results)
+        # Check that data_dict keys overlap with values in column one of db results.
+        check_key_overlap(data_dict, db_results)
+    else:
+        # Streamed results can only be checked as they arrive.
+        db_results = check_unique_results_stream(db_results)
+
+    # Find the targets first: streamed results are only fully checked once read, and the data_dict must not be
+    # changed if they turn out to be non-unique.
+    updates = []
     for row in db_results:
         row_key, row_value = get_key_value(row)
         try:
@@ -305,6 +464,11 @@ def add_unique_info(data_dict, attribute, db_connection, sql_query, *arguments):
         except KeyError:
             log.debug('The db results key "{}" does not exist in the target data_dict.'.format(row_key))
             continue
+        updates.append((target, row_value))
+
+    # Now add the results.
+    add_cnt = 0
+    for target, row_value in updates:
         # Action depends on whether info is being added to a dict or some other object type.
         if type(target) == dict:
             target[attribute] = row_value
@@ -313,44 +477,31 @@ def add_unique_info(data_dict, attribute, db_connection, sql_query, *arguments):
             setattr(target, attribute, row_value)
             add_cnt += 1
 
+    if streamed is True and add_cnt == 0:
+        log.warning('There is no overlap between the data_dict keys and the db results keys.')
     log.info('Added {} values to the {} attribute.\n'.format(add_cnt, attribute))
 
     return data_dict
 
 
-def add_list_info(data_dict, attribute, db_connection, sql_query, *arguments):
-    """Add a list of values for a given attribute to each object in some ID-keyed data_dict.
+def merge_list_info(data_dict, attribute, db_results, streamed=False):
+    """Merge db results having many values per key into the given attribute of each object in some ID-keyed data_dict.
 
-    For example, get a list of pubs for each Gene object.
-    Contrast with "add_unique_info()" function, which adds a single value for a given attribute.
-    Note - this new list will overwrite any previous values (usually the attribute starts as "None").
+    This is the merge step of "add_list_info()", for db results that have already been retrieved.
 
     Args:
         arg1 (dict): An FB-ID keyed dict of dicts or objects (e.g., Gene or Allele objects).
         arg2 (str): An attribute for which db info will be added to each object in the input data_dict.
-        arg3 (psycopg2.extensions.connection): A psycopg2 db connection.
-        arg4 (str): A string representing an sql query.
-        *arg: A list of arguments to be added into sql query by the .format() method.
-        The data_dict FB-ID keys will be matched up to values in column 1 of db results for info transfer.
+        arg3 (list): A list of tuples (db_results); or, if "streamed" is True, any iterable of such tuples.
+        streamed (bool): Set to True if "db_results" is a generator that can only be read once.
 
     Returns:
-        dict: The input "data_dict", but now with values from the db added to "attribute" specified for objects.
-            There will be a list of values for the specified attribute.
-            That value can be a tuple, as determined by "get_key_value()".
-
-    Warnings:
-        Raises a warning if no overlap of data_dict keys with db_results, via "check_key_overlap()".
+        dict: The input "data_dict", with lists of values from the db added to "attribute" (see "add_list_info()").
 
     """
-    # Perform the query.
-    log.info('Adding list of db info to this attribute: {}'.format(attribute))
-    formatted_sql_query = format_sql_query(sql_query, *arguments)
-    log.debug('Using this query string: {}'.format(formatted_sql_query))
-    db_results = connect(formatted_sql_query, 'no_query', db_connection)
-    log.info('Found {} results for this query.'.format(len(db_results)))
-
-    # Check for overlap in db_result and data_dict keys.
-    check_key_overlap(data_dict, db_results)
+    # Check for overlap in db_result and data_dict keys (streamed results are checked as they're added).
+    if streamed is False:
+        check_key_overlap(data_dict, db_results)
 
     # Set targeted attribute to an empty list (this will overwrite any previous values).
     # Since they're usually instantiated as "None", an empty list means results sought for the attribute but none found.
@@ -364,26 +515,25 @@ def add_list_info(data_dict, attribute, db_connection, sql_query, *arguments):
             setattr(target, attribute, empty_list)
             log.debug('Before adding values, attribute {} set to this: {}.'.format(attribute, empty_list))
 
-    # Build a dict of the db_results.
-    db_results_dict = build_list_db_result_dict(db_results)
-
-    # Now add the results.
-    add_cnt = 0
-    for key, db_value in db_results_dict.items():
-        log.debug('Trying to add this: {}: {}'.format(key, db_value))
+    # Now add the results, a row at a time (no intermediate dict of all db results, so streaming keeps memory low).
+    added_keys = set()
+    for row in db_results:
+        row_key, row_value = get_key_value(row)
         try:
-            target = data_dict[key]
+            target = data_dict[row_key]
         except KeyError:
-            log.debug('The db results key "{}" does not exist in the target data_dict.'.format(key))
+            log.debug('The db results key "{}" does not exist in the target data_dict.'.format(row_key))
             continue
         # Action depends on whether info is being added to a dict or some other object type.
-        if type(target) == dict:
-            target[attribute].extend(db_value)
-            add_cnt += 1
+        if isinstance(target, dict):
+            target[attribute].append(row_value)
         else:
-            getattr(target, attribute).extend(db_value)
-            add_cnt += 1
+            getattr(target, attribute).append(row_value)
+        added_keys.add(row_key)
+    add_cnt = len(added_keys)
 
+    if streamed is True and add_cnt == 0:
+        log.warning('There is no overlap between the data_dict keys and the db results keys.')
     log.info('Added values to the {} attribute of {} objects.\n'.format(attribute, add_cnt))
 
     return data_dict
@@ -420,9 +570,8 @@ def add_unique_dict_info(data_dict, att_key, new_att, db_connection, sql_query,
     # Perform the query.
     log.info('Using "{}" to look up db info for "{}".'.format(att_key, new_att))
     formatted_sql_query = format_sql_query(sql_query, *arguments)
-    log.debug('Using this query string: {}'.format(formatted_sql_query))
-    db_results = connect(formatted_sql_query, 'no_query', db_connection)
-    log.info('Found {} results for this query.'.format(len(db_results)))
+    with PROFILER.label_queries(new_att):
+        db_results = query_db(db_connection, formatted_sql_query)
 
     # Make a db result dict.
     db_results_dict = build_uniq_db_result_dict(db_results)
@@ -447,3 +596,75 @@ def add_unique_dict_info(data_dict, att_key, new_att, db_connection, sql_query,
     log.info('Added {} values to the {} attribute.\n'.format(add_cnt, new_att))
 
     return data_dict
+
+
+def add_synonym_and_id_info(data_dict, db_connection, feat_regex, secondary_id_regex, itersize=None):
+    """Add current symbol/fullname, synonym lists and secondary IDs to each object in some ID-keyed data_dict, in one query.
+
+    Equivalent to these five calls, but with one scan of the feature/feature_synonym/synonym join instead of five:
+        add_unique_info(data_dict, 'symbol_sgml', db_connection, current_feat_symbol_sgmls, feat_regex)
+        add_unique_info(data_dict, 'fullname_sgml', db_connection, current_feat_fullname_sgmls, feat_regex)
+        add_list_info(data_dict, 'symbol_synonym_list', db_connection, feat_symbol_synonyms, feat_regex, feat_regex)
+        add_list_info(data_dict, 'fullname_synonym_list', db_connection, feat_fullname_synonyms, feat_regex, feat_regex)
+        add_list_info(data_dict, 'secondary_id_list', db_connection, feat_secondary_fbids, feat_regex, secondary_id_regex)
+
+    Args:
+        arg1 (dict): An FB-ID keyed dict of dicts or objects (e.g., Gene or Allele objects).
+        arg2 (psycopg2.extensions.connection): A psycopg2 db connection.
+        arg3 (str): The regex for the features of interest: e.g., r'^FBgn[0-9]{7}$'.
+        arg4 (str): The regex for secondary ID accessions: e.g., r'^FBgn[0-9]{7}$'.
+        itersize (int): Optional. If given, stream db results this many rows at a time (see "query_db()").
+
+    Returns:
+        dict: The input "data_dict", with "symbol_sgml", "fullname_sgml", "symbol_synonym_list",
+            "fullname_synonym_list" and "secondary_id_list" filled in. List attributes are reset for all objects.
+
+    Raises:
+        Raises an exception if a feature has many current symbols or many current fullnames.
+
+    """
+    log.info('Adding symbol, fullname, synonym and secondary ID info for features like "{}".'.format(feat_regex))
+    formatted_sql_query = format_sql_query(feat_synonyms_and_ids, feat_regex, secondary_id_regex)
+    with PROFILER.label_queries('synonyms_and_ids'):
+        db_results = query_db(db_connection, formatted_sql_query, itersize=itersize)
+
+    list_attributes = ['symbol_synonym_list', 'fullname_synonym_list', 'secondary_id_list']
+    for target in data_dict.values():
+        for attribute in list_attributes:
+            if isinstance(target, dict):
+                target[attribute] = []
+            else:
+                setattr(target, attribute, [])
+
+    add_cnt = 0
+    for row in db_results:
+        uniquename, current_symbols, current_fullnames, symbol_names, symbol_sgmls, fullname_names, fullname_sgmls, secondary_ids = row
+        try:
+            target = data_dict[uniquename]
+        except KeyError:
+            log.debug('The db results key "{}" does not exist in the target data_dict.'.format(uniquename))
+            continue
+        new_values = {
+            'symbol_synonym_list': list(dict.fromkeys((symbol_names or []) + (symbol_sgmls or []))),
+            'fullname_synonym_list': list(dict.fromkeys((fullname_names or []) + (fullname_sgmls or []))),
+            'secondary_id_list': secondary_ids or [],
+        }
+        # As for "add_unique_info()", only set the current symbol/fullname if found, and require it to be unique.
+        for attribute, current_values in [('symbol_sgml', current_symbols), ('fullname_sgml', current_fullnames)]:
+            if current_values is None:
+                continue
+            if len(current_values) > 1:
+                raise ValueError('Feature {} has many values for {}: {}'.format(uniquename, attribute, current_values))
+            new_values[attribute] = current_values[0]
+        for attribute, value in new_values.items():
+            if isinstance(target, dict):
+                target[attribute] = value
+            else:
+                setattr(target, attribute, value)
+        add_cnt += 1
+
+    if add_cnt == 0:
+        log.warning('There is no overlap between the data_dict keys and the db results keys.')
+    log.info('Added symbol, fullname, synonym and secondary ID info to {} objects.\n'.format(add_cnt))
+
+    return data_dict
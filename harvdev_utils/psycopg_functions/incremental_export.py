@@ -0,0 +1,201 @@
+"""Module:: incremental_export.
+
+Synopsis:
+    Incremental AGR export of FlyBase References, driven by audit_chado timestamps. A snapshot from the previous run
+    keeps, for each pub_id, its last-modified timestamp, a content hash of its export, and the export itself. Each run
+    gets current timestamps, builds and processes Reference objects only for pubs changed since the snapshot, and
+    merges them with the snapshot exports of unchanged pubs.
+
+    Typical use in an export script:
+        timestamps = get_pub_timelastmodified(db_connection)
+        snapshot = load_export_snapshot(snapshot_filename)
+        changed_pub_ids, removed_pub_ids = find_changed_pubs(timestamps, snapshot)
+        # Build Reference objects (with the usual "add_*_info()" calls) for the changed_pub_ids only.
+        exports = update_export_snapshot(snapshot, changed_references, timestamps, removed_pub_ids)
+        save_export_snapshot(snapshot, snapshot_filename)
+
+    Deleting rows related to a pub (e.g., a pubprop) leaves no joinable audit trail, so such changes are only picked up
+    by a full export: i.e., start with an empty snapshot (by passing a new snapshot filename).
+
+Author(s):
+    Gil dos Santos dossantos@morgan.harvard.edu
+
+"""
+
+import datetime
+import gzip
+import hashlib
+import json
+import logging
+import os
+from harvdev_utils.psycopg_functions import query_db, format_sql_query, pub_timelastmodified
+
+log = logging.getLogger(__name__)
+
+# Reference attributes kept in the snapshot, besides all "agr_*" attributes.
+EXPORT_ATTRIBUTES = ['pub_id', 'uniquename', 'is_for_agr_export', 'export_description']
+
+
+def get_pub_timelastmodified(db_connection, uniquename_regex=r'^FBrf[0-9]{7}$'):
+    """Get the latest audit_chado timestamp for each current pub (including related pubauthor, pubprop, etc).
+
+    Args:
+        arg1 (psycopg2.extensions.connection): A psycopg2 db connection.
+        uniquename_regex (str): Optional. The regex for pub uniquenames of interest.
+
+    Returns:
+        dict: A pub_id-keyed dict of timestamps (datetime.datetime), for all current pubs. Pubs with no audit_chado
+            rows get the same placeholder timestamp (1970-01-01) each run: they are exported in full on the first run,
+            then kept as unchanged until audited changes are made.
+
+    """
+    log.info('Getting last-modified timestamps for pubs like "{}".'.format(uniquename_regex))
+    formatted_sql_query = format_sql_query(pub_timelastmodified, uniquename_regex)
+    db_results = query_db(db_connection, formatted_sql_query)
+    timestamps = {row[0]: row[1] for row in db_results}
+    log.info('Found last-modified timestamps for {} pubs.'.format(len(timestamps)))
+
+    return timestamps
+
+
+def reference_export_dict(reference):
+    """Get the export info for a processed Reference: all "agr_*" attributes, plus those in EXPORT_ATTRIBUTES.
+
+    Args:
+        arg1 (Reference): A Reference object that has been through "process_for_agr_export()".
+
+    Returns:
+        dict: An attribute-keyed dict of JSON-compatible values.
+
+    """
+    export_dict = {key: value for key, value in vars(reference).items() if key.startswith('agr_')}
+    for attribute in EXPORT_ATTRIBUTES:
+        export_dict[attribute] = getattr(reference, attribute)
+    return export_dict
+
+
+def _json_default(value):
+    """Serialize values that JSON does not handle: sets as sorted lists (set order varies between runs), others as str."""
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)
+    return str(value)
+
+
+def content_hash(export_dict):
+    """Get a stable hash of some export info: the same info always gives the same hash, regardless of key or set order.
+
+    Args:
+        arg1 (dict): An export dict: e.g., from "reference_export_dict()".
+
+    Returns:
+        str: A hex digest.
+
+    """
+    canonical_json = json.dumps(export_dict, sort_keys=True, separators=(',', ':'), default=_json_default)
+    return hashlib.sha256(canonical_json.encode('utf-8')).hexdigest()
+
+
+def load_export_snapshot(snapshot_filename):
+    """Load the snapshot from a previous export run.
+
+    Args:
+        arg1 (str): The gzipped JSON snapshot file written by "save_export_snapshot()".
+
+    Returns:
+        dict: A pub_id-keyed dict of {'timelastmodified': ISO timestamp, 'content_hash': str, 'export': dict} dicts.
+            Empty if there is no snapshot file (i.e., all pubs will be exported).
+
+    """
+    if not os.path.exists(snapshot_filename):
+        log.info('No export snapshot at {}: all pubs will be processed.'.format(snapshot_filename))
+        return {}
+    with gzip.open(snapshot_filename, 'rt', encoding='utf-8') as snapshot_file:
+        snapshot = {int(pub_id): entry for pub_id, entry in json.load(snapshot_file).items()}
+    log.info('Loaded export snapshot for {} pubs from {}.'.format(len(snapshot), snapshot_filename))
+
+    return snapshot
+
+
+def save_export_snapshot(snapshot, snapshot_filename):
+    """Save the snapshot for the next export run (written to a temp file first, then renamed).
+
+    Args:
+        arg1 (dict): The snapshot, as updated by "update_export_snapshot()".
+        arg2 (str): The output gzipped JSON snapshot file.
+
+    """
+    temp_filename = snapshot_filename + '.tmp'
+    with gzip.open(temp_filename, 'wt', encoding='utf-8') as snapshot_file:
+        json.dump(snapshot, snapshot_file, default=str)
+    os.replace(temp_filename, snapshot_filename)
+    log.info('Saved export snapshot for {} pubs to {}.'.format(len(snapshot), snapshot_filename))
+
+    return
+
+
+def find_changed_pubs(timestamps, snapshot):
+    """Compare current pub timestamps to those of the previous export snapshot.
+
+    Args:
+        arg1 (dict): A pub_id-keyed dict of current timestamps, from "get_pub_timelastmodified()".
+        arg2 (dict): The previous export snapshot, from "load_export_snapshot()".
+
+    Returns:
+        tuple: A set of pub_ids for pubs that are new or changed since the snapshot; and a set of pub_ids for pubs
+            in the snapshot that are no longer current.
+
+    """
+    changed_pub_ids = set()
+    for pub_id, timestamp in timestamps.items():
+        try:
+            previous_timestamp = snapshot[pub_id]['timelastmodified']
+        except KeyError:
+            changed_pub_ids.add(pub_id)
+            continue
+        if timestamp.isoformat() != previous_timestamp:
+            changed_pub_ids.add(pub_id)
+    removed_pub_ids = set(snapshot.keys()) - set(timestamps.keys())
+    log.info('Since the snapshot: {} pubs new or changed, {} unchanged, {} removed.'.format(
+        len(changed_pub_ids), len(timestamps) - len(changed_pub_ids), len(removed_pub_ids)))
+
+    return changed_pub_ids, removed_pub_ids
+
+
+def update_export_snapshot(snapshot, changed_references, timestamps, removed_pub_ids):
+    """Process changed References for AGR export, update the snapshot, and get exports for all current pubs.
+
+    Args:
+        arg1 (dict): The previous export snapshot, from "load_export_snapshot()"; updated in place.
+        arg2 (iterable): Reference objects for the changed pubs (see "find_changed_pubs()"), with db info added
+            but not yet processed.
+        arg3 (dict): A pub_id-keyed dict of current timestamps, from "get_pub_timelastmodified()".
+        arg4 (set): The pub_ids of pubs to drop from the snapshot (see "find_changed_pubs()").
+
+    Returns:
+        list: Export dicts (see "reference_export_dict()") for all pubs in the updated snapshot, sorted by pub_id.
+
+    """
+    for pub_id in removed_pub_ids:
+        snapshot.pop(pub_id, None)
+    processed_cnt = 0
+    new_content_cnt = 0
+    for reference in changed_references:
+        reference.process_for_agr_export()
+        export_dict = reference_export_dict(reference)
+        this_hash = content_hash(export_dict)
+        previous_entry = snapshot.get(reference.pub_id)
+        if previous_entry is None or previous_entry['content_hash'] != this_hash:
+            new_content_cnt += 1
+        timestamp = timestamps.get(reference.pub_id)
+        if not isinstance(timestamp, datetime.datetime):
+            log.warning('No last-modified timestamp for pub_id={}; it will be reprocessed next time.'.format(reference.pub_id))
+            timestamp = None
+        snapshot[reference.pub_id] = {
+            'timelastmodified': timestamp.isoformat() if timestamp is not None else None,
+            'content_hash': this_hash,
+            'export': export_dict,
+        }
+        processed_cnt += 1
+    log.info('Processed {} changed pubs, of which {} have new export content.'.format(processed_cnt, new_content_cnt))
+
+    return [snapshot[pub_id]['export'] for pub_id in sorted(snapshot.keys())]
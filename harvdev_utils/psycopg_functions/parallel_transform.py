@@ -0,0 +1,139 @@
+"""Module:: parallel_transform.
+
+Synopsis:
+    Runs CPU-bound AGR processing methods (e.g., "Allele.agr_allele_processing()", "Reference.process_for_agr_export()")
+    for all objects in a data_dict across a pool of processes. Objects are sent to worker processes in chunks and
+    returned processed, with their warning/error lists intact; warnings and errors logged in the workers are sent back
+    through a queue and re-logged in the main process.
+
+Author(s):
+    Gil dos Santos dossantos@morgan.harvard.edu
+
+"""
+
+import copy
+import logging
+import logging.handlers
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+class _ReplayHandler(logging.Handler):
+    """Re-log records from worker processes in the main process, through the logger that made them."""
+
+    def emit(self, record):
+        logging.getLogger(record.name).handle(record)
+
+
+def _init_worker(log_queue):
+    """Send the warnings/errors logged in a worker process to the main process, instead of writing them from here.
+
+    Handlers inherited from the main process (on any logger) are dropped, so that each record is written once, by the
+    main process.
+    """
+    for logger in logging.root.manager.loggerDict.values():
+        if isinstance(logger, logging.Logger):
+            logger.handlers = []
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setLevel(logging.WARNING)
+    logging.getLogger().handlers = [queue_handler]
+
+
+def _transform_chunk(items, method_names, output_function):
+    """Run processing methods (and the output function) on a chunk of objects; this runs in a worker process.
+
+    Args:
+        arg1 (list): A list of (key, object) tuples.
+        arg2 (list): The names of the object methods to run, in order; each takes no args.
+        arg3 (function): A module-level function that returns the output for a processed object, or None.
+
+    Returns:
+        tuple: A list of (key, processed object or output) tuples; and a list of (key, exception) tuples for objects
+            whose processing (or output) raised an exception.
+
+    """
+    results = []
+    errors = []
+    for key, this_object in items:
+        try:
+            for method_name in method_names:
+                getattr(this_object, method_name)()
+            if output_function is None:
+                results.append((key, this_object))
+            else:
+                results.append((key, output_function(this_object)))
+        except Exception as error:
+            errors.append((key, error))
+
+    return results, errors
+
+
+def run_transform_stage(data_dict, method_names, chunk_size=DEFAULT_CHUNK_SIZE, max_workers=None, output_function=None):
+    """Run processing methods for all objects in some ID-keyed data_dict, in parallel processes.
+
+    Objects are pickled to and from worker processes, so methods must only change the object itself (e.g., no db
+    connections or shared caches). With "max_workers=1", objects are processed in this process, without pickling
+    (on copies, if there is an "output_function"), so that the results are the same either way.
+
+    Args:
+        arg1 (dict): An FB-ID keyed dict of objects (e.g., Allele or Reference objects).
+        arg2 (list): The names of the object methods to run on each object, in order: e.g., ['agr_allele_processing'].
+            Each method must take no args.
+        chunk_size (int): Optional. The number of objects to send to a worker process at a time.
+        max_workers (int): Optional. The number of worker processes; defaults to the number of CPUs.
+        output_function (function): Optional. A module-level function that takes a processed object and returns its
+            output (e.g., an AGR export dict). If given, only outputs are returned from the workers, and the objects in
+            the data_dict are left unprocessed.
+
+    Returns:
+        dict: If no "output_function", the input "data_dict", with its objects replaced by the processed objects.
+            Otherwise, a dict of outputs, with the same keys (in the same order) as the "data_dict".
+
+    Raises:
+        Raises the first exception raised by any object's processing (or output), after all chunks are done (all failures
+            are logged). The data_dict is then unchanged, except that with "max_workers=1" and no "output_function", its
+            objects may be partly processed.
+
+    """
+    method_names = list(method_names)
+    items = list(data_dict.items())
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    log.info('Running {} on {} objects, in {} chunks.'.format(method_names, len(items), len(chunks)))
+
+    if max_workers == 1:
+        # Logging goes straight to this process's handlers.
+        if output_function is not None:
+            chunks = [[(key, copy.deepcopy(this_object)) for key, this_object in chunk] for chunk in chunks]
+        chunk_results = [_transform_chunk(chunk, method_names, output_function) for chunk in chunks]
+    else:
+        log_queue = multiprocessing.Queue()
+        listener = logging.handlers.QueueListener(log_queue, _ReplayHandler())
+        listener.start()
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(log_queue, )) as executor:
+                futures = [executor.submit(_transform_chunk, chunk, method_names, output_function) for chunk in chunks]
+                chunk_results = [future.result() for future in futures]
+        finally:
+            listener.stop()
+
+    processed = {}
+    all_errors = []
+    for results, errors in chunk_results:
+        processed.update(results)
+        all_errors.extend(errors)
+    if all_errors:
+        for key, error in all_errors:
+            log.error('Processing of {} failed: {}'.format(key, error))
+        raise all_errors[0][1]
+
+    if output_function is not None:
+        return {key: processed[key] for key, value in items}
+    for key, this_object in processed.items():
+        data_dict[key] = this_object
+    log.info('Done processing {} objects.'.format(len(processed)))
+
+    return data_dict
@@ -0,0 +1,284 @@
+"""Module:: query_profiler.
+
+Synopsis:
+    Opt-in per-query instrumentation for psycopg_functions: wall time, rows and (approximate) bytes fetched per query,
+    Python-side merge time per "add_*_info()" call, and optionally "EXPLAIN (ANALYZE, BUFFERS)" output per query.
+    The shared PROFILER is disabled by default; when enabled (e.g., by the "--profile" option of set_up_db_reading),
+    "connect()", "connect_stream()", "copy_query()" and the "add_*_info()" functions report to it, and a profile report
+    sorted by total time per query label can be written at the end of the script.
+
+Author(s):
+    Gil dos Santos dossantos@morgan.harvard.edu
+
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+# The max length of the (whitespace-collapsed) SQL kept in each profile record, and of default query labels.
+MAX_SQL_LENGTH = 300
+DEFAULT_LABEL_LENGTH = 60
+
+REPORT_COLUMNS = ['label', 'calls', 'total_seconds', 'query_seconds', 'merge_seconds', 'rows', 'bytes', 'sql']
+
+
+def collapse_sql(sql):
+    """Collapse all whitespace in an SQL query to single spaces, for logging and labels."""
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+def estimate_bytes(rows):
+    """Estimate the bytes fetched for some rows, as the total length of their values in text form (NULLs excluded)."""
+    return sum(len(str(value)) for row in rows for value in row if value is not None)
+
+
+class QueryProfile(object):
+    """Define a profile record for one query (and any merge of its results)."""
+
+    def __init__(self, label, sql):
+        """Initialize a QueryProfile object.
+
+        Args:
+            arg1 (str): The label under which to report the query: e.g., the data_dict attribute being added.
+            arg2 (str): The SQL query.
+
+        Returns:
+            QueryProfile: A "QueryProfile" object.
+
+        """
+        self.label = label
+        self.sql = collapse_sql(sql)[:MAX_SQL_LENGTH]
+        self.query_seconds = 0.0    # Wall time to execute the query and fetch all results.
+        self.merge_seconds = 0.0    # Wall time to merge results into a data_dict (for streamed results, includes fetching).
+        self.rows = 0               # Rows fetched.
+        self.bytes = 0              # Approximate bytes fetched (see "estimate_bytes()").
+        self.explain = None         # The "EXPLAIN (ANALYZE, BUFFERS)" output, if requested.
+        self.streamed = False       # If True, "query_seconds" counts only time spent fetching batches.
+        self.start_time = None
+
+    def add_rows(self, rows, seconds):
+        """Add a batch of streamed rows, and the time taken to fetch it."""
+        self.rows += len(rows)
+        self.bytes += estimate_bytes(rows)
+        self.query_seconds += seconds
+        return
+
+
+class QueryProfiler(object):
+    """Define a collector of QueryProfile records, shared by all threads."""
+
+    def __init__(self):
+        """Initialize a disabled QueryProfiler."""
+        self.enabled = False
+        self.explain = False
+        self.records = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._explained_labels = set()
+
+    def enable(self, explain=False):
+        """Start recording query profiles.
+
+        Args:
+            explain (bool): Optional. If True, also run "EXPLAIN (ANALYZE, BUFFERS)" once per query label. Note that
+                EXPLAIN ANALYZE executes the query, so each such query is run twice.
+
+        """
+        self.enabled = True
+        self.explain = explain
+        log.info('Query profiling enabled (explain={}).'.format(explain))
+        return
+
+    def disable(self):
+        """Stop recording query profiles (records already made are kept)."""
+        self.enabled = False
+        return
+
+    def reset(self):
+        """Discard all records."""
+        with self._lock:
+            self.records = []
+            self._explained_labels = set()
+        return
+
+    def current_label(self):
+        """Get the label set for queries run in this thread by "label_queries()", if any."""
+        return getattr(self._local, 'label', None)
+
+    @contextmanager
+    def label_queries(self, label):
+        """Report queries run in this thread, within the context, under the given label.
+
+        Args:
+            arg1 (str): The label: e.g., the data_dict attribute that the query results are for.
+
+        """
+        previous_label = self.current_label()
+        self._local.label = label
+        try:
+            yield
+        finally:
+            self._local.label = previous_label
+
+    def start_query(self, sql, query_variable='no_query', db_connection=None):
+        """Start a profile record for a query, running EXPLAIN first if requested (and not yet done for the label).
+
+        Args:
+            arg1 (str): The SQL query.
+            query_variable (tuple or dict): Optional bind parameter values for the query.
+            db_connection (psycopg2.extensions.connection): Optional. The connection on which to run EXPLAIN.
+
+        Returns:
+            QueryProfile: The new record; the caller fills in "rows" and "bytes", then passes it to "finish_query()".
+
+        """
+        label = self.current_label()
+        if label is None:
+            label = collapse_sql(sql)[:DEFAULT_LABEL_LENGTH]
+        record = QueryProfile(label, sql)
+        if self.explain is True and db_connection is not None:
+            with self._lock:
+                run_explain = label not in self._explained_labels
+                self._explained_labels.add(label)
+            if run_explain:
+                record.explain = explain_query(db_connection, sql, query_variable)
+        record.start_time = time.perf_counter()
+        return record
+
+    def finish_query(self, record, streamed=False):
+        """Finish timing a query started with "start_query()", and keep the record.
+
+        Args:
+            arg1 (QueryProfile): The record from "start_query()".
+            streamed (bool): Optional. If True, the query time was already summed up batch by batch (see "add_rows()").
+
+        """
+        record.streamed = streamed
+        if streamed is False:
+            record.query_seconds = time.perf_counter() - record.start_time
+        with self._lock:
+            self.records.append(record)
+        return
+
+    @contextmanager
+    def profile_merge(self):
+        """Time the merge of query results into a data_dict, adding it to the last query record for the current label.
+
+        For streamed results, which are fetched during the merge, the fetch time is not counted as merge time.
+        """
+        if not self.enabled:
+            yield
+            return
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            merge_seconds = time.perf_counter() - start_time
+            label = self.current_label()
+            with self._lock:
+                for record in reversed(self.records):
+                    if record.label == label:
+                        if record.streamed is True:
+                            merge_seconds = max(merge_seconds - record.query_seconds, 0.0)
+                        record.merge_seconds += merge_seconds
+                        break
+                else:
+                    record = QueryProfile(label or 'unlabeled merge', '')
+                    record.merge_seconds = merge_seconds
+                    self.records.append(record)
+
+    def summarize(self):
+        """Sum up records by label.
+
+        Returns:
+            list: A list of dicts (keys as in REPORT_COLUMNS, plus "explain"), sorted by total time, longest first.
+
+        """
+        summary = {}
+        with self._lock:
+            records = list(self.records)
+        for record in records:
+            try:
+                entry = summary[record.label]
+            except KeyError:
+                entry = {
+                    'label': record.label, 'calls': 0, 'total_seconds': 0.0, 'query_seconds': 0.0, 'merge_seconds': 0.0,
+                    'rows': 0, 'bytes': 0, 'sql': record.sql, 'explain': None
+                }
+                summary[record.label] = entry
+            entry['calls'] += 1
+            entry['query_seconds'] += record.query_seconds
+            entry['merge_seconds'] += record.merge_seconds
+            entry['total_seconds'] += record.query_seconds + record.merge_seconds
+            entry['rows'] += record.rows
+            entry['bytes'] += record.bytes
+            if record.explain is not None:
+                entry['explain'] = record.explain
+        return sorted(summary.values(), key=lambda x: x['total_seconds'], reverse=True)
+
+    def write_report(self, filename):
+        """Write a profile report, sorted by total time per query label.
+
+        Args:
+            arg1 (str): The output filename. If it ends with ".json", a JSON report (including any EXPLAIN output) is
+                written; otherwise, a TSV report.
+
+        """
+        summary = self.summarize()
+        with open(filename, 'w') as report:
+            if filename.endswith('.json'):
+                json.dump(summary, report, indent=2)
+            else:
+                report.write('\t'.join(REPORT_COLUMNS) + '\n')
+                for entry in summary:
+                    values = [entry[i] for i in REPORT_COLUMNS]
+                    values = ['{:.3f}'.format(i) if isinstance(i, float) else str(i) for i in values]
+                    report.write('\t'.join(values) + '\n')
+        log.info('Wrote query profile report for {} query labels to {}.'.format(len(summary), filename))
+        return
+
+
+def explain_query(db_connection, sql, query_variable='no_query'):
+    """Get the "EXPLAIN (ANALYZE, BUFFERS)" output for a query.
+
+    Args:
+        arg1 (psycopg2.extensions.connection): A psycopg2 db connection.
+        arg2 (str): An SQL query (SELECT); a trailing ";" is allowed.
+        query_variable (tuple or dict): Optional bind parameter values for the query.
+
+    Returns:
+        str: The query plan, with actual times and buffer usage; or, if EXPLAIN fails, a note of the error.
+
+    """
+    explain_sql = 'EXPLAIN (ANALYZE, BUFFERS) {}'.format(sql.strip().rstrip(';'))
+    # Within a transaction, use a savepoint so that a failed EXPLAIN does not abort the transaction.
+    use_savepoint = not db_connection.autocommit
+    cursor = db_connection.cursor()
+    try:
+        if use_savepoint:
+            cursor.execute('SAVEPOINT harvdev_explain')
+        if query_variable == 'no_query':
+            cursor.execute(explain_sql)
+        else:
+            cursor.execute(explain_sql, query_variable)
+        plan = '\n'.join(row[0] for row in cursor.fetchall())
+        if use_savepoint:
+            cursor.execute('RELEASE SAVEPOINT harvdev_explain')
+    except Exception as error:
+        log.warning('Could not EXPLAIN query: {}'.format(error))
+        plan = 'EXPLAIN failed: {}'.format(error)
+        if use_savepoint:
+            cursor.execute('ROLLBACK TO SAVEPOINT harvdev_explain')
+    finally:
+        cursor.close()
+    return plan
+
+
+# The profiler used by psycopg_functions.
+PROFILER = QueryProfiler()
@@ -0,0 +1,227 @@
+"""Module:: query_registry.
+
+Synopsis:
+    A registry of named sql queries that take bind parameters (e.g., "%(uname_regex)s") instead of ".format()" values.
+    Values are sent to the server separately from the query text, so quotes or regex metacharacters in values are safe.
+    The queries can also be issued as server-side PREPAREd statements so that repeated runs reuse the same plan.
+    The registry is built from the ".format()" templates in "sql_queries", so each query's sql is defined only once.
+
+Author(s):
+    Gil dos Santos dossantos@morgan.harvard.edu
+
+"""
+
+import logging
+import re
+import weakref
+from harvdev_utils.psycopg_functions import connect, rewrite_uniquename_regex_params, sql_queries
+
+log = logging.getLogger(__name__)
+
+# Registry of NamedQuery objects, keyed by query name.
+QUERY_REGISTRY = {}
+
+# Names of statements already PREPAREd on each connection (prepared statements last for the db session).
+_prepared_statements = weakref.WeakKeyDictionary()
+
+
+class NamedQuery(object):
+    """Define a named sql query that uses "%(name)s" bind parameters."""
+
+    def __init__(self, name, sql):
+        """Initialize a NamedQuery object.
+
+        Args:
+            arg1 (str): The name of the query: e.g., "rel_features".
+            arg2 (str): The sql, with values given as "%(name)s" placeholders (and any literal "%" doubled as "%%").
+
+        Returns:
+            NamedQuery: A named sql query.
+
+        """
+        self.name = name
+        self.sql = sql
+        # Distinct parameter names, in order of first appearance.
+        self.param_names = list(dict.fromkeys(re.findall(r'%\((\w+)\)s', sql)))
+        self.statement_name = 'harvdev_{}'.format(name)
+
+    @classmethod
+    def from_format_template(cls, name, template, param_names):
+        """Make a NamedQuery from a ".format()" template in which each value appears as a quoted "'{}'".
+
+        Args:
+            arg1 (str): The name of the query.
+            arg2 (str): The ".format()" template: e.g., "... WHERE f.uniquename ~ '{}';".
+            arg3 (tuple): One parameter name per "'{}'" placeholder, in order. A name may repeat.
+
+        Returns:
+            NamedQuery: A named sql query.
+
+        Raises:
+            Raises an exception if the number of parameter names does not match the number of placeholders.
+
+        """
+        pieces = template.replace('%', '%%').split("'{}'")
+        if len(pieces) - 1 != len(param_names):
+            raise ValueError('Query "{}" has {} placeholders but {} parameter names were given.'.format(name, len(pieces) - 1, len(param_names)))
+        sql = pieces[0]
+        for param_name, piece in zip(param_names, pieces[1:]):
+            sql += '%({})s'.format(param_name) + piece
+        return cls(name, sql)
+
+    def check_params(self, params):
+        """Check that values are given for all of this query's parameters.
+
+        Args:
+            arg1 (dict): A dict of parameter values, keyed by parameter name.
+
+        Raises:
+            Raises an exception if any parameter value is missing.
+
+        """
+        missing = [i for i in self.param_names if i not in params]
+        if missing:
+            raise KeyError('Query "{}" is missing values for these parameters: {}'.format(self.name, missing))
+
+        return
+
+    def prepare_sql(self):
+        """Get the sql for PREPAREing this query as a server-side statement (with "$n" positional parameters)."""
+        sql = self.sql.strip().rstrip(';')
+        for position, param_name in enumerate(self.param_names, start=1):
+            sql = sql.replace('%({})s'.format(param_name), '${}'.format(position))
+        sql = sql.replace('%%', '%')
+
+        return 'PREPARE {} AS {};'.format(self.statement_name, sql)
+
+    def execute_sql(self):
+        """Get the sql for EXECUTEing this query's PREPAREd statement, with "%(name)s" placeholders for its values."""
+        if not self.param_names:
+            return 'EXECUTE {};'.format(self.statement_name)
+        placeholders = ', '.join('%({})s'.format(i) for i in self.param_names)
+
+        return 'EXECUTE {} ({});'.format(self.statement_name, placeholders)
+
+
+def register_query(named_query):
+    """Add a NamedQuery to the registry (replacing any query of the same name).
+
+    Args:
+        arg1 (NamedQuery): The query to register.
+
+    Returns:
+        NamedQuery: The query registered.
+
+    """
+    QUERY_REGISTRY[named_query.name] = named_query
+
+    return named_query
+
+
+def get_named_query(query_name):
+    """Get a NamedQuery from the registry.
+
+    Args:
+        arg1 (str): The name of the query.
+
+    Returns:
+        NamedQuery: The registered query.
+
+    Raises:
+        Raises an exception if no query of that name is registered.
+
+    """
+    try:
+        return QUERY_REGISTRY[query_name]
+    except KeyError:
+        raise KeyError('No query named "{}" is registered. Try one of these: {}'.format(query_name, sorted(QUERY_REGISTRY.keys())))
+
+
+def prepare_named_query(db_connection, query_name):
+    """PREPARE a registered query on a connection, unless already done.
+
+    Prepared statements are tied to the db session: PREPARE again after reconnecting. Avoid preparing statements inside
+    a transaction that may be rolled back.
+
+    Args:
+        arg1 (psycopg2.extensions.connection): A psycopg2 db connection.
+        arg2 (str): The name of a registered query.
+
+    Returns:
+        NamedQuery: The registered query.
+
+    """
+    named_query = get_named_query(query_name)
+    prepared = _prepared_statements.setdefault(db_connection, set())
+    if named_query.statement_name not in prepared:
+        log.debug('Preparing statement {}.'.format(named_query.statement_name))
+        cursor = db_connection.cursor()
+        cursor.execute(named_query.prepare_sql())
+        cursor.close()
+        prepared.add(named_query.statement_name)
+
+    return named_query
+
+
+def run_named_query(db_connection, query_name, params=None, prepared=False):
+    """Run a registered query, passing values as bind parameters through "connect()".
+
+    Unless prepared, uniquename regex filters for FlyBase ID patterns are made index-friendly (see "uniquename_regex").
+    A prepared statement is planned once for all values, so it keeps the plain regex filters.
+
+    Args:
+        arg1 (psycopg2.extensions.connection): A psycopg2 db connection.
+        arg2 (str): The name of a registered query: e.g., "current_feat_symbol_sgmls".
+        arg3 (dict): Values for the query's parameters, keyed by name: e.g., {'uname_regex': r'^FBgn[0-9]{7}$'}.
+        prepared (bool): If True, PREPARE the query on this connection (once) and EXECUTE the prepared statement.
+
+    Returns:
+        list: Query results as a list of tuples.
+
+    """
+    named_query = get_named_query(query_name)
+    params = params or {}
+    named_query.check_params(params)
+    if prepared is True:
+        prepare_named_query(db_connection, query_name)
+        sql = named_query.execute_sql()
+    else:
+        sql = rewrite_uniquename_regex_params(named_query.sql, params)
+    # Only pass values if the query has parameters, so that "%%" is handled consistently by psycopg2.
+    if named_query.param_names:
+        query_variable = {i: params[i] for i in named_query.param_names}
+    else:
+        query_variable = 'no_query'
+        sql = sql.replace('%%', '%')
+    log.debug('Running named query {} with these values: {}'.format(query_name, params))
+
+    return connect(sql, query_variable, db_connection)
+
+
+# Register the commonly used queries in "sql_queries", naming their ".format()" values in order.
+_sql_queries_param_names = {
+    'current_features_by_uname_regex': ('uname_regex', ),
+    'current_feat_symbol_sgmls': ('uname_regex', ),
+    'current_feat_fullname_sgmls': ('uname_regex', ),
+    'feat_fb_2o_ids': ('uname_regex', 'accession_regex'),
+    'rel_features': ('subject_regex', 'object_regex', 'rel_type'),
+    'rel_features_rev': ('object_regex', 'subject_regex', 'rel_type'),
+    'rel_dmel_features': ('subject_regex', 'object_regex', 'rel_type'),
+    'rel_dmel_features_rev': ('object_regex', 'subject_regex', 'rel_type'),
+    'indirect_rel_features': ('subject_regex', 'intermediate_regex', 'object_regex', 'rel_type_1', 'rel_type_2'),
+    'feat_symbol_synonyms': ('uname_regex', 'uname_regex'),
+    'feat_fullname_synonyms': ('uname_regex', 'uname_regex'),
+    'feat_secondary_fbids': ('uname_regex', 'accession_regex'),
+    'featureprops': ('uname_regex', 'prop_type'),
+    'feat_cvterm': ('uname_regex', 'cv_name'),
+    'feat_cvterm_cvtprop': ('uname_regex', 'cv_name', 'cvtprop_value'),
+    'orgid_genus': (),
+    'orgid_abbr': (),
+    'feat_id_symbol_sgml': ('uname_regex', ),
+    'gene_MOD_ids': ('uname_regex', ),
+    'gene_HGNC_ids': ('uname_regex', ),
+    'feat_synonyms_and_ids': ('uname_regex', 'accession_regex'),
+    'pub_timelastmodified': ('uname_regex', ),
+}
+for _query_name, _param_names in _sql_queries_param_names.items():
+    register_query(NamedQuery.from_format_template(_query_name, getattr(sql_queries, _query_name), _param_names))
@@ -0,0 +1,177 @@
+"""Module:: release_diff.
+
+Synopsis:
+    Release-to-release diffs of feature dicts (e.g., all FBal from fb_2024_05 vs fb_2024_06), so that downstream
+    consumers can get only what changed instead of full dumps. Each feature object gets a stable content hash of its
+    exported attributes. A run's hashes are saved as a manifest; the next run compares its objects to the previous
+    manifest, and reports only added, removed and changed objects.
+
+    Typical use in a report script:
+        old_manifest = load_hash_manifest(previous_manifest_filename)
+        diff, new_manifest = diff_feature_dict(data_dict, old_manifest, set_up_dict['database'])
+        save_hash_manifest(new_manifest, new_manifest_filename)
+        # Then export diff['added'] and diff['changed'] records, and diff['removed'] keys.
+
+Author(s):
+    Gil dos Santos dossantos@morgan.harvard.edu
+
+"""
+
+import gzip
+import json
+import logging
+import os
+from harvdev_utils.psycopg_functions import content_hash
+
+log = logging.getLogger(__name__)
+
+# Attributes left out of feature content hashes: internal db keys, and FB-only data integrity notes.
+DIFF_EXCLUDED_ATTRIBUTES = {'feature_id', 'organism_id', 'data_warnings', 'data_errors'}
+
+# Exported attribute names, by feature class and the names of its objects' stored attributes (which rarely vary).
+_exported_attribute_cache = {}
+
+
+def _public_attribute_name(feature_class, attribute):
+    """Get the public name of an attribute: "_Feature__uniquename" is the backing field of the "uniquename" property."""
+    if not attribute.startswith('_'):
+        return attribute
+    public_name = attribute.rpartition('__')[2]
+    if attribute.count('__') == 1 and isinstance(getattr(feature_class, public_name, None), property):
+        return public_name
+    return None
+
+
+def exported_attributes(feature):
+    """Get the names of exported attributes for a feature object, in sorted order."""
+    feature_class = type(feature)
+    try:
+        stored_attributes = tuple(vars(feature).keys())
+    except TypeError:
+        # A compact (__slots__) object.
+        stored_attributes = None
+    try:
+        return _exported_attribute_cache[feature_class, stored_attributes]
+    except KeyError:
+        pass
+    if stored_attributes is None:
+        attributes = [i for this_class in feature_class.__mro__ for i in getattr(this_class, '__slots__', ())]
+    else:
+        attributes = stored_attributes
+    _exported_attribute_cache[feature_class, stored_attributes] = _select_attributes(feature_class, attributes)
+    return _exported_attribute_cache[feature_class, stored_attributes]
+
+
+def _select_attributes(feature_class, attributes):
+    public_names = {_public_attribute_name(feature_class, i) for i in attributes}
+    public_names.discard(None)
+    return sorted(public_names - DIFF_EXCLUDED_ATTRIBUTES)
+
+
+def feature_export_dict(feature, attributes=None):
+    """Get the exported attribute values of a feature object (from fb_feature_classes or compact_feature_classes).
+
+    Args:
+        arg1 (Feature): A Feature (or subclass) object.
+        attributes (list): Optional. The attribute names to export. By default, all public attributes (including
+            properties like "uniquename"), except for those in DIFF_EXCLUDED_ATTRIBUTES.
+
+    Returns:
+        dict: An attribute-keyed dict of values.
+
+    """
+    if attributes is None:
+        attributes = exported_attributes(feature)
+    return {attribute: getattr(feature, attribute) for attribute in attributes}
+
+
+def load_hash_manifest(manifest_filename):
+    """Load the content hash manifest of a previous run.
+
+    Args:
+        arg1 (str): A gzipped JSON manifest file written by "save_hash_manifest()".
+
+    Returns:
+        dict: A dict with the "database" of the run and its "hashes" (a key-to-hash dict). If there is no manifest
+            file, the hashes are empty (i.e., all objects will be reported as added).
+
+    """
+    if not os.path.exists(manifest_filename):
+        log.info('No hash manifest at {}: all objects will be reported as added.'.format(manifest_filename))
+        return {'database': None, 'hashes': {}}
+    with gzip.open(manifest_filename, 'rt', encoding='utf-8') as manifest_file:
+        manifest = json.load(manifest_file)
+    log.info('Loaded content hashes for {} objects from database {}.'.format(len(manifest['hashes']), manifest['database']))
+
+    return manifest
+
+
+def save_hash_manifest(manifest, manifest_filename):
+    """Save a content hash manifest, for diffs in the next run (written to a temp file first, then renamed).
+
+    Args:
+        arg1 (dict): A manifest from "diff_feature_dict()".
+        arg2 (str): The output gzipped JSON manifest file.
+
+    """
+    temp_filename = manifest_filename + '.tmp'
+    with gzip.open(temp_filename, 'wt', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file, sort_keys=True)
+    os.replace(temp_filename, manifest_filename)
+    log.info('Saved content hashes for {} objects to {}.'.format(len(manifest['hashes']), manifest_filename))
+
+    return
+
+
+def diff_hashes(old_hashes, new_hashes):
+    """Compare two runs' content hashes.
+
+    Args:
+        arg1 (dict): The key-to-hash dict of the previous run.
+        arg2 (dict): The key-to-hash dict of the current run.
+
+    Returns:
+        tuple: Sorted lists of the keys added, removed and changed in the current run.
+
+    """
+    added = sorted(new_hashes.keys() - old_hashes.keys())
+    removed = sorted(old_hashes.keys() - new_hashes.keys())
+    changed = sorted(key for key, this_hash in new_hashes.items() if key in old_hashes and old_hashes[key] != this_hash)
+    return added, removed, changed
+
+
+def diff_feature_dict(data_dict, old_manifest, database, attributes=None):
+    """Diff a dict of feature objects against the content hash manifest of a previous run.
+
+    Args:
+        arg1 (dict): A uniquename-keyed dict of Feature (or subclass) objects for the current run.
+        arg2 (dict): The previous run's manifest, from "load_hash_manifest()".
+        arg3 (str): The current database name (e.g., set_up_dict['database']), for the new manifest.
+        attributes (list): Optional. The attribute names to compare (see "feature_export_dict()").
+
+    Returns:
+        tuple: A diff dict with "from_database", "to_database", "added" and "changed" (lists of export dicts, keyed
+            by uniquename), and "removed" (a list of keys), all sorted by key; and the manifest for the current run.
+
+    """
+    new_hashes = {}
+    export_dicts = {}
+    old_hashes = old_manifest['hashes']
+    for key, feature in data_dict.items():
+        export_dict = feature_export_dict(feature, attributes=attributes)
+        new_hashes[key] = content_hash(export_dict)
+        # Only keep export dicts that will be reported.
+        if old_hashes.get(key) != new_hashes[key]:
+            export_dicts[key] = export_dict
+    added, removed, changed = diff_hashes(old_hashes, new_hashes)
+    diff = {
+        'from_database': old_manifest['database'],
+        'to_database': database,
+        'added': [export_dicts[key] for key in added],
+        'changed': [export_dicts[key] for key in changed],
+        'removed': removed,
+    }
+    log.info('From {} to {}: {} added, {} removed, {} changed, {} unchanged.'.format(
+        old_manifest['database'], database, len(added), len(removed), len(changed), len(new_hashes) - len(added) - len(changed)))
+
+    return diff, {'database': database, 'hashes': new_hashes}
@@ -0,0 +1,216 @@
+"""Module:: result_cache.
+
+Synopsis:
+    Opt-in on-disk cache of query results for "get_db_info.query_db()", for re-running reports against the same frozen
+    database. Results are keyed by (database name, whitespace-normalized SQL, query values, fetch mode), and stored as
+    zlib-compressed pickles under a cache directory, one sub-directory per database. The least recently used results
+    are evicted once the cache exceeds its size limit; a database's results can be invalidated explicitly.
+
+    Cached results are unpickled, which can run code: only result files owned by (and only writable by) the current
+    user are read, and the cache directory should be private to that user.
+
+    Results of queries that join session temp tables (see "feature_scope") depend on the table contents, so a
+    fingerprint of the contents of each such table named in the query is added to its key.
+
+Author(s):
+    Gil dos Santos dossantos@morgan.harvard.edu
+
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import threading
+import zlib
+from harvdev_utils.general_functions.private_files import read_private_file
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+CACHE_FILE_SUFFIX = '.pkl.z'
+
+
+def normalize_sql(sql):
+    """Normalize an SQL query for cache keys: collapse whitespace and drop any trailing ";"."""
+    return re.sub(r'\s+', ' ', sql).strip().rstrip(';').strip()
+
+
+class QueryResultCache(object):
+    """Define an on-disk cache of query results; disabled until "enable()" is called."""
+
+    def __init__(self):
+        """Initialize a disabled QueryResultCache."""
+        self.enabled = False
+        self.cache_dir = None
+        self.database = None
+        self.max_bytes = DEFAULT_MAX_BYTES
+        self.hits = 0
+        self.misses = 0
+        self._table_fingerprints = {}
+        self._total_bytes = None    # Running total size of cached results; None until the cache directory is scanned.
+        self._lock = threading.Lock()
+
+    def enable(self, cache_dir, database, max_bytes=DEFAULT_MAX_BYTES):
+        """Start caching query results.
+
+        Args:
+            arg1 (str): The directory under which to store cached results (made if need be, private to the user).
+            arg2 (str): The database name (e.g., set_up_dict['database']); results are only reused for the same name.
+            max_bytes (int): Optional. The max total size of cached results, across all databases.
+
+        """
+        self.cache_dir = cache_dir
+        self.database = database
+        self.max_bytes = max_bytes
+        self._total_bytes = None
+        os.makedirs(self._database_dir(database), mode=0o700, exist_ok=True)
+        self.enabled = True
+        log.info('Caching query results for database {} under {} (max {} bytes).'.format(database, cache_dir, max_bytes))
+        return
+
+    def disable(self):
+        """Stop caching query results (cached results are kept on disk)."""
+        self.enabled = False
+        return
+
+    def note_table_contents(self, table_name, fingerprint):
+        """Record a fingerprint of the contents of a session table, to be added to the keys of queries that name it.
+
+        Args:
+            arg1 (str): A table name: e.g., a feature scope temp table.
+            arg2 (str): A string that changes when the table contents change: e.g., a hash of its rows.
+
+        """
+        self._table_fingerprints[table_name] = fingerprint
+        return
+
+    def make_key(self, sql, query_variable='no_query', mode='fetchall'):
+        """Make a cache key for a query.
+
+        Args:
+            arg1 (str): The SQL query.
+            query_variable (tuple or dict): Optional bind parameter values for the query.
+            mode (str): Optional. How the results are fetched (results from "COPY" differ in type, for example).
+
+        Returns:
+            str: A hex digest identifying the query results for the current database.
+
+        """
+        normalized_sql = normalize_sql(sql)
+        tables = sorted(
+            (table, fingerprint) for table, fingerprint in self._table_fingerprints.items()
+            if re.search(r'\b{}\b'.format(re.escape(table)), normalized_sql)
+        )
+        key_parts = [self.database, normalized_sql, query_variable, mode, tables]
+        key_text = json.dumps(key_parts, sort_keys=True, default=repr)
+        return hashlib.sha256(key_text.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Get cached results.
+
+        Args:
+            arg1 (str): A key from "make_key()".
+
+        Returns:
+            list: The cached list of row tuples, or None if not cached (or unreadable, or not private to the user).
+
+        """
+        filename = self._filename(key)
+        try:
+            db_results = pickle.loads(zlib.decompress(read_private_file(filename)))
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, zlib.error, pickle.UnpicklingError, EOFError) as error:
+            log.warning('Ignoring unreadable cached results in {}: {}'.format(filename, error))
+            self.misses += 1
+            return None
+        # Mark as recently used, for eviction.
+        os.utime(filename)
+        self.hits += 1
+        return db_results
+
+    def put(self, key, db_results):
+        """Store results, then evict the least recently used results if the cache is over its size limit.
+
+        The cache size is tracked as results are stored, so the cache directory is only scanned when the size limit is
+        exceeded (or on the first store). Results stored by other processes are counted at the next scan.
+
+        Args:
+            arg1 (str): A key from "make_key()".
+            arg2 (list): A list of row tuples.
+
+        """
+        data = zlib.compress(pickle.dumps(db_results, protocol=pickle.HIGHEST_PROTOCOL))
+        database_dir = self._database_dir(self.database)
+        os.makedirs(database_dir, mode=0o700, exist_ok=True)
+        # Write to a temp file, then rename, so that readers never see a partial file.
+        temp_fd, temp_filename = tempfile.mkstemp(dir=database_dir, suffix='.tmp')
+        with os.fdopen(temp_fd, 'wb') as temp_file:
+            temp_file.write(data)
+        filename = self._filename(key)
+        try:
+            old_size = os.path.getsize(filename)
+        except FileNotFoundError:
+            old_size = 0
+        os.replace(temp_filename, filename)
+        log.debug('Cached {} results ({} bytes) as {}.'.format(len(db_results), len(data), key))
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += len(data) - old_size
+            over_limit = self._total_bytes is None or self._total_bytes > self.max_bytes
+        if over_limit:
+            self.evict()
+        return
+
+    def evict(self):
+        """Delete the least recently used cached results until the cache is within its size limit."""
+        with self._lock:
+            cache_files = []
+            for dirpath, dirnames, filenames in os.walk(self.cache_dir):
+                for filename in filenames:
+                    if filename.endswith(CACHE_FILE_SUFFIX):
+                        file_stat = os.stat(os.path.join(dirpath, filename))
+                        cache_files.append((file_stat.st_mtime, file_stat.st_size, os.path.join(dirpath, filename)))
+            total_bytes = sum(i[1] for i in cache_files)
+            evict_cnt = 0
+            for mtime, size, filename in sorted(cache_files):
+                if total_bytes <= self.max_bytes:
+                    break
+                os.remove(filename)
+                total_bytes -= size
+                evict_cnt += 1
+            self._total_bytes = total_bytes
+        if evict_cnt:
+            log.info('Evicted {} cached results to keep the cache under {} bytes.'.format(evict_cnt, self.max_bytes))
+        return
+
+    def invalidate(self, database=None):
+        """Delete cached results for a database.
+
+        Args:
+            database (str): Optional. The database whose results to delete; defaults to the current database.
+
+        """
+        if database is None:
+            database = self.database
+        shutil.rmtree(self._database_dir(database), ignore_errors=True)
+        with self._lock:
+            self._total_bytes = None
+        log.info('Invalidated cached query results for database {}.'.format(database))
+        return
+
+    def _database_dir(self, database):
+        return os.path.join(self.cache_dir, database)
+
+    def _filename(self, key):
+        return os.path.join(self._database_dir(self.database), key + CACHE_FILE_SUFFIX)
+
+
+# The result cache used by "get_db_info.query_db()".
+RESULT_CACHE = QueryResultCache()
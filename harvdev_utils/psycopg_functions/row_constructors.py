@@ -0,0 +1,145 @@
+"""Module:: row_constructors.
+
+Synopsis:
+    Helpers for building many FlyBase objects from db result rows at once: whole columns are validated up front
+    (reporting all bad rows together), then objects are made without running per-row property setters.
+
+Author(s):
+    Gil dos Santos dossantos@morgan.harvard.edu
+
+"""
+
+import gc
+import logging
+import re
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+# The most bad rows to describe in a single error message.
+MAX_REPORTED_ROWS = 25
+
+
+def is_int(value):
+    """Return True if the value passes an "isinstance(value, int)" property setter check."""
+    return isinstance(value, int)
+
+
+def is_bool(value):
+    """Return True if the value passes an "isinstance(value, bool)" property setter check."""
+    return isinstance(value, bool)
+
+
+def regex_check(regex):
+    """Make a column check from a regex, compiled once.
+
+    Args:
+        arg1 (str): A regex, as for the "uniquename_regex" class attributes.
+
+    Returns:
+        function: Returns True for values matching the regex (as for the "re.search()" in property setters).
+
+    """
+    pattern = re.compile(regex)
+
+    def check(value):
+        return isinstance(value, str) and pattern.search(value) is not None
+    return check
+
+
+@contextmanager
+def gc_paused():
+    """Pause cyclic garbage collection while making many objects, since new objects would otherwise trigger it often."""
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+def check_row_columns(class_name, rows, row_length, column_checks):
+    """Check whole columns of db result rows before making objects from them.
+
+    Args:
+        arg1 (str): The name of the class to be made, for error reporting.
+        arg2 (list): A list of row tuples.
+        arg3 (int): The number of values expected in each row.
+        arg4 (list): A list of (row index, attribute name, check function, requirement description) tuples.
+
+    Returns:
+        None.
+
+    Raises:
+        Raises a TypeError describing all bad rows, if any row is the wrong length or fails some column check.
+
+    """
+    problems = {}
+    for row_num, row in enumerate(rows):
+        if len(row) != row_length:
+            problems[row_num] = ['row has {} values, not {}'.format(len(row), row_length)]
+    if problems:
+        _raise_row_problems(class_name, rows, problems)
+    for index, attribute, check, requirement in column_checks:
+        column = [row[index] for row in rows]
+        for row_num, value in enumerate(column):
+            if not check(value):
+                problems.setdefault(row_num, []).append('the "{}" {}'.format(attribute, requirement))
+    if problems:
+        _raise_row_problems(class_name, rows, problems)
+    return
+
+
+def _raise_row_problems(class_name, rows, problems):
+    """Raise a TypeError describing (up to MAX_REPORTED_ROWS) bad rows, given a row number-keyed dict of problem lists."""
+    bad_row_nums = sorted(problems.keys())
+    descriptions = [
+        'row {} {}: {}'.format(row_num, rows[row_num], ', '.join(problems[row_num])) for row_num in bad_row_nums[:MAX_REPORTED_ROWS]
+    ]
+    if len(bad_row_nums) > MAX_REPORTED_ROWS:
+        descriptions.append('and {} more'.format(len(bad_row_nums) - MAX_REPORTED_ROWS))
+    raise TypeError('Cannot make {} objects from {} bad rows: {}'.format(class_name, len(bad_row_nums), '; '.join(descriptions)))
+
+
+def objects_from_rows(cls, rows, row_attributes, column_checks):
+    """Make objects of a class from db result rows, checking columns up front instead of per-row in property setters.
+
+    The first row is passed to the class constructor as usual; the resulting instance attributes serve as the template
+    for the rest, with row values placed directly in the attributes (or property backing fields) named in
+    "row_attributes", and fresh empty containers for any list/dict/set attributes.
+
+    Args:
+        arg1 (class): A class having an "__init__" that takes one positional arg per row value, and a per-object __dict__.
+        arg2 (iterable): Row tuples, with values in the order of the class constructor args.
+        arg3 (tuple): For each row value, the name of the instance attribute in which the constructor stores it.
+        arg4 (list): Column checks, as for "check_row_columns()".
+
+    Returns:
+        list: A list of objects, in row order.
+
+    Raises:
+        Raises a TypeError describing all bad rows, if any.
+
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+    check_row_columns(cls.__name__, rows, len(row_attributes), column_checks)
+    first_object = cls(*rows[0])
+    template = dict(vars(first_object))
+    container_attributes = [
+        (key, type(value)) for key, value in template.items() if type(value) in (list, dict, set) and key not in row_attributes
+    ]
+    new = object.__new__
+    objects = [first_object]
+    with gc_paused():
+        for row in rows[1:]:
+            attributes = template.copy()
+            attributes.update(zip(row_attributes, row))
+            for key, container_type in container_attributes:
+                attributes[key] = container_type()
+            this_object = new(cls)
+            this_object.__dict__ = attributes
+            objects.append(this_object)
+    return objects
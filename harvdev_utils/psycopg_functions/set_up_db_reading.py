@@ -10,12 +10,15 @@ Author(s):
 """
 
 import argparse
+import atexit
 import configparser
 import sys
 import os
 import logging
 import strict_rfc3339
-from harvdev_utils.psycopg_functions import establish_db_connection
+from harvdev_utils.psycopg_functions import (
+    establish_db_connection, export_snapshot, SESSION_PROFILES, DbConnectionPool, PROFILER, RESULT_CACHE, StageCheckpoints
+)
 
 log = logging.getLogger(__name__)
 
@@ -36,6 +39,16 @@ def set_up_db_reading(report_label):
     parser.add_argument('-a', '--alliance', action='store_true', help='Filenames for AGR export.', required=False)
     parser.add_argument('-c', '--config_file', help='Supply filepath to credentials, optional.', required=False)
     parser.add_argument('-t', '--testing', action='store_true', help='Rollback db writes.', required=False)
+    parser.add_argument('--pool_size', type=int, default=4, help='Max number of pooled db connections.', required=False)
+    parser.add_argument('--snapshot', action='store_true', help='Read-only; all db connections see one snapshot.', required=False)
+    parser.add_argument('--session_profile', choices=sorted(SESSION_PROFILES.keys()), help='Session settings for db connections.', required=False)
+    parser.add_argument('--profile', nargs='?', const='tsv', choices=['tsv', 'json'], help='Write a query profile report.', required=False)
+    parser.add_argument('--explain', action='store_true', help='Add EXPLAIN ANALYZE output to the query profile.', required=False)
+    parser.add_argument('--cache_dir', help='Cache query results under this directory, for reruns on the same db.', required=False)
+    parser.add_argument('--cache_max_mb', type=int, default=2048, help='Max size of the query result cache.', required=False)
+    parser.add_argument('--clear_cache', action='store_true', help='Invalidate cached query results for the db.', required=False)
+    parser.add_argument('--checkpoint_dir', help='Save stage checkpoints here, to resume a failed run.', required=False)
+    parser.add_argument('--resume', action='store_true', help='Resume from the stage checkpoints of a failed run.', required=False)
     # Use parse_known_args() instead of parse_args() to handle only the args relevant here without crashing.
     # Extra arguments that may be relevant to specific scripts using this module are safely ignored.
     # args = parser.parse_args()
@@ -60,6 +73,7 @@ def set_up_db_reading(report_label):
         alliance_release = config['default']['AllianceRelease']
         svn_username = config['default']['SVNUsername']
         svn_password = config['default']['SVNPassword']
+        session_profile = config['default'].get('SessionProfile')
         output_dir = './'
         input_dir = './'
         log_dir = './'
@@ -80,6 +94,10 @@ def set_up_db_reading(report_label):
         alliance_release = os.environ.get('ALLIANCERELEASE', 'unspecified')
         svn_username = os.environ.get('SVNUSER', 'unspecified')
         svn_password = os.environ.get('SVNPASSWORD', 'unspecified')
+        session_profile = os.environ.get('SESSIONPROFILE')
+    # A session profile given as an argument overrides one from the config file or environment.
+    if args.session_profile is not None:
+        session_profile = args.session_profile
 
     # Send values to a dict.
     set_up_dict = {}
@@ -98,6 +116,7 @@ def set_up_db_reading(report_label):
     set_up_dict['svn_password'] = svn_password
     set_up_dict['input_dir'] = input_dir
     set_up_dict['output_dir'] = output_dir
+    set_up_dict['session_profile'] = session_profile
 
     # Determine if testing variable is True or false.
     set_up_dict['testing'] = args.testing
@@ -127,8 +146,32 @@ def set_up_db_reading(report_label):
     sys.stdout = open(log_filename, 'a')
     set_up_dict['log'] = logging.getLogger(__name__)
 
+    # Query profiling: the report is written when the script exits.
+    if args.profile is not None:
+        set_up_dict['profile_filename'] = log_dir + report_label + '_' + database + '_query_profile.' + args.profile
+        PROFILER.enable(explain=args.explain)
+        atexit.register(PROFILER.write_report, set_up_dict['profile_filename'])
+
+    # Query result caching (opt-in).
+    if args.cache_dir is not None:
+        RESULT_CACHE.enable(args.cache_dir, database, max_bytes=args.cache_max_mb * 1024 ** 2)
+        if args.clear_cache is True:
+            RESULT_CACHE.invalidate()
+
+    # Stage checkpoints (opt-in): see StageCheckpoints.run_stages().
+    set_up_dict['checkpoints'] = StageCheckpoints(args.checkpoint_dir, database, report_label, resume=args.resume)
+
     # Establish database connection.
-    set_up_dict['conn'], conn_description = establish_db_connection(server, database, username, password)
+    set_up_dict['conn'], conn_description = establish_db_connection(server, database, username, password, session_profile=session_profile)
+    # Pooled connections (opened on demand) for independent queries; see DbConnectionPool.
+    set_up_dict['conn_pool'] = DbConnectionPool(server, database, username, password, maxconn=args.pool_size,
+                                                session_profile=session_profile)
+    # Optionally, have the main and pooled connections all read from one consistent snapshot of the db.
+    # The snapshot lasts until set_up_dict['conn'] is committed or rolled back.
+    set_up_dict['snapshot_id'] = None
+    if args.snapshot is True:
+        set_up_dict['snapshot_id'] = export_snapshot(set_up_dict['conn'])
+        set_up_dict['conn_pool'].use_snapshot(set_up_dict['snapshot_id'])
 
     # Official timestamp for this script.
     set_up_dict['the_time'] = strict_rfc3339.now_to_rfc3339_localoffset()
@@ -2,6 +2,7 @@
 
 Synopsis:
       Commonly used sql queries. Use ".format()" function to add values for "{}" variables.
+      For bind-parameter versions of these queries (values passed separately), see "query_registry".
 
 Author(s):
       Gil dos Santos dossantos@morgan.harvard.edu
@@ -346,3 +347,100 @@ gene_HGNC_ids = """
           fdbx.is_current = true and
           db.name = 'HGNC';
     """
+
+# Get current symbol/fullname, symbol/fullname synonyms and secondary FB IDs for features, in one pass.
+# Must provide a feature uniquename regex, then a secondary ID accession regex.
+# Synonym columns match those of "current_feat_symbol_sgmls", "current_feat_fullname_sgmls", "feat_symbol_synonyms"
+# (2nd + 3rd array) and "feat_fullname_synonyms" (4th + 5th array); the last column matches "feat_secondary_fbids".
+# Arrays are NULL where a feature has no values of that kind.
+feat_synonyms_and_ids = """
+    WITH feat AS (
+        SELECT f.feature_id,
+               f.uniquename
+        FROM feature f
+        WHERE f.is_obsolete = false and
+              f.is_analysis = false and
+              f.uniquename ~ '{}'
+    ),
+    syn AS (
+        SELECT fs.feature_id,
+               array_agg(DISTINCT s.synonym_sgml) FILTER (WHERE fs.is_current = true and cvts.name = 'symbol') AS current_symbols,
+               array_agg(DISTINCT s.synonym_sgml) FILTER (WHERE fs.is_current = true and cvts.name = 'fullname') AS current_fullnames,
+               array_agg(DISTINCT s.name) FILTER (WHERE s.name != s.synonym_sgml and cvts.name = 'symbol') AS symbol_names,
+               array_agg(DISTINCT s.synonym_sgml) FILTER (WHERE fs.is_current = false and cvts.name = 'symbol') AS symbol_sgmls,
+               array_agg(DISTINCT s.name) FILTER (WHERE s.name != s.synonym_sgml and cvts.name = 'fullname') AS fullname_names,
+               array_agg(DISTINCT s.synonym_sgml) FILTER (WHERE fs.is_current = false and cvts.name = 'fullname') AS fullname_sgmls
+        FROM feat
+        JOIN feature_synonym fs ON fs.feature_id = feat.feature_id
+        JOIN synonym s ON s.synonym_id = fs.synonym_id
+        JOIN cvterm cvts ON cvts.cvterm_id = s.type_id
+        WHERE fs.is_internal = false and
+              cvts.name in ('symbol', 'fullname')
+        GROUP BY fs.feature_id
+    ),
+    xref AS (
+        SELECT fdbx.feature_id,
+               array_agg(DISTINCT dbx.accession) AS secondary_ids
+        FROM feat
+        JOIN feature_dbxref fdbx ON fdbx.feature_id = feat.feature_id
+        JOIN dbxref dbx ON dbx.dbxref_id = fdbx.dbxref_id
+        JOIN db ON db.db_id = dbx.db_id
+        WHERE fdbx.is_current = false and
+              dbx.accession ~ '{}' and
+              db.name = 'FlyBase'
+        GROUP BY fdbx.feature_id
+    )
+    SELECT feat.uniquename,
+           syn.current_symbols,
+           syn.current_fullnames,
+           syn.symbol_names,
+           syn.symbol_sgmls,
+           syn.fullname_names,
+           syn.fullname_sgmls,
+           xref.secondary_ids
+    FROM feat
+    LEFT OUTER JOIN syn ON syn.feature_id = feat.feature_id
+    LEFT OUTER JOIN xref ON xref.feature_id = feat.feature_id;
+    """
+
+# Get the latest audit_chado timestamp for each current pub (and its pubauthors, pubprops, pub_dbxrefs and
+# pub_relationships as subject), given a pub uniquename regex: e.g., r'^FBrf[0-9]{7}$'.
+# Every current pub is listed: those with no audit rows at all get the 'epoch' timestamp (1970-01-01).
+# Changes that only delete related rows are not seen, since audit rows for deleted records no longer join.
+pub_timelastmodified = """
+    WITH cur_pub AS (
+        SELECT p.pub_id
+        FROM pub p
+        WHERE p.is_obsolete = false and p.uniquename ~ '{}'
+    ),
+    pub_audits AS (
+        SELECT cur_pub.pub_id, ac.transaction_timestamp
+        FROM cur_pub
+        JOIN audit_chado ac ON ac.record_pkey = cur_pub.pub_id and ac.audit_table = 'pub'
+        UNION ALL
+        SELECT cur_pub.pub_id, ac.transaction_timestamp
+        FROM cur_pub
+        JOIN pubauthor pa ON pa.pub_id = cur_pub.pub_id
+        JOIN audit_chado ac ON ac.record_pkey = pa.pubauthor_id and ac.audit_table = 'pubauthor'
+        UNION ALL
+        SELECT cur_pub.pub_id, ac.transaction_timestamp
+        FROM cur_pub
+        JOIN pubprop pp ON pp.pub_id = cur_pub.pub_id
+        JOIN audit_chado ac ON ac.record_pkey = pp.pubprop_id and ac.audit_table = 'pubprop'
+        UNION ALL
+        SELECT cur_pub.pub_id, ac.transaction_timestamp
+        FROM cur_pub
+        JOIN pub_dbxref pdbx ON pdbx.pub_id = cur_pub.pub_id
+        JOIN audit_chado ac ON ac.record_pkey = pdbx.pub_dbxref_id and ac.audit_table = 'pub_dbxref'
+        UNION ALL
+        SELECT cur_pub.pub_id, ac.transaction_timestamp
+        FROM cur_pub
+        JOIN pub_relationship pr ON pr.subject_id = cur_pub.pub_id
+        JOIN audit_chado ac ON ac.record_pkey = pr.pub_relationship_id and ac.audit_table = 'pub_relationship'
+    )
+    SELECT cur_pub.pub_id,
+           COALESCE(max(pub_audits.transaction_timestamp), 'epoch')
+    FROM cur_pub
+    LEFT OUTER JOIN pub_audits ON pub_audits.pub_id = cur_pub.pub_id
+    GROUP BY cur_pub.pub_id;
+    """
@@ -0,0 +1,208 @@
+"""Module:: stage_checkpoint.
+
+Synopsis:
+    Checkpointing of long report pipelines (e.g., base features, then many enrichment passes, then AGR processing,
+    then the dump), so that a failed run can resume from its last completed stage. After each named stage, the data
+    (e.g., the enriched data_dict) is pickled to a checkpoint file. When a failed script is re-run with "resume" (e.g.,
+    the "--resume" argument of "set_up_db_reading()") for the same database and report label, the completed stages are
+    skipped: the data is loaded from the latest usable checkpoint instead. Without "resume", old checkpoints are cleared
+    and all stages run. Once all stages of a run succeed, its checkpoints are cleared.
+
+    Typical use in a report script:
+        checkpoints = set_up_dict['checkpoints']
+        data_dict = checkpoints.run_stages([
+            ('features', lambda data: get_features_by_uname_regex(conn, FBal_regex)),
+            ('symbols', lambda data: add_unique_info(data, 'symbol', conn, current_feat_symbol_sgmls, FBal_regex)),
+            ('agr_processing', lambda data: run_transform_stage(data, ['agr_allele_processing'])),
+        ])
+
+    Stages are matched to checkpoints by name and order: if the stage list changes, only checkpoints for the unchanged
+    leading stages are used. Checkpoints do not notice db changes: only resume a run against the same, unchanged db.
+    Checkpoints are unpickled, which can run code: only checkpoint files owned by (and only writable by) the current
+    user are loaded, and the checkpoint directory should be private to that user.
+
+Author(s):
+    Gil dos Santos dossantos@morgan.harvard.edu
+
+"""
+
+import json
+import logging
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import time
+from harvdev_utils.general_functions.private_files import read_private_file
+
+log = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = 'manifest.json'
+CHECKPOINT_FILE_SUFFIX = '.pkl'
+
+
+class StageCheckpoints(object):
+    """Define checkpoints for the stages of one report (per database); without a checkpoint_dir, stages just run."""
+
+    def __init__(self, checkpoint_dir, database, report_label, resume=False):
+        """Initialize a StageCheckpoints object.
+
+        Args:
+            arg1 (str): The directory under which to keep checkpoints (made if need be); or None to not checkpoint.
+            arg2 (str): The database name (e.g., set_up_dict['database']).
+            arg3 (str): The report label (as passed to "set_up_db_reading()").
+            resume (bool): Optional. If True, use checkpoints left by a failed run; otherwise, clear them.
+
+        Returns:
+            StageCheckpoints: A "StageCheckpoints" object.
+
+        """
+        self.database = database
+        self.report_label = report_label
+        self.enabled = checkpoint_dir is not None
+        self.stage_dir = None
+        self.stages = []    # Completed stages, in order: dicts of stage name, filename, seconds and bytes.
+        if self.enabled is True:
+            self.stage_dir = os.path.join(checkpoint_dir, '{}_{}'.format(report_label, database))
+            os.makedirs(self.stage_dir, mode=0o700, exist_ok=True)
+            if resume is True:
+                self.stages = self._load_manifest()
+                log.info('Checkpointing stages under {}; {} completed stages found.'.format(self.stage_dir, len(self.stages)))
+            else:
+                self.clear()
+
+    def _load_manifest(self):
+        manifest_filename = os.path.join(self.stage_dir, MANIFEST_FILENAME)
+        if not os.path.exists(manifest_filename):
+            return []
+        try:
+            with open(manifest_filename) as manifest_file:
+                manifest = json.load(manifest_file)
+        except (OSError, ValueError) as error:
+            log.warning('Ignoring unreadable checkpoint manifest {}: {}'.format(manifest_filename, error))
+            return []
+        if manifest.get('database') != self.database or manifest.get('report_label') != self.report_label:
+            log.warning('Ignoring checkpoint manifest {} for another database or report.'.format(manifest_filename))
+            return []
+        return manifest['stages']
+
+    def _save_manifest(self):
+        manifest = {'database': self.database, 'report_label': self.report_label, 'stages': self.stages}
+        self._write_file(MANIFEST_FILENAME, json.dumps(manifest, indent=2).encode('utf-8'))
+        return
+
+    def _write_file(self, filename, data):
+        # Write to a temp file, then rename, so that a crash never leaves a partial file.
+        temp_fd, temp_filename = tempfile.mkstemp(dir=self.stage_dir, suffix='.tmp')
+        with os.fdopen(temp_fd, 'wb') as temp_file:
+            temp_file.write(data)
+        os.replace(temp_filename, os.path.join(self.stage_dir, filename))
+        return
+
+    def completed_stages(self):
+        """Get the names of completed stages, in order."""
+        return [stage['stage'] for stage in self.stages]
+
+    def save(self, stage_name, data, seconds=None):
+        """Save a checkpoint of data after a stage, as the latest completed stage.
+
+        Args:
+            arg1 (str): The stage name.
+            arg2 (object): The data to save: e.g., a data_dict; it must be picklable.
+            seconds (float): Optional. How long the stage took, for the record.
+
+        """
+        if self.enabled is False:
+            return
+        data_bytes = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        filename = '{:03d}_{}{}'.format(len(self.stages), re.sub(r'[^A-Za-z0-9_.-]', '_', stage_name), CHECKPOINT_FILE_SUFFIX)
+        self._write_file(filename, data_bytes)
+        self.stages.append({'stage': stage_name, 'filename': filename, 'seconds': seconds, 'bytes': len(data_bytes)})
+        self._save_manifest()
+        log.info('Saved checkpoint for stage "{}" ({} bytes).'.format(stage_name, len(data_bytes)))
+        return
+
+    def load(self, stage_name):
+        """Load the data saved after a completed stage.
+
+        Args:
+            arg1 (str): The stage name.
+
+        Returns:
+            object: The data saved by "save()".
+
+        Raises:
+            Raises a KeyError if the stage has no checkpoint; or a PermissionError if its file is not private to the user.
+
+        """
+        for stage in self.stages:
+            if stage['stage'] == stage_name:
+                data = pickle.loads(read_private_file(os.path.join(self.stage_dir, stage['filename'])))
+                log.info('Loaded checkpoint for stage "{}".'.format(stage_name))
+                return data
+        raise KeyError('No checkpoint for stage "{}".'.format(stage_name))
+
+    def _drop_stages_from(self, stage_index):
+        """Drop the checkpoints of completed stages from some index on: i.e., those whose input is about to change."""
+        for stage in self.stages[stage_index:]:
+            try:
+                os.remove(os.path.join(self.stage_dir, stage['filename']))
+            except FileNotFoundError:
+                pass
+        if len(self.stages) > stage_index:
+            log.info('Dropping outdated checkpoints for stages: {}'.format(self.completed_stages()[stage_index:]))
+            self.stages = self.stages[:stage_index]
+            self._save_manifest()
+        return
+
+    def run_stages(self, stages, data=None):
+        """Run pipeline stages in order, skipping those completed in a previous run, and save a checkpoint after each.
+
+        Args:
+            arg1 (list): A list of (stage name, function) tuples. Each function takes the output of the previous stage
+                (or "data" for the first stage) and returns the new data; if it returns None, its input (e.g., a
+                data_dict updated in place) is taken as its output.
+            data (object): Optional. The input for the first stage.
+
+        Returns:
+            object: The output of the last stage.
+
+        Once all stages succeed, the checkpoints are cleared: they are only kept to resume a failed run.
+
+        """
+        stage_names = [stage[0] for stage in stages]
+        if len(set(stage_names)) != len(stage_names):
+            raise ValueError('Stage names must be unique: {}'.format(stage_names))
+        # Resume after the longest run of leading stages that match completed stages.
+        resume_index = 0
+        for stage_name, completed_stage_name in zip(stage_names, self.completed_stages()):
+            if stage_name != completed_stage_name:
+                break
+            resume_index += 1
+        if resume_index > 0:
+            log.info('Skipping {} completed stages: {}'.format(resume_index, stage_names[:resume_index]))
+            data = self.load(stage_names[resume_index - 1])
+        self._drop_stages_from(resume_index)
+        for stage_index, (stage_name, function) in enumerate(stages[resume_index:], start=resume_index):
+            log.info('Running stage "{}".'.format(stage_name))
+            start_time = time.monotonic()
+            output = function(data)
+            if output is not None:
+                data = output
+            # No need to save the last stage: the run is then done.
+            if stage_index < len(stages) - 1:
+                self.save(stage_name, data, seconds=time.monotonic() - start_time)
+        self.clear()
+
+        return data
+
+    def clear(self):
+        """Delete all checkpoints for the report and database."""
+        if self.enabled is False:
+            return
+        shutil.rmtree(self.stage_dir, ignore_errors=True)
+        os.makedirs(self.stage_dir, mode=0o700, exist_ok=True)
+        self.stages = []
+        log.info('Cleared checkpoints under {}.'.format(self.stage_dir))
+        return
@@ -0,0 +1,171 @@
+"""Module:: uniquename_regex.
+
+Synopsis:
+    Rewrites anchored FlyBase ID regex filters (e.g., "f.uniquename ~ '^FBgn[0-9]{7}$'") into index-friendly predicates.
+    A POSIX regex predicate can't use a btree index, so it forces a scan of the whole feature table. For a recognized
+    ID pattern, the filter becomes a uniquename range for each ID prefix (e.g., ">= 'FBgn' AND < 'FBgo'") plus a cheap
+    length check, with the exact regex kept only to recheck rows that pass the indexed conditions.
+    Ranges are used rather than "LIKE 'FBgn%'" since a plain btree index supports ranges under any collation.
+    Only letter prefixes are handled, so the ranges are the same under C and natural-language collations.
+    Unrecognized regexes are left alone.
+
+Author(s):
+    Gil dos Santos dossantos@morgan.harvard.edu
+
+"""
+
+import re
+
+# Recognized patterns: literal prefix, optional "(ab|cd)" alternation, optional "[a-z]{n}" letters, then digits.
+# e.g., '^FBgn[0-9]{7}$', '^FB(al|ab|ti|tp)[0-9]{7}$', '^FBsf[0-9]{10}$', '^FB[a-z]{2}[0-9]{7,10}$'.
+ID_REGEX_PATTERN = re.compile(r"""
+    ^\^
+    (?P<prefix>[A-Za-z]+)
+    (?:\((?P<alternatives>[A-Za-z]+(?:\|[A-Za-z]+)*)\))?
+    (?:\[a-z\]\{(?P<letters>[0-9]+)\})?
+    \[0-9\]\{(?P<min_digits>[0-9]+)(?:,(?P<max_digits>[0-9]+))?\}
+    \$$
+""", re.VERBOSE)
+
+# A regex filter on a uniquename column in sql text, with the regex as a quoted literal ('' escapes a quote).
+SQL_FILTER_PATTERN = re.compile(r"(?P<column>\b[A-Za-z_][A-Za-z0-9_]*\.uniquename) ~ '(?P<regex>(?:[^']|'')*)'")
+
+# The same, but with the regex given as a "%(name)s" bind parameter.
+SQL_PARAM_FILTER_PATTERN = re.compile(r"(?P<column>\b[A-Za-z_][A-Za-z0-9_]*\.uniquename) ~ %\((?P<param>\w+)\)s")
+
+
+class UniquenameRegexBounds(object):
+    """Define the index-friendly bounds implied by an anchored FlyBase ID regex."""
+
+    def __init__(self, regex, prefixes, min_length, max_length):
+        """Initialize a UniquenameRegexBounds object.
+
+        Args:
+            arg1 (str): The original regex: e.g., r'^FBgn[0-9]{7}$'.
+            arg2 (list): The literal uniquename prefixes that the regex allows: e.g., ['FBgn'].
+            arg3 (int): The minimum uniquename length the regex allows.
+            arg4 (int): The maximum uniquename length the regex allows.
+
+        """
+        self.regex = regex
+        self.prefixes = prefixes
+        self.min_length = min_length
+        self.max_length = max_length
+
+    def prefix_ranges(self):
+        """Get a (lower, upper) uniquename range for each prefix: lower <= uniquename < upper."""
+        return [(i, i[:-1] + chr(ord(i[-1]) + 1)) for i in self.prefixes]
+
+
+def parse_uniquename_regex(regex):
+    """Work out the prefixes and lengths allowed by an anchored FlyBase ID regex.
+
+    Args:
+        arg1 (str): A uniquename regex: e.g., r'^FBgn[0-9]{7}$'.
+
+    Returns:
+        UniquenameRegexBounds: The bounds for the regex; or None if the regex is not a recognized ID pattern.
+
+    """
+    match = ID_REGEX_PATTERN.match(regex)
+    if match is None:
+        return None
+    prefix = match.group('prefix')
+    if match.group('alternatives'):
+        alternatives = match.group('alternatives').split('|')
+        if len(set(len(i) for i in alternatives)) > 1:
+            return None
+        prefixes = [prefix + i for i in alternatives]
+        fixed_length = len(prefixes[0])
+    else:
+        prefixes = [prefix]
+        fixed_length = len(prefix)
+    # The upper bound of a prefix ending in "z" would not be a letter; leave such regexes alone.
+    if any(i[-1] in 'zZ' for i in prefixes):
+        return None
+    if match.group('letters'):
+        fixed_length += int(match.group('letters'))
+    min_digits = int(match.group('min_digits'))
+    max_digits = int(match.group('max_digits') or min_digits)
+
+    return UniquenameRegexBounds(regex, prefixes, fixed_length + min_digits, fixed_length + max_digits)
+
+
+def uniquename_bounds_sql(column, bounds, regex_sql):
+    """Build the index-friendly sql predicate for some UniquenameRegexBounds.
+
+    Args:
+        arg1 (str): The uniquename column: e.g., "f.uniquename".
+        arg2 (UniquenameRegexBounds): The bounds from "parse_uniquename_regex()".
+        arg3 (str): The sql for the regex recheck value: a quoted literal, or a bind placeholder like "%(name)s".
+
+    Returns:
+        str: An sql predicate (in parentheses).
+
+    """
+    ranges = ' OR '.join("{0} >= '{1}' AND {0} < '{2}'".format(column, lower, upper) for lower, upper in bounds.prefix_ranges())
+    if len(bounds.prefixes) > 1:
+        ranges = '({})'.format(ranges)
+    if bounds.min_length == bounds.max_length:
+        length_check = 'length({}) = {}'.format(column, bounds.min_length)
+    else:
+        length_check = 'length({}) BETWEEN {} AND {}'.format(column, bounds.min_length, bounds.max_length)
+
+    return '({} AND {} AND {} ~ {})'.format(ranges, length_check, column, regex_sql)
+
+
+def uniquename_regex_sql(column, regex):
+    """Get an index-friendly sql predicate equivalent to "column ~ 'regex'".
+
+    Args:
+        arg1 (str): The uniquename column: e.g., "f.uniquename".
+        arg2 (str): A uniquename regex: e.g., r'^FBgn[0-9]{7}$'.
+
+    Returns:
+        str: The rewritten sql predicate; or a plain regex predicate if the regex is not a recognized ID pattern.
+
+    """
+    regex_sql = "'{}'".format(regex.replace("'", "''"))
+    bounds = parse_uniquename_regex(regex)
+    if bounds is None:
+        return '{} ~ {}'.format(column, regex_sql)
+
+    return uniquename_bounds_sql(column, bounds, regex_sql)
+
+
+def rewrite_uniquename_regex_filters(sql):
+    """Rewrite every recognized "alias.uniquename ~ '<regex>'" filter in some sql text.
+
+    Args:
+        arg1 (str): An sql query with any "{}" placeholders already filled in.
+
+    Returns:
+        str: The sql query, with recognized uniquename regex filters replaced by index-friendly predicates.
+
+    """
+    def rewrite(match):
+        return uniquename_regex_sql(match.group('column'), match.group('regex').replace("''", "'"))
+
+    return SQL_FILTER_PATTERN.sub(rewrite, sql)
+
+
+def rewrite_uniquename_regex_params(sql, params):
+    """Rewrite every recognized "alias.uniquename ~ %(name)s" filter in some sql text, given the parameter values.
+
+    The regex stays a bind parameter for the recheck; only the derived prefix ranges and lengths are written into the sql.
+
+    Args:
+        arg1 (str): An sql query with "%(name)s" bind placeholders.
+        arg2 (dict): The bind parameter values, keyed by name.
+
+    Returns:
+        str: The sql query, with recognized uniquename regex filters replaced by index-friendly predicates.
+
+    """
+    def rewrite(match):
+        bounds = parse_uniquename_regex(str(params.get(match.group('param'), '')))
+        if bounds is None:
+            return match.group(0)
+        return uniquename_bounds_sql(match.group('column'), bounds, '%({})s'.format(match.group('param')))
+
+    return SQL_PARAM_FILTER_PATTERN.sub(rewrite, sql)
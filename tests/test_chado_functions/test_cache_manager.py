@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `harvdev_utils` package chado_functions cache_manager.py file."""
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from harvdev_utils.chado_functions import CacheManager
+
+
+@pytest.fixture
+def manager():
+    return CacheManager()
+
+
+@pytest.fixture
+def session():
+    return sessionmaker(bind=create_engine('sqlite://'))()
+
+
+def test_nested_cache_acts_like_dict_of_dicts(manager):
+    cache = manager.register('feature_cache', max_size=3, nested=True)
+    assert 'gene' not in cache
+    cache['gene'] = {}
+    cache['gene']['FBgn0284084'] = 'wg'
+    cache['gene']['wg'] = 'wg'
+    assert 'gene' in cache and 'wg' in cache['gene']
+    assert cache['gene']['FBgn0284084'] == 'wg'
+    assert sorted(cache['gene']) == ['FBgn0284084', 'wg']
+    with pytest.raises(KeyError):
+        cache['allele']['wg[1]']
+    # Least recently used entry ("wg") goes first.
+    cache['allele'] = {'wg[1]': 'wg[1]', 'wg[2]': 'wg[2]'}
+    assert 'wg' not in cache['gene'] and 'FBgn0284084' in cache['gene']
+    assert manager.stats()['feature_cache']['evictions'] == 1
+
+
+def test_evict_callback_and_resize(manager):
+    cache = manager.register('db_dict', max_size=None)
+    evicted = []
+    cache.on_evict(evicted.append)
+    for db_name in ['FlyBase', 'GB', 'SO']:
+        cache[db_name] = db_name
+    cache['FlyBase']
+    manager.configure(max_sizes={'db_dict': 1})
+    assert evicted == ['GB', 'SO'] and list(cache) == ['FlyBase']
+
+
+def test_scope_and_rollback(manager, session):
+    cache = manager.register('organism_dict', max_size=10)
+    manager.bind(session)
+    cache['Dmel'] = 'Dmel'
+    manager.bind(session)
+    assert 'Dmel' in cache
+    session.execute(text('SELECT 1'))
+    session.rollback()
+    assert 'Dmel' not in cache
+    cache['Dmel'] = 'Dmel'
+    session.commit()
+    assert 'Dmel' in cache
+    other_session = sessionmaker(bind=session.get_bind())()
+    manager.bind(other_session)
+    assert 'Dmel' not in cache
+
+
+def test_engine_scope(manager, session):
+    cache = manager.register('general_type_cache')
+    manager.configure(scope='engine')
+    manager.bind(session)
+    cache['gene'] = 'gene'
+    manager.bind(sessionmaker(bind=session.get_bind())())
+    assert 'gene' in cache
+    with pytest.raises(ValueError):
+        manager.configure(scope='thread')
+
+
+def test_caches_kept_per_scope(manager, session):
+    cache = manager.register('cv_cvterm', max_size=10, nested=True)
+    other_session = sessionmaker(bind=session.get_bind())()
+    manager.bind(session)
+    cache['SO'] = {'gene': 'gene'}
+    manager.bind(other_session)
+    assert 'SO' not in cache
+    cache['SO'] = {'allele': 'allele'}
+    manager.bind(session)
+    assert list(cache['SO']) == ['gene']
+    # Events empty the caches of the session's own scope, current or not.
+    other_session.execute(text('SELECT 1'))
+    other_session.rollback()
+    assert list(cache['SO']) == ['gene']
+    manager.bind(other_session)
+    assert 'SO' not in cache
+    # With engine scope, sessions of one engine share entries; a different engine (maybe a different db) has its own.
+    manager.configure(scope='engine')
+    manager.bind(session)
+    cache['SO'] = {'gene': 'gene'}
+    manager.bind(other_session)
+    assert 'gene' in cache['SO']
+    manager.bind(sessionmaker(bind=create_engine('sqlite://'))())
+    assert 'SO' not in cache
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `harvdev_utils` package chado_functions cvterm.py file."""
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from harvdev_utils.chado_functions import CodingError, get_cvterm
+from harvdev_utils.production import Cv, Cvterm
+
+
+@pytest.fixture
+def session():
+    # The production tables have postgres defaults, so make just the columns used here.
+    session = sessionmaker(bind=create_engine('sqlite://'))()
+    session.execute(text('CREATE TABLE cv (cv_id INTEGER PRIMARY KEY, name VARCHAR(255) NOT NULL, definition TEXT)'))
+    session.execute(text('CREATE TABLE cvterm (cvterm_id INTEGER PRIMARY KEY, cv_id INTEGER, definition TEXT, dbxref_id INTEGER, '
+                         'is_obsolete INTEGER, is_relationshiptype INTEGER, name VARCHAR(1024))'))
+    session.add(Cv(cv_id=1, name='SO'))
+    session.commit()
+    return session
+
+
+def add_cvterm(session, cvterm_id, name):
+    session.add(Cvterm(cvterm_id=cvterm_id, name=name, cv_id=1, dbxref_id=cvterm_id, is_obsolete=0, is_relationshiptype=0))
+
+
+def test_create_then_lookup(session):
+    with pytest.raises(CodingError):
+        get_cvterm(session, 'SO', 'gene')
+    add_cvterm(session, 1, 'gene')
+    assert get_cvterm(session, 'SO', 'gene').cvterm_id == 1
+    # Misses are cached again once made, until the next commit.
+    with pytest.raises(CodingError):
+        get_cvterm(session, 'SO', 'allele')
+    session.commit()
+    session.execute(text("INSERT INTO cvterm VALUES (2, 1, NULL, 2, 0, 0, 'allele')"))
+    assert get_cvterm(session, 'SO', 'allele').cvterm_id == 2
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `harvdev_utils` package chado_functions feature.py file (batch lookups, with the queries stubbed)."""
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import harvdev_utils.chado_functions.feature as feature_module
+from harvdev_utils.chado_functions import (
+    CACHE_MANAGER, SYMBOL_INDEX, feature_symbol_batch_lookup, feature_synonym_lookup, get_features_by_uniquenames
+)
+
+
+def make_feature(feature_id, uniquename, type_name='gene'):
+    return SimpleNamespace(feature_id=feature_id, uniquename=uniquename, type=SimpleNamespace(name=type_name))
+
+
+class FakeQuery(object):
+    """Stand-in for session.query(...): rows for the names in the first filter criterion, i.e. uniquename.in_(chunk)."""
+
+    def __init__(self, rows_by_name, chunks, with_name):
+        self.rows_by_name = rows_by_name
+        self.chunks = chunks
+        self.with_name = with_name
+        self.names = []
+
+    def join(self, *args):
+        return self
+
+    def filter(self, *criteria):
+        self.names = criteria[0].right.value
+        self.chunks.append(self.names)
+        return self
+
+    def __iter__(self):
+        for name in self.names:
+            for feature in self.rows_by_name.get(name, []):
+                yield (feature, name) if self.with_name else feature
+
+
+@pytest.fixture
+def session(monkeypatch):
+    session = sessionmaker(bind=create_engine('sqlite://'))()
+    monkeypatch.setattr(feature_module, 'feature_type_lookup', lambda session, type_name: SimpleNamespace(cvterm_id=219))
+    monkeypatch.setattr(feature_module, 'get_cvterm', lambda session, cv_name, cvterm_name: SimpleNamespace(cvterm_id=59978))
+    yield session
+    CACHE_MANAGER.clear()
+
+
+def stub_queries(monkeypatch, session, rows_by_name, with_name=False):
+    """Make session.query return FakeQuery objects; return the list of name chunks queried."""
+    chunks = []
+    monkeypatch.setattr(session, 'query', lambda *entities: FakeQuery(rows_by_name, chunks, with_name))
+    return chunks
+
+
+def test_get_features_by_uniquenames(monkeypatch, session):
+    wg = make_feature(1, 'FBgn0284084')
+    rows = {'FBgn0284084': [wg], 'FBgn0000002': [make_feature(2, 'FBgn0000002'), make_feature(3, 'FBgn0000002')]}
+    chunks = stub_queries(monkeypatch, session, rows)
+    uniquenames = ['FBgn0000003', 'FBgn0000002', 'FBgn0284084', 'FBgn0000001', 'FBgn0284084']
+    features, missing, ambiguous = get_features_by_uniquenames(session, uniquenames, type_name='gene', chunk_size=2)
+    assert features == {'FBgn0284084': wg}
+    # In input order, each uniquename once.
+    assert missing == ['FBgn0000003', 'FBgn0000001']
+    assert ambiguous == ['FBgn0000002']
+    assert chunks == [['FBgn0000003', 'FBgn0000002'], ['FBgn0284084', 'FBgn0000001']]
+    # Found features are cached, so only the others are queried again.
+    del chunks[:]
+    features, missing, ambiguous = get_features_by_uniquenames(session, uniquenames, type_name='gene', chunk_size=2)
+    assert features == {'FBgn0284084': wg}
+    assert chunks == [['FBgn0000003', 'FBgn0000002'], ['FBgn0000001']]
+
+
+def test_feature_symbol_batch_lookup(monkeypatch, session):
+    wg = make_feature(1, 'FBgn0284084')
+    wg1 = make_feature(4, 'FBal0018482', 'allele')
+    hsap_wnt1 = make_feature(5, 'FBgn0000005')
+    rows = {'wg': [wg], 'wg[1]': [wg1], 'Hsap\\WNT1': [hsap_wnt1],
+            'dup': [make_feature(2, 'FBgn0000002'), make_feature(3, 'FBgn0000003')]}
+    chunks = stub_queries(monkeypatch, session, rows, with_name=True)
+
+    def organism_from_symbol(session, symbol):
+        return SimpleNamespace(organism_id=2 if symbol.startswith('Hsap') else 1), symbol, symbol
+    monkeypatch.setattr(feature_module, 'synonym_name_details', organism_from_symbol)
+
+    type_symbols = [('gene', 'no_such_gene'), ('gene', 'dup'), ('allele', 'wg[1]'), ('gene', 'wg'),
+                    ('gene', 'Hsap\\WNT1'), ('allele', 'no_such_allele'), ('gene', 'dup')]
+    features, missing, ambiguous = feature_symbol_batch_lookup(session, type_symbols, chunk_size=2)
+    assert features == {('gene', 'wg'): wg, ('allele', 'wg[1]'): wg1, ('gene', 'Hsap\\WNT1'): hsap_wnt1}
+    # In input order over all organisms and types, each pair once.
+    assert missing == [('gene', 'no_such_gene'), ('allele', 'no_such_allele')]
+    assert ambiguous == [('gene', 'dup')]
+    # A query per organism and type, and per chunk of symbols.
+    assert chunks == [['no_such_gene', 'dup'], ['wg'], ['wg[1]', 'no_such_allele'], ['Hsap\\WNT1']]
+    # Found features are cached by symbol, so only the others are queried again.
+    del chunks[:]
+    features, missing, ambiguous = feature_symbol_batch_lookup(session, type_symbols, chunk_size=2)
+    assert len(features) == 3
+    assert chunks == [['no_such_gene', 'dup'], ['no_such_allele']]
+
+
+def test_feature_synonym_lookup_uses_symbol_index(monkeypatch, session):
+    wg = make_feature(1, 'FBgn0284084')
+    monkeypatch.setattr(SYMBOL_INDEX, 'database', session.get_bind().url.render_as_string(hide_password=True))
+    monkeypatch.setattr(SYMBOL_INDEX, 'type_names', ('gene', ))
+    monkeypatch.setattr(SYMBOL_INDEX, 'organism_ids', (1, ))
+    monkeypatch.setattr(SYMBOL_INDEX, 'index', {(1, 'gene'): {'wg': 1}})
+    # Only the feature itself is fetched, by primary key.
+    monkeypatch.setattr(session, 'query', lambda *entities: SimpleNamespace(get={1: wg}.get))
+    assert feature_synonym_lookup(session, 'gene', 'wg', organism_id=1, check_unique=True, is_current='t') is wg
+    # Any symbol, current or not: the index cannot tell, so the db is queried (the stub has no query methods).
+    CACHE_MANAGER.clear()
+    with pytest.raises(AttributeError):
+        feature_synonym_lookup(session, 'gene', 'wg', organism_id=1, check_unique=True)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `harvdev_utils` package chado_functions symbol_index.py file."""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+import harvdev_utils.chado_functions.symbol_index as symbol_index_module
+from harvdev_utils.chado_functions import CACHE_MANAGER, SYMBOL_INDEX, SymbolIndex
+from harvdev_utils.production import Synonym
+
+ROWS = [
+    ('wg', 1, 1, 'FBgn0284084', 'gene'),
+    ('wg-model', 2, 1, 'FBog0000002', 'gene'),  # gene models: left to the db,
+    ('tin', 7, 1, 'FBog0000007', 'gene'),       # as is any gene symbol they share.
+    ('tin', 8, 1, 'FBgn0004110', 'gene'),
+    ('wg[1]', 3, 1, 'FBal0018482', 'allele'),
+    ('dup', 4, 1, 'FBal0000004', 'allele'),
+    ('dup', 5, 1, 'FBal0000005', 'allele'),  # ambiguous.
+    ('wg', 6, 2, 'FBgn0000006', 'gene'),
+]
+
+
+@pytest.fixture
+def session():
+    return sessionmaker(bind=create_engine('sqlite:///symbols.db'))()
+
+
+def make_index(session, organism_ids=(1, 2)):
+    index = SymbolIndex()
+    index.database = session.get_bind().url.render_as_string(hide_password=True)
+    index.freshness = datetime(2026, 10, 1)
+    index.type_names = ('allele', 'gene')
+    index.organism_ids = organism_ids
+    index.build(ROWS)
+    return index
+
+
+def test_probe(session):
+    index = make_index(session)
+    assert index.size() == 6
+    assert index.probe(session, 1, 'gene', 'wg') == 1
+    assert index.probe(session, 2, 'gene', 'wg') == 6
+    assert index.probe(session, 1, 'allele', 'wg[1]') == 3
+    assert index.probe(session, 1, 'allele', 'dup') is None
+    assert index.probe(session, 1, 'allele', 'wg[2]') is None
+    assert index.probe(session, 1, 'gene', 'tin') is None
+    assert index.probe(session, 1, 'gene', 'wg-model') is None
+    assert (index.hits, index.misses) == (3, 4)
+    # Not covered: go to the db without counting a miss.
+    assert index.probe(session, 1, 'insertion', 'wg') is None
+    assert index.probe(session, 3, 'gene', 'wg') is None
+    other_session = sessionmaker(bind=create_engine('sqlite:///other.db'))()
+    assert index.probe(other_session, 1, 'gene', 'wg') is None
+    assert index.misses == 4
+    index.disable()
+    assert index.probe(session, 1, 'gene', 'wg') is None
+
+
+def test_load_saved_index(session, tmp_path, monkeypatch):
+    def query_symbols(session, cv_name, cvterm_name):
+        raise LookupError('Symbols queried.')
+    monkeypatch.setattr(symbol_index_module, 'get_cvterm', query_symbols)
+    monkeypatch.setattr(symbol_index_module, '_database_freshness', lambda session: datetime(2026, 10, 1))
+    filename = str(tmp_path / 'symbol_index.pickle')
+    make_index(session, organism_ids=(1,)).save(filename)
+    index = SymbolIndex()
+    # Same db, types and organisms, and no db changes since: loaded from the file, with no symbol query.
+    assert index.load(session, ['gene', 'allele'], organism_ids=[1], filename=filename) == 6
+    assert index.probe(session, 1, 'allele', 'wg[1]') == 3
+    assert index.probe(session, 2, 'gene', 'wg') is None
+    # The db has changed since: loaded from the db.
+    monkeypatch.setattr(symbol_index_module, '_database_freshness', lambda session: datetime(2026, 10, 2))
+    with pytest.raises(LookupError):
+        index.load(session, ['gene', 'allele'], organism_ids=[1], filename=filename)
+
+
+def test_disabled_by_commit_or_rollback(tmp_path):
+    session = sessionmaker(bind=create_engine('sqlite:///{}'.format(tmp_path / 'symbols.db')))()
+    other_session = sessionmaker(bind=create_engine('sqlite:///{}'.format(tmp_path / 'other.db')))()
+    CACHE_MANAGER.bind(other_session)
+    CACHE_MANAGER.bind(session)
+    SYMBOL_INDEX.__dict__.update(make_index(session).__dict__)
+    try:
+        other_session.commit()
+        assert SYMBOL_INDEX.probe(session, 1, 'gene', 'wg') == 1
+        session.commit()
+        assert SYMBOL_INDEX.probe(session, 1, 'gene', 'wg') is None
+        SYMBOL_INDEX.__dict__.update(make_index(session).__dict__)
+        session.execute(text('SELECT 1'))
+        # Savepoints do not count.
+        session.begin_nested()
+        session.rollback()
+        session.begin_nested()
+        session.commit()
+        assert SYMBOL_INDEX.size() == 6
+        session.rollback()
+        assert SYMBOL_INDEX.size() == 0
+    finally:
+        SYMBOL_INDEX.disable()
+
+
+def test_disabled_by_symbol_changes(session):
+    index = make_index(session)
+    index.flushed(session)
+    assert index.size() == 6
+    session.add(Synonym(name='wg', synonym_sgml='wg'))
+    index.flushed(session)
+    assert index.size() == 0
@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `harvdev_utils` package private_files.py file."""
+import os
+
+import pytest
+
+from harvdev_utils.general_functions import read_private_file
+
+
+def test_read_private_file(tmp_path):
+    filename = str(tmp_path / 'cache.pkl')
+    with open(filename, 'wb') as private_file:
+        private_file.write(b'data')
+    os.chmod(filename, 0o600)
+    assert read_private_file(filename) == b'data'
+    # Anyone in the group could have rewritten it.
+    os.chmod(filename, 0o660)
+    with pytest.raises(PermissionError):
+        read_private_file(filename)
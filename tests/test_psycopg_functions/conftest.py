@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Shared fixtures for the psycopg_functions tests."""
+from types import SimpleNamespace
+
+import psycopg2
+import pytest
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS
+
+
+class FakeCursor(object):
+    """Minimal stand-in for a psycopg2 cursor (client-side or named), returning its connection's canned results."""
+
+    def __init__(self, connection, name=None):
+        self.connection = connection
+        self.name = name
+        self.itersize = None
+        self.results = []
+        self.position = 0
+        self.closed = False
+
+    def execute(self, sql, query_variable=None):
+        connection = self.connection
+        connection.executed.append(sql)
+        connection.query_variables.append(query_variable)
+        connection.info.transaction_status = TRANSACTION_STATUS_INTRANS
+        self.results = connection.results_for(sql)
+        self.position = 0
+
+    def _raise_next_error(self):
+        if self.connection.errors:
+            error = self.connection.errors.pop(0)
+            # A lost connection is closed; a cancelled query leaves it open.
+            if not isinstance(error, psycopg2.extensions.QueryCanceledError):
+                self.connection.closed = 2
+            raise error
+
+    def fetchone(self):
+        self._raise_next_error()
+        return self.results[0] if self.results else None
+
+    def fetchall(self):
+        self._raise_next_error()
+        return self.results
+
+    def fetchmany(self, size):
+        self._raise_next_error()
+        batch = self.results[self.position:self.position + size]
+        self.position += size
+        return batch
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def copy_expert(self, sql, file):
+        """Write the connection's "copy_text" in small chunks, as COPY output arrives."""
+        self.connection.executed.append(sql)
+        copy_text = self.connection.copy_text
+        for start in range(0, len(copy_text), 7):
+            file.write(copy_text[start:start + 7])
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection(object):
+    """Stand-in for a psycopg2 connection, recording the SQL executed and cursor names requested.
+
+    rows (list): The results of any query without a response.
+    responses (dict): SQL prefix => results, for queries starting with that prefix: e.g., {'EXPLAIN': [...]}.
+    errors (list): Exceptions for the next fetches to raise, in turn.
+    copy_text (str): The output of any "COPY ... TO STDOUT".
+    """
+
+    def __init__(self, rows=(), responses=None, errors=(), copy_text=''):
+        self.rows = list(rows)
+        self.responses = responses or {}
+        self.errors = list(errors)
+        self.copy_text = copy_text
+        self.autocommit = False
+        self.closed = 0
+        self.info = SimpleNamespace(transaction_status=TRANSACTION_STATUS_IDLE)
+        self.executed = []
+        self.query_variables = []
+        self.cursor_names = []
+
+    def results_for(self, sql):
+        for prefix, results in self.responses.items():
+            if sql.startswith(prefix):
+                return list(results)
+        return list(self.rows)
+
+    @property
+    def query_cnt(self):
+        return len(self.executed)
+
+    def cursor(self, name=None):
+        self.cursor_names.append(name)
+        return FakeCursor(self, name)
+
+    def rollback(self):
+        self.info.transaction_status = TRANSACTION_STATUS_IDLE
+
+
+@pytest.fixture
+def fake_connection():
+    """Return the FakeConnection class, to make connections with canned results."""
+    return FakeConnection
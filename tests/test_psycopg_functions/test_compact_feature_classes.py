@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `harvdev_utils` package compact_feature_classes.py file."""
+import pickle
+
+import pytest
+
+from harvdev_utils.psycopg_functions import COMPACT_CLASSES, CompactAllele, CompactGene
+
+ROW = (1, 1, 'wg', 'FBgn0000001', 'gene', False, False)
+UNIQUENAMES = {
+    'Feature': 'FBgn0000001', 'Allele': 'FBal0000001', 'Construct': 'FBtp0000001', 'Gene': 'FBgn0000001',
+    'SeqFeat': 'FBsf0000000001', 'Tool': 'FBto0000001'
+}
+
+
+@pytest.mark.parametrize('feature_class', list(COMPACT_CLASSES.keys()))
+def test_compact_class_has_same_attributes(feature_class):
+    uniquename = UNIQUENAMES[feature_class.__name__]
+    original = feature_class(1, 1, 'x', uniquename, 'x', False, False)
+    compact = COMPACT_CLASSES[feature_class](1, 1, 'x', uniquename, 'x', False, False)
+    assert not hasattr(compact, '__dict__')
+    for attribute, value in vars(original).items():
+        attribute = attribute.replace('_Feature__', '')
+        assert getattr(compact, attribute) == value
+
+
+def test_compact_validation():
+    with pytest.raises(TypeError):
+        CompactGene(1, 1, 'wg', 'FBal0000001', 'gene', False, False)
+    gene = CompactGene(*ROW)
+    with pytest.raises(TypeError):
+        gene.obsolete = 'f'
+    with pytest.raises(AttributeError):
+        gene.not_an_attribute = 1
+
+
+def test_compact_methods_and_pickling():
+    allele = CompactAllele(1, 1, 'wg[1]', 'FBal0000001', 'allele', False, False)
+    allele.symbol_sgml = 'wg<up>1</up>'
+    allele.get_agr_symbol_text()
+    assert allele.agr_symbol_text == 'wg<1>'
+    restored = pickle.loads(pickle.dumps(allele))
+    assert restored.agr_symbol_text == 'wg<1>'
+    assert restored.uniquename == 'FBal0000001'
+    assert restored.gene_id is None
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `harvdev_utils` package connection_pool.py file."""
+from types import SimpleNamespace
+
+import psycopg2
+import pytest
+from psycopg2.extensions import TRANSACTION_STATUS_INTRANS
+
+from harvdev_utils.psycopg_functions import (
+    SESSION_PROFILES, DbConnectionPool, begin_snapshot_transaction, export_snapshot, session_options
+)
+
+
+# Result of pg_export_snapshot().
+SNAPSHOT_RESPONSES = {'SELECT pg_export_snapshot': [('00000003-0000001B-1', )]}
+# Rows for other queries.
+ROWS = [('FBgn0000001', 'wg')]
+
+
+def test_export_snapshot(fake_connection):
+    conn = fake_connection(responses=SNAPSHOT_RESPONSES)
+    assert export_snapshot(conn) == '00000003-0000001B-1'
+    assert conn.executed == ['SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY;', 'SELECT pg_export_snapshot();']
+
+
+def test_begin_snapshot_transaction_checks_connection(fake_connection):
+    conn = fake_connection()
+    conn.autocommit = True
+    with pytest.raises(ValueError):
+        begin_snapshot_transaction(conn)
+    conn = fake_connection()
+    conn.info.transaction_status = TRANSACTION_STATUS_INTRANS
+    with pytest.raises(ValueError):
+        begin_snapshot_transaction(conn, '00000003-0000001B-1')
+
+
+def test_pooled_connections_use_snapshot(fake_connection):
+    conn = fake_connection()
+    conn_pool = DbConnectionPool('localhost', 'test_db', 'user', 'password')
+    conn_pool.pool = SimpleNamespace(getconn=lambda: conn, putconn=lambda conn, close=False: None)
+    conn_pool.use_snapshot('00000003-0000001B-1')
+    assert conn_pool.getconn() is conn
+    assert (conn.executed[-1], conn.query_variables[-1]) == ('SET TRANSACTION SNAPSHOT %s;', ('00000003-0000001B-1', ))
+    conn.rollback()
+    conn_pool.use_snapshot(None)
+    conn.executed = []
+    conn_pool.getconn()
+    assert conn.executed == ['SELECT 1;']
+
+
+def test_session_options():
+    options = session_options('bulk_read').split(' -c ')
+    assert options[0].startswith('-c ')
+    assert len(options) == len(SESSION_PROFILES['bulk_read'])
+    assert 'default_transaction_read_only=on' in options
+    with pytest.raises(ValueError):
+        session_options('turbo')
+
+
+class FakePool(object):
+    """Stands in for ThreadedConnectionPool, handing out the given connections in turn."""
+
+    def __init__(self, connections):
+        self.connections = list(connections)
+        self.returned = []
+
+    def getconn(self):
+        return self.connections.pop(0)
+
+    def putconn(self, conn, close=False):
+        self.returned.append((conn, close))
+
+
+def make_pool(connections, max_retries=3):
+    conn_pool = DbConnectionPool('localhost', 'test_db', 'user', 'password', max_retries=max_retries)
+    conn_pool.pool = FakePool(connections)
+    return conn_pool
+
+
+def test_getconn_replaces_broken_connection(fake_connection):
+    broken = fake_connection(ROWS)
+    broken.closed = 2
+    healthy = fake_connection(ROWS)
+    conn_pool = make_pool([broken, healthy])
+    assert conn_pool.getconn() is healthy
+    assert conn_pool.pool.returned == [(broken, True)]
+    assert conn_pool.reconnect_count == 1
+
+
+def test_run_query_retries_lost_connection(fake_connection):
+    lost = fake_connection(ROWS, errors=[psycopg2.OperationalError('server closed the connection unexpectedly')])
+    healthy = fake_connection(ROWS)
+    conn_pool = make_pool([lost, healthy])
+    assert conn_pool.run_query('SELECT * FROM feature;') == [('FBgn0000001', 'wg')]
+    assert conn_pool.pool.returned == [(lost, True), (healthy, False)]
+    assert conn_pool.reconnect_count == 1
+
+
+def test_run_query_gives_up_after_max_retries(fake_connection):
+    connections = [fake_connection(ROWS, errors=[psycopg2.InterfaceError('connection already closed')]) for i in range(2)]
+    conn_pool = make_pool(connections, max_retries=1)
+    with pytest.raises(psycopg2.InterfaceError):
+        conn_pool.run_query('SELECT * FROM feature;')
+    assert conn_pool.reconnect_count == 2
+
+
+def test_run_query_does_not_retry_cancelled_query(fake_connection):
+    cancelled = fake_connection(ROWS, errors=[psycopg2.extensions.QueryCanceledError('canceling statement due to statement timeout')])
+    conn_pool = make_pool([cancelled, fake_connection(ROWS)])
+    with pytest.raises(psycopg2.extensions.QueryCanceledError):
+        conn_pool.run_query('SELECT * FROM feature;')
+    # The connection is kept, and no other connection was tried.
+    assert conn_pool.pool.returned == [(cancelled, False)]
+    assert conn_pool.reconnect_count == 0
+
+
+def test_session_profiles_keep_idle_transactions():
+    # Report connections stay in an open transaction between queries: the server must not end it.
+    for settings in SESSION_PROFILES.values():
+        assert 'idle_in_transaction_session_timeout' not in settings
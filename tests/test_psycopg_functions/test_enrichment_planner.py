@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `harvdev_utils` package enrichment_planner.py file."""
+import threading
+import time
+import pytest
+
+from harvdev_utils.psycopg_functions import run_enrichment_plan
+
+
+class FakePool(object):
+    """Stand-in for DbConnectionPool: returns canned rows per query, slowest query first."""
+
+    maxconn = 4
+
+    def __init__(self, results):
+        self.results = results
+
+    def run_query(self, sql, query_variable='no_query'):
+        time.sleep(0.05 * (len(self.results) - list(self.results).index(sql)))
+        return self.results[sql]
+
+
+def test_enrichment_plan_merges_in_spec_order():
+    pool = FakePool({
+        'SELECT symbol FROM a;': [('FBgn0000001', 'wg')],
+        'SELECT synonym FROM b;': [('FBgn0000001', 'Wnt1'), ('FBgn0000001', 'Wg')],
+        'SELECT symbol FROM c;': [('FBgn0000001', 'wingless')],
+    })
+    specs = [
+        ('symbol', 'SELECT symbol FROM {};', ('a', ), 'unique'),
+        ('synonyms', 'SELECT synonym FROM b;', (), 'list'),
+        ('symbol', 'SELECT symbol FROM {};', ('c', ), 'unique'),
+    ]
+    data_dict = {'FBgn0000001': {}}
+    run_enrichment_plan(data_dict, pool, specs)
+    assert data_dict == {'FBgn0000001': {'symbol': 'wingless', 'synonyms': ['Wnt1', 'Wg']}}
+
+
+def test_enrichment_plan_rejects_bad_mode():
+    with pytest.raises(ValueError):
+        run_enrichment_plan({}, FakePool({}), [('symbol', 'SELECT 1;', (), 'unique_dict')])
+
+
+def test_enrichment_plan_failure_leaves_data_dict_unchanged():
+    pool = FakePool({
+        'SELECT symbol FROM a;': [('FBgn0000001', 'wg')],
+        'SELECT symbol FROM b;': [('FBgn0000001', 'wg'), ('FBgn0000001', 'Wnt1')],
+    })
+    specs = [
+        ('symbol', 'SELECT symbol FROM a;', (), 'unique'),
+        ('fullname', 'SELECT symbol FROM b;', (), 'unique'),
+    ]
+    data_dict = {'FBgn0000001': {}}
+    with pytest.raises(ValueError):
+        run_enrichment_plan(data_dict, pool, specs)
+    assert data_dict == {'FBgn0000001': {}}
+
+
+def test_enrichment_plan_workers_capped_at_pool_size():
+    class CountingPool(FakePool):
+        maxconn = 2
+        running = 0
+        most_running = 0
+
+        def run_query(self, sql, query_variable='no_query'):
+            with lock:
+                self.running += 1
+                self.most_running = max(self.most_running, self.running)
+            time.sleep(0.05)
+            with lock:
+                self.running -= 1
+            return self.results[sql]
+
+    lock = threading.Lock()
+    pool = CountingPool({'SELECT {};'.format(i): [] for i in range(6)})
+    specs = [('attribute_{}'.format(i), 'SELECT {};', (i, ), 'list') for i in range(6)]
+    run_enrichment_plan({}, pool, specs, max_workers=6)
+    assert pool.most_running == 2
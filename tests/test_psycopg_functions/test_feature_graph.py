@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `harvdev_utils` package feature_graph.py file."""
+import pytest
+
+from harvdev_utils.psycopg_functions import FeatureGraph, get_named_query, load_feature_graph
+
+# Alleles 1 and 2 associated_with insertion 10 (and allele 2 with construct 21); insertion 10 producedby construct 20.
+EDGES = [
+    (1, 10, 'associated_with', 'FBal0000001', 'FBti0000010'),
+    (2, 10, 'associated_with', 'FBal0000002', 'FBti0000010'),
+    (2, 21, 'associated_with', 'FBal0000002', 'FBtp0000021'),
+    (10, 20, 'producedby', 'FBti0000010', 'FBtp0000020'),
+]
+
+
+def test_one_hop_and_reverse():
+    graph = FeatureGraph(EDGES)
+    assert graph.edge_cnt == 4
+    assert graph.objects(2) == [10, 21]
+    assert graph.objects(2, 'producedby') == []
+    assert graph.subjects(10, 'associated_with') == [1, 2]
+    assert graph.subjects(99) == []
+    assert graph.feature_id('FBtp0000020') == 20
+    assert graph.uniquename(10) == 'FBti0000010'
+
+
+def test_two_hop():
+    graph = FeatureGraph(EDGES)
+    assert graph.two_hop(1, 'associated_with', 'producedby') == [20]
+    assert graph.two_hop(20, 'producedby', 'associated_with', reverse=True) == [1, 2]
+    assert graph.hop(1, [('associated_with', False), ('associated_with', True)]) == [1, 2]
+
+
+def test_uniquename_pairs():
+    graph = FeatureGraph(EDGES)
+    steps = [('associated_with', False)]
+    assert graph.uniquename_pairs(steps, r'^FBal[0-9]{7}$', r'^FBtp[0-9]{7}$') == [('FBal0000002', 'FBtp0000021')]
+    steps = [('associated_with', False), ('producedby', False)]
+    assert graph.uniquename_pairs(steps) == [('FBal0000001', 'FBtp0000020'), ('FBal0000002', 'FBtp0000020')]
+
+
+def test_uniquename_pairs_filters():
+    # As EDGES, with is_analysis and organism_id: insertion 11 is an analysis feature, construct 22 is not Dmel.
+    edges = [
+        (1, 10, 'associated_with', 'FBal0000001', 'FBti0000010', False, False, 1, 1),
+        (2, 11, 'associated_with', 'FBal0000002', 'FBti0000011', False, True, 1, 1),
+        (3, 30, 'associated_with', 'FBal0000003', 'FBtr0000030', False, False, 1, 1),
+        (10, 20, 'producedby', 'FBti0000010', 'FBtp0000020', False, False, 1, 1),
+        (11, 20, 'producedby', 'FBti0000011', 'FBtp0000020', True, False, 1, 1),
+        (30, 22, 'producedby', 'FBtr0000030', 'FBtp0000022', False, False, 1, 2),
+    ]
+    graph = FeatureGraph(edges)
+    steps = [('associated_with', False), ('producedby', False)]
+    assert len(graph.uniquename_pairs(steps)) == 3
+    # As indirect_rel_features.
+    assert graph.uniquename_pairs(steps, r'^FBal', r'^FBtp', intermediate_regexes=[r'^FBti'], exclude_analysis=True) == \
+        [('FBal0000001', 'FBtp0000020')]
+    # As rel_dmel_features_rev.
+    assert graph.uniquename_pairs([('producedby', True)], r'^FBtp', r'^FBt[ir]', end_organism_id=1) == \
+        [('FBtp0000020', 'FBti0000010'), ('FBtp0000020', 'FBti0000011'), ('FBtp0000022', 'FBtr0000030')]
+    assert graph.uniquename_pairs([('producedby', False)], r'^FBt[ir]', r'^FBtp', end_organism_id=1) == \
+        [('FBti0000010', 'FBtp0000020'), ('FBti0000011', 'FBtp0000020')]
+    with pytest.raises(ValueError):
+        FeatureGraph(EDGES).uniquename_pairs(steps, exclude_analysis=True)
+    with pytest.raises(ValueError):
+        graph.uniquename_pairs(steps, intermediate_regexes=[r'^FBti', r'^FBtp'])
+
+
+def test_load_feature_graph(fake_connection):
+    conn = fake_connection(EDGES)
+    graph = load_feature_graph(conn, ['associated_with', 'producedby'], itersize=3)
+    assert conn.query_variables == [{'rel_types': ['associated_with', 'producedby']}]
+    assert get_named_query('feature_relationships_by_type').param_names == ['rel_types']
+    assert graph.two_hop(2, 'associated_with', 'producedby') == [20]
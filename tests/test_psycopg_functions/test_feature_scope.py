@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `harvdev_utils` package feature_scope.py file."""
+import pytest
+
+from harvdev_utils.psycopg_functions import load_feature_scope_table, scope_sql_query, rel_features
+
+
+def test_scope_sql_query():
+    sql = "SELECT f.uniquename FROM feature f JOIN featureprop fp ON fp.feature_id = f.feature_id UNION SELECT f.uniquename FROM feature f;"
+    scoped = scope_sql_query(sql, 'my_scope')
+    assert scoped.count('FROM my_scope my_scope_f JOIN feature f ON f.feature_id = my_scope_f.feature_id') == 2
+
+
+def test_scope_sql_query_alias():
+    scoped = scope_sql_query(rel_features, alias='s')
+    assert 'FROM harvdev_feature_scope harvdev_feature_scope_s JOIN feature s ON s.feature_id' in scoped
+    assert 'JOIN feature o ON o.feature_id = fr.object_id' in scoped
+
+
+def test_scope_sql_query_no_alias():
+    with pytest.raises(ValueError):
+        scope_sql_query(rel_features, alias='f')
+
+
+def test_load_feature_scope_table_read_only(fake_connection):
+    conn = fake_connection(responses={'SHOW transaction_read_only': [('on', )]})
+    with pytest.raises(ValueError, match='read-only'):
+        load_feature_scope_table(conn, [1, 2])
+    assert conn.executed == ['SHOW transaction_read_only;']
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `harvdev_utils` package feature_snapshot.py file."""
+import pytest
+
+from harvdev_utils.psycopg_functions import FeatureSnapshot, Gene, CompactGene, write_feature_snapshot
+
+
+def make_genes(gene_class):
+    data_dict = {}
+    for feature_id, uniquename, symbol in [(2, 'FBgn0284084', 'wg'), (1, 'FBgn0000490', 'dpp'), (3, 'FBgn0001234', 'Hsαβ')]:
+        gene = gene_class(feature_id, 1, symbol, uniquename, 'gene', False, False)
+        gene.symbol_sgml = symbol
+        gene.symbol_synonym_list = [symbol, symbol.upper()]
+        gene.all_synonym_set = {symbol, 'x' + symbol}
+        data_dict[uniquename] = gene
+    data_dict['FBgn0000490'].secondary_id_list = []
+    return data_dict
+
+
+@pytest.mark.parametrize('gene_class', [Gene, CompactGene])
+def test_round_trip(tmp_path, gene_class):
+    filename = str(tmp_path / 'FBgn_snapshot.fbs')
+    write_feature_snapshot(make_genes(gene_class), filename, database='fb_2024_06')
+    with FeatureSnapshot(filename) as genes:
+        assert genes.feature_class == 'Gene' and genes.database == 'fb_2024_06'
+        assert list(genes.keys()) == ['FBgn0000490', 'FBgn0001234', 'FBgn0284084']
+        wg = genes['FBgn0284084']
+        assert (wg.feature_id, wg.symbol_sgml, wg.obsolete) == (2, 'wg', False)
+        assert wg.symbol_synonym_list == ['wg', 'WG']
+        assert wg.all_synonym_set == {'wg', 'xwg'}
+        assert wg.secondary_id_list is None
+        assert genes['FBgn0000490'].secondary_id_list == []
+        assert genes['FBgn0001234'].symbol_sgml == 'Hsαβ'
+        assert genes.get('FBgn9999999') is None and 'FBgn0000001' not in genes
+        with pytest.raises(AttributeError):
+            wg.symbol_sgml = 'Wnt1'
+        # Attributes of the objects that were all None (so not stored) are None; unknown names are errors.
+        assert 'fullname_sgml' not in genes.attributes and wg.fullname_sgml is None
+        assert wg.data_warnings is None
+        with pytest.raises(AttributeError):
+            wg.no_such_attribute
+        gene = wg.materialize()
+        assert isinstance(gene, Gene) and gene.uniquename == 'FBgn0284084' and gene.all_synonym_set == {'wg', 'xwg'}
+
+
+def test_bad_file(tmp_path):
+    filename = tmp_path / 'not_a_snapshot.fbs'
+    filename.write_bytes(b'FBgn0284084\twg\n')
+    with pytest.raises(ValueError):
+        FeatureSnapshot(str(filename))
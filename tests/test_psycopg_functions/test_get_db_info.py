@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `harvdev_utils` package get_db_info.py file."""
+import pytest
+
+from harvdev_utils.psycopg_functions import (
+    add_list_info, add_synonym_and_id_info, add_unique_info, check_unique_results_stream, copy_query, get_features_by_uname_regex,
+    merge_list_info, merge_unique_info, parse_copy_bool
+)
+
+
+def test_unique_stream_passes_rows():
+    rows = [('FBgn0000001', 'a'), ('FBgn0000002', 'b')]
+    assert list(check_unique_results_stream(rows)) == rows
+
+
+def test_unique_stream_raises_on_duplicate():
+    rows = [('FBgn0000001', 'a'), ('FBgn0000001', 'b')]
+    with pytest.raises(ValueError):
+        list(check_unique_results_stream(rows))
+
+
+def test_features_streamed_with_named_cursor(fake_connection):
+    rows = [(1, 1, 'wg', 'FBgn0000001', 'gene', False, False), (2, 1, 'hh', 'FBgn0000002', 'gene', False, False)]
+    conn = fake_connection(rows)
+    feature_dict = get_features_by_uname_regex(conn, '^FBgn[0-9]{7}$', itersize=1)
+    assert sorted(feature_dict.keys()) == ['FBgn0000001', 'FBgn0000002']
+    assert conn.cursor_names[0] is not None
+
+
+@pytest.mark.parametrize('itersize', [None, 1])
+def test_add_unique_info(fake_connection, itersize):
+    data_dict = {'FBgn0000001': {}, 'FBgn0000002': {}}
+    conn = fake_connection([('FBgn0000001', 'wg'), ('FBgn0000003', 'hh')])
+    add_unique_info(data_dict, 'symbol', conn, 'SELECT {};', 'x', itersize=itersize)
+    assert data_dict == {'FBgn0000001': {'symbol': 'wg'}, 'FBgn0000002': {}}
+
+
+@pytest.mark.parametrize('itersize', [None, 1])
+def test_add_list_info(fake_connection, itersize):
+    data_dict = {'FBgn0000001': {}, 'FBgn0000002': {}}
+    conn = fake_connection([('FBgn0000001', 'wg'), ('FBgn0000001', 'Wnt1')])
+    add_list_info(data_dict, 'synonyms', conn, 'SELECT 1;', itersize=itersize)
+    assert data_dict == {'FBgn0000001': {'synonyms': ['wg', 'Wnt1']}, 'FBgn0000002': {'synonyms': []}}
+
+
+def test_merge_list_info_streamed_rows_merged_as_read():
+    data_dict = {'FBgn0000001': {}}
+
+    def rows():
+        yield ('FBgn0000001', 'wg')
+        # The first row is merged before the next is fetched.
+        assert data_dict['FBgn0000001']['synonyms'] == ['wg']
+        yield ('FBgn0000001', 'Wnt1')
+
+    merge_list_info(data_dict, 'synonyms', rows(), streamed=True)
+    assert data_dict == {'FBgn0000001': {'synonyms': ['wg', 'Wnt1']}}
+
+
+def test_merge_unique_info_streamed_duplicate_leaves_data_dict_unchanged():
+    data_dict = {'FBgn0000001': {}, 'FBgn0000002': {}}
+    rows = (i for i in [('FBgn0000001', 'wg'), ('FBgn0000002', 'Wnt1'), ('FBgn0000001', 'Wg')])
+    with pytest.raises(ValueError):
+        merge_unique_info(data_dict, 'symbol', rows, streamed=True)
+    assert data_dict == {'FBgn0000001': {}, 'FBgn0000002': {}}
+
+
+def test_add_synonym_and_id_info(fake_connection):
+    data_dict = {'FBgn0000001': {}, 'FBgn0000002': {}}
+    conn = fake_connection([
+        ('FBgn0000001', ['wg'], ['wingless'], ['Wnt-1'], ['Wnt1', 'Wnt-1'], None, None, ['FBgn0000009']),
+        ('FBgn0000002', None, None, None, None, None, None, None),
+    ])
+    add_synonym_and_id_info(data_dict, conn, '^FBgn[0-9]{7}$', '^FBgn[0-9]{7}$')
+    assert data_dict['FBgn0000001'] == {
+        'symbol_sgml': 'wg',
+        'fullname_sgml': 'wingless',
+        'symbol_synonym_list': ['Wnt-1', 'Wnt1'],
+        'fullname_synonym_list': [],
+        'secondary_id_list': ['FBgn0000009'],
+    }
+    assert data_dict['FBgn0000002'] == {'symbol_synonym_list': [], 'fullname_synonym_list': [], 'secondary_id_list': []}
+
+
+def test_add_synonym_and_id_info_many_current_symbols(fake_connection):
+    conn = fake_connection([('FBgn0000001', ['wg', 'Wg'], None, None, None, None, None, None)])
+    with pytest.raises(ValueError):
+        add_synonym_and_id_info({'FBgn0000001': {}}, conn, '^FBgn[0-9]{7}$', '^FBgn[0-9]{7}$')
+
+
+def test_copy_query_parses_rows(fake_connection):
+    conn = fake_connection(copy_text='1\tw\\tg\tt\n2\t\\N\tf\n')
+    assert copy_query('SELECT a, b, c FROM x;', conn, converters=[int, None, parse_copy_bool]) == [(1, 'w\tg', True), (2, None, False)]
+    assert conn.executed == ['COPY (SELECT a, b, c FROM x) TO STDOUT']
+
+
+def test_add_list_info_via_copy(fake_connection):
+    data_dict = {'FBgn0000001': {}}
+    conn = fake_connection(copy_text='FBgn0000001\twg\nFBgn0000001\tWnt1\n')
+    add_list_info(data_dict, 'synonyms', conn, 'SELECT 1;', use_copy=True)
+    assert data_dict == {'FBgn0000001': {'synonyms': ['wg', 'Wnt1']}}
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `harvdev_utils` package incremental_export.py file."""
+import datetime
+
+from harvdev_utils.psycopg_functions import (
+    Reference, content_hash, find_changed_pubs, load_export_snapshot, save_export_snapshot, update_export_snapshot
+)
+
+TIME_1 = datetime.datetime(2023, 1, 1, 12, 0)
+TIME_2 = datetime.datetime(2023, 2, 1, 12, 0)
+
+
+def make_reference(pub_id, title):
+    uniquename = 'FBrf{:07d}'.format(pub_id)
+    reference = Reference(pub_id, title, None, '1', None, '2', '2000', '1--2', 'Smith, 2000', 1, False, None, None, uniquename)
+    reference.pub_type = 'paper'
+    reference.pub_timelastmodified = TIME_1
+    return reference
+
+
+def test_content_hash_is_key_order_independent():
+    assert content_hash({'a': 1, 'b': [1, 2]}) == content_hash({'b': [1, 2], 'a': 1})
+    assert content_hash({'a': 1}) != content_hash({'a': 2})
+
+
+def test_incremental_export_round_trip(tmp_path):
+    snapshot_filename = str(tmp_path / 'reference_snapshot.json.gz')
+    # First run: everything is new.
+    snapshot = load_export_snapshot(snapshot_filename)
+    timestamps = {1: TIME_1, 2: TIME_1, 3: TIME_1}
+    changed, removed = find_changed_pubs(timestamps, snapshot)
+    assert changed == {1, 2, 3} and removed == set()
+    exports = update_export_snapshot(snapshot, [make_reference(i, 'Title {}'.format(i)) for i in changed], timestamps, removed)
+    assert [i['agr_mod_id'] for i in exports] == ['FB:FBrf0000001', 'FB:FBrf0000002', 'FB:FBrf0000003']
+    save_export_snapshot(snapshot, snapshot_filename)
+
+    # Second run: pub 2 changed, pub 3 gone, pub 4 new.
+    snapshot = load_export_snapshot(snapshot_filename)
+    timestamps = {1: TIME_1, 2: TIME_2, 4: TIME_2}
+    changed, removed = find_changed_pubs(timestamps, snapshot)
+    assert changed == {2, 4} and removed == {3}
+    exports = update_export_snapshot(snapshot, [make_reference(i, 'New title {}'.format(i)) for i in changed], timestamps, removed)
+    assert [(i['pub_id'], i['agr_title']) for i in exports] == [(1, 'Title 1'), (2, 'New title 2'), (4, 'New title 4')]
+    assert snapshot[2]['timelastmodified'] == TIME_2.isoformat()
+
+
+def test_unaudited_pub_exported_once():
+    # Pubs with no audit_chado rows get the 'epoch' timestamp from get_pub_timelastmodified().
+    epoch = datetime.datetime(1970, 1, 1)
+    snapshot = {}
+    changed, removed = find_changed_pubs({5: epoch}, snapshot)
+    assert changed == {5}
+    update_export_snapshot(snapshot, [make_reference(5, 'Title 5')], {5: epoch}, removed)
+    changed, removed = find_changed_pubs({5: epoch}, snapshot)
+    assert changed == set() and removed == set()
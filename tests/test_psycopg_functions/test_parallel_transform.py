@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `harvdev_utils` package parallel_transform.py file."""
+import logging
+
+import pytest
+
+from harvdev_utils.psycopg_functions import Allele, Gene, run_transform_stage
+
+
+def make_genes():
+    genes = {}
+    for i in range(1, 6):
+        gene = Gene(i, 1, 'g{}'.format(i), 'FBgn{:07d}'.format(i), 'gene', False, False)
+        gene.hgnc_id_list = ['HGNC:{}'.format(i)] if i % 2 else []
+        gene.mod_id_list = []
+        genes[gene.uniquename] = gene
+    return genes
+
+
+def agr_gene_id(gene):
+    return gene.agr_gene_id
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_transform_stage_processes_objects(max_workers):
+    genes = make_genes()
+    processed = run_transform_stage(genes, ['pick_gene_id'], chunk_size=2, max_workers=max_workers)
+    assert processed is genes
+    assert [i.agr_gene_id for i in genes.values()] == ['HGNC:1', 'FB:FBgn0000002', 'HGNC:3', 'FB:FBgn0000004', 'HGNC:5']
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_transform_stage_outputs_and_replays_warnings(caplog, max_workers):
+    genes = make_genes()
+    genes['FBgn0000002'].mod_id_list = None
+    with caplog.at_level(logging.WARNING):
+        outputs = run_transform_stage(genes, ['pick_gene_id'], chunk_size=2, max_workers=max_workers, output_function=agr_gene_id)
+    assert list(outputs.keys()) == list(genes.keys())
+    assert outputs['FBgn0000001'] == 'HGNC:1'
+    assert genes['FBgn0000001'].agr_gene_id is None
+    assert 'Gene FBgn0000002 should have "mod_id_list" to pick an ID.' in caplog.messages
+
+
+def test_transform_stage_raises_after_all_chunks():
+    alleles = {}
+    for i in range(1, 4):
+        allele = Allele(i, 1, 'a{}'.format(i), 'FBal{:07d}'.format(i), 'allele', False, False)
+        allele.genus, allele.org_abbr = 'Drosophila', 'Dmel'
+        allele.mut_origin, allele.fbtp_list, allele.fbti_list = [], [], []
+        # The last lacks "gene_for_agr_export" info, so "is_for_agr_export()" raises ValueError.
+        allele.gene_for_agr_export = True if i < 3 else None
+        alleles[allele.uniquename] = allele
+    with pytest.raises(ValueError):
+        run_transform_stage(alleles, ['is_for_agr_export'], chunk_size=1, max_workers=2)
+
+
+def test_transform_stage_writes_worker_warnings_once(tmp_path):
+    # A handler on a non-root logger, as inherited by forked workers.
+    log_file = tmp_path / 'transform.log'
+    handler = logging.FileHandler(str(log_file))
+    gene_log = logging.getLogger('harvdev_utils.psycopg_functions.fb_feature_classes')
+    gene_log.addHandler(handler)
+    try:
+        genes = make_genes()
+        genes['FBgn0000002'].mod_id_list = None
+        run_transform_stage(genes, ['pick_gene_id'], chunk_size=2, max_workers=2)
+    finally:
+        gene_log.removeHandler(handler)
+        handler.close()
+    assert log_file.read_text().count('Gene FBgn0000002 should have "mod_id_list"') == 1
+
+
+def bad_output(gene):
+    if gene.uniquename == 'FBgn0000003':
+        raise ValueError('No output for {}.'.format(gene.uniquename))
+    return gene.agr_gene_id
+
+
+def test_transform_stage_output_failure_is_per_object(caplog):
+    genes = make_genes()
+    with pytest.raises(ValueError):
+        run_transform_stage(genes, ['pick_gene_id'], chunk_size=5, max_workers=2, output_function=bad_output)
+    # Only the bad object failed, not the rest of its chunk.
+    assert [i for i in caplog.messages if i.startswith('Processing of')] == ['Processing of FBgn0000003 failed: No output for FBgn0000003.']
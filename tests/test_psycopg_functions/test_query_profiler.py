@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `harvdev_utils` package query_profiler.py file."""
+import json
+
+import pytest
+
+from harvdev_utils.psycopg_functions import PROFILER, add_list_info, add_unique_info
+
+
+# A fake plan for EXPLAIN queries.
+EXPLAIN_RESPONSES = {'EXPLAIN': [('Seq Scan on feature f',), ('Execution Time: 1.0 ms',)]}
+
+
+@pytest.fixture
+def profiler():
+    PROFILER.reset()
+    PROFILER.enable()
+    yield PROFILER
+    PROFILER.disable()
+    PROFILER.reset()
+
+
+@pytest.mark.parametrize('itersize', [None, 1])
+def test_profile_labels_rows_and_bytes(profiler, fake_connection, itersize):
+    conn = fake_connection([('FBgn0000001', 'wg'), ('FBgn0000001', 'Wnt1')])
+    add_list_info({'FBgn0000001': {}}, 'synonyms', conn, 'SELECT 1;', itersize=itersize)
+    summary = profiler.summarize()
+    assert [i['label'] for i in summary] == ['synonyms']
+    assert summary[0]['calls'] == 1
+    assert summary[0]['rows'] == 2
+    assert summary[0]['bytes'] == len('FBgn0000001wgFBgn0000001Wnt1')
+    assert summary[0]['merge_seconds'] >= 0.0
+
+
+def test_profile_explain_once_per_label(profiler, fake_connection):
+    profiler.enable(explain=True)
+    conn = fake_connection([('FBgn0000001', 'wg')], responses=EXPLAIN_RESPONSES)
+    for _ in range(2):
+        add_unique_info({'FBgn0000001': {}}, 'symbol', conn, 'SELECT 1;')
+    explains = [i for i in conn.executed if i.startswith('EXPLAIN (ANALYZE, BUFFERS)')]
+    assert len(explains) == 1
+    assert 'SAVEPOINT harvdev_explain' in conn.executed
+    assert profiler.summarize()[0]['explain'].startswith('Seq Scan')
+
+
+def test_write_report(profiler, fake_connection, tmp_path):
+    add_unique_info({'FBgn0000001': {}}, 'symbol', fake_connection([('FBgn0000001', 'wg')]), 'SELECT 1;')
+    add_list_info({'FBgn0000001': {}}, 'pubs', fake_connection([('FBgn0000001', 'FBrf0000001')] * 50), 'SELECT 2;')
+    tsv_filename = str(tmp_path / 'profile.tsv')
+    profiler.write_report(tsv_filename)
+    lines = open(tsv_filename).read().splitlines()
+    assert lines[0].split('\t')[0:2] == ['label', 'calls']
+    assert sorted(i.split('\t')[0] for i in lines[1:]) == ['pubs', 'symbol']
+    json_filename = str(tmp_path / 'profile.json')
+    profiler.write_report(json_filename)
+    assert {i['label'] for i in json.load(open(json_filename))} == {'pubs', 'symbol'}
+
+
+def test_disabled_profiler_records_nothing(fake_connection):
+    PROFILER.reset()
+    add_unique_info({'FBgn0000001': {}}, 'symbol', fake_connection([('FBgn0000001', 'wg')]), 'SELECT 1;')
+    assert PROFILER.records == []
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `harvdev_utils` package query_registry.py file."""
+import pytest
+
+from harvdev_utils.psycopg_functions import NamedQuery, get_named_query, run_named_query
+
+
+def test_from_format_template():
+    query = NamedQuery.from_format_template('test', "SELECT 1 WHERE a ~ '{}' AND b LIKE 'x%' AND c ~ '{}';", ('regex', 'regex'))
+    assert query.sql == "SELECT 1 WHERE a ~ %(regex)s AND b LIKE 'x%%' AND c ~ %(regex)s;"
+    assert query.param_names == ['regex']
+    assert query.prepare_sql() == "PREPARE harvdev_test AS SELECT 1 WHERE a ~ $1 AND b LIKE 'x%' AND c ~ $1;"
+
+
+def test_from_format_template_count_mismatch():
+    with pytest.raises(ValueError):
+        NamedQuery.from_format_template('test', "SELECT '{}', '{}';", ('only_one', ))
+
+
+def test_registered_query_params():
+    assert get_named_query('rel_features').param_names == ['subject_regex', 'object_regex', 'rel_type']
+
+
+def test_run_named_query_binds_values(fake_connection):
+    conn = fake_connection()
+    params = {'uname_regex': r"^FBgn[0-9]{7}$", 'accession_regex': "O'Brien"}
+    run_named_query(conn, 'feat_secondary_fbids', params)
+    sql, query_variable = conn.executed[0], conn.query_variables[0]
+    assert '%(accession_regex)s' in sql
+    assert query_variable == params
+
+
+def test_run_named_query_prepares_once(fake_connection):
+    conn = fake_connection()
+    for _ in range(2):
+        run_named_query(conn, 'current_feat_symbol_sgmls', {'uname_regex': r'^FBal[0-9]{7}$'}, prepared=True)
+    statements = conn.executed
+    assert len([i for i in statements if i.startswith('PREPARE')]) == 1
+    assert statements[-1] == 'EXECUTE harvdev_current_feat_symbol_sgmls (%(uname_regex)s);'
+
+
+def test_run_named_query_missing_param(fake_connection):
+    with pytest.raises(KeyError):
+        run_named_query(fake_connection(), 'featureprops', {'uname_regex': r'^FBgn[0-9]{7}$'})
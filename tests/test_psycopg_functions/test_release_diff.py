@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `harvdev_utils` package release_diff.py file."""
+from harvdev_utils.psycopg_functions import (
+    Allele, CompactAllele, content_hash, diff_feature_dict, feature_export_dict, load_hash_manifest, save_hash_manifest
+)
+
+
+def make_alleles(allele_class, symbols):
+    data_dict = {}
+    for i, symbol in enumerate(symbols):
+        uniquename = 'FBal{:07d}'.format(i + 1)
+        data_dict[uniquename] = allele_class(i + 1, 1, symbol, uniquename, 'allele', False, False)
+        data_dict[uniquename].symbol_sgml = symbol
+        data_dict[uniquename].all_synonym_set = {symbol, symbol.upper()}
+    return data_dict
+
+
+def test_export_dicts_match_for_compact_objects():
+    allele = make_alleles(Allele, ['wg[1]'])['FBal0000001']
+    compact_allele = make_alleles(CompactAllele, ['wg[1]'])['FBal0000001']
+    allele.data_errors.append('Internal note.')
+    export_dict = feature_export_dict(allele)
+    assert export_dict['uniquename'] == 'FBal0000001'
+    assert 'feature_id' not in export_dict and 'data_errors' not in export_dict
+    assert export_dict == feature_export_dict(compact_allele)
+    assert content_hash(export_dict) == content_hash(feature_export_dict(compact_allele))
+
+
+def test_diff_feature_dict(tmp_path):
+    manifest_filename = str(tmp_path / 'FBal_hashes.json.gz')
+    diff, manifest = diff_feature_dict(make_alleles(Allele, ['wg[1]', 'wg[2]', 'wg[3]']), load_hash_manifest(manifest_filename), 'fb_2024_05')
+    assert len(diff['added']) == 3
+    save_hash_manifest(manifest, manifest_filename)
+    data_dict = make_alleles(CompactAllele, ['wg[1]', 'wg[2]'])
+    data_dict['FBal0000002'].symbol_sgml = 'wg[2a]'
+    diff, manifest = diff_feature_dict(data_dict, load_hash_manifest(manifest_filename), 'fb_2024_06')
+    assert diff['from_database'] == 'fb_2024_05'
+    assert diff['added'] == []
+    assert [i['uniquename'] for i in diff['changed']] == ['FBal0000002']
+    assert diff['removed'] == ['FBal0000003']
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `harvdev_utils` package result_cache.py file."""
+import os
+
+import pytest
+
+from harvdev_utils.psycopg_functions import RESULT_CACHE, QueryResultCache, query_db
+
+
+@pytest.fixture
+def result_cache(tmp_path):
+    RESULT_CACHE.enable(str(tmp_path), 'production_chado')
+    yield RESULT_CACHE
+    RESULT_CACHE.disable()
+    RESULT_CACHE._table_fingerprints = {}
+
+
+def test_query_db_uses_cache(result_cache, fake_connection):
+    conn = fake_connection([('FBgn0000001', 'wg')])
+    assert query_db(conn, 'SELECT  1;') == [('FBgn0000001', 'wg')]
+    assert query_db(conn, 'SELECT 1') == [('FBgn0000001', 'wg')]
+    assert conn.query_cnt == 1
+    query_db(conn, 'SELECT 1;', query_variable=('wg', ))
+    assert conn.query_cnt == 2
+    result_cache.invalidate()
+    query_db(conn, 'SELECT 1;')
+    assert conn.query_cnt == 3
+
+
+def test_key_depends_on_database_and_table_contents(tmp_path):
+    cache = QueryResultCache()
+    cache.enable(str(tmp_path), 'db_1')
+    key_1 = cache.make_key('SELECT * FROM scope_table')
+    cache.enable(str(tmp_path), 'db_2')
+    assert cache.make_key('SELECT * FROM scope_table') != key_1
+    cache.note_table_contents('scope_table', 'abc')
+    key_2 = cache.make_key('SELECT * FROM scope_table')
+    assert key_2 != cache.make_key('SELECT * FROM scope_table', mode='copy')
+    cache.note_table_contents('scope_table', 'def')
+    assert cache.make_key('SELECT * FROM scope_table') != key_2
+    assert cache.make_key('SELECT 1') == cache.make_key('SELECT 1;')
+
+
+def test_eviction_removes_least_recently_used(tmp_path):
+    cache = QueryResultCache()
+    cache.enable(str(tmp_path), 'db_1')
+    rows = [(i, 'x' * 20) for i in range(200)]
+    cache.put('old', rows)
+    os.utime(os.path.join(str(tmp_path), 'db_1', 'old.pkl.z'), (1, 1))
+    size = os.path.getsize(os.path.join(str(tmp_path), 'db_1', 'old.pkl.z'))
+    cache.max_bytes = size + size // 2
+    cache.put('new', rows)
+    assert cache.get('old') is None
+    assert cache.get('new') == rows
+
+
+def test_put_scans_cache_only_when_over_limit(tmp_path, monkeypatch):
+    cache = QueryResultCache()
+    cache.enable(str(tmp_path), 'db_1')
+    rows = [(i, 'x' * 20) for i in range(200)]
+    scans = []
+    real_walk = os.walk
+    monkeypatch.setattr(os, 'walk', lambda path: scans.append(path) or real_walk(path))
+    cache.put('first', rows)
+    os.utime(os.path.join(str(tmp_path), 'db_1', 'first.pkl.z'), (1, 1))
+    size = os.path.getsize(os.path.join(str(tmp_path), 'db_1', 'first.pkl.z'))
+    cache.max_bytes = 3 * size
+    cache.put('second', rows)
+    cache.put('second', rows)
+    assert len(scans) == 1
+    cache.put('third', rows)
+    cache.put('fourth', rows)
+    assert len(scans) == 2
+    assert cache.get('first') is None
+    assert cache.get('fourth') == rows
+
+
+def test_results_writable_by_others_not_read(tmp_path):
+    cache = QueryResultCache()
+    cache.enable(str(tmp_path), 'db_1')
+    cache.put('shared', [(1, 'x')])
+    assert cache.get('shared') == [(1, 'x')]
+    os.chmod(os.path.join(str(tmp_path), 'db_1', 'shared.pkl.z'), 0o666)
+    assert cache.get('shared') is None
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `harvdev_utils` package row_constructors.py file and "from_rows()" bulk constructors."""
+import pytest
+
+from harvdev_utils.psycopg_functions import Allele, CompactGene, Cvterm, Gene, Pub, Reference, Resource
+
+PUB_ROW = [1, 'title', 'vtitle', '1', 'series', '2', '2000', '1--2', 'miniref', 5, False, 'publisher', 'place']
+
+
+@pytest.mark.parametrize('cls, rows', [
+    (Gene, [(1, 1, 'wg', 'FBgn0000001', 'gene', False, False), (2, 1, 'hh', 'FBgn0000002', 'gene', False, False)]),
+    (Pub, [tuple(PUB_ROW + ['multipub_1']), tuple([2] + PUB_ROW[1:] + ['unattributed'])]),
+    (Reference, [tuple(PUB_ROW + ['FBrf0000001']), tuple([2] + PUB_ROW[1:] + ['FBrf0000002'])]),
+    (Resource, [tuple(PUB_ROW + ['multipub_1']), tuple([2] + PUB_ROW[1:] + ['multipub_2'])]),
+    (Cvterm, [(1, 2, 'def', 3, 0, 1, 'term'), (4, 2, None, 5, 1, 0, 'other term')]),
+])
+def test_from_rows_matches_constructor(cls, rows):
+    objects = cls.from_rows(rows)
+    assert [vars(i) for i in objects] == [vars(cls(*row)) for row in rows]
+    assert all(type(i) is cls for i in objects)
+
+
+def test_from_rows_fresh_lists():
+    rows = [(1, 1, 'a', 'FBal0000001', 'allele', False, False), (2, 1, 'b', 'FBal0000002', 'allele', False, False)]
+    first, second = Allele.from_rows(rows)
+    first.data_errors.append('error')
+    assert second.data_errors == []
+
+
+def test_compact_from_rows():
+    genes = CompactGene.from_rows([(1, 1, 'wg', 'FBgn0000001', 'gene', False, False)])
+    assert genes[0].uniquename == 'FBgn0000001'
+    assert genes[0].data_warnings == []
+    assert genes[0].promoted_gene_type is None
+
+
+def test_from_rows_reports_all_bad_rows():
+    rows = [
+        (1, 1, 'wg', 'FBgn0000001', 'gene', False, False),
+        (2, 1, 'hh', 'FBal0000002', 'gene', False, False),
+        ('3', 1, 'dpp', 'FBgn0000003', 'gene', False, 'f'),
+    ]
+    for cls in (Gene, CompactGene):
+        with pytest.raises(TypeError) as excinfo:
+            cls.from_rows(rows)
+        message = str(excinfo.value)
+        assert 'from 2 bad rows' in message
+        assert 'row 1 ' in message and 'row 2 ' in message
+        assert '"feature_id" must be an integer, the "obsolete" value must be boolean' in message
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `harvdev_utils` package stage_checkpoint.py file."""
+import pytest
+
+from harvdev_utils.psycopg_functions import StageCheckpoints, CompactAllele
+
+
+def add_symbols(data):
+    for uniquename, allele in data.items():
+        allele.symbol_sgml = uniquename.lower()
+
+
+def make_stages(calls, fail_at=None):
+    def stage(name, function):
+        def run(data):
+            calls.append(name)
+            if name == fail_at:
+                raise RuntimeError('Stage {} failed.'.format(name))
+            return function(data)
+        return (name, run)
+    return [
+        stage('features', lambda data: {'FBal0000001': CompactAllele(1, 1, 'a', 'FBal0000001', 'allele', False, False)}),
+        stage('symbols', add_symbols),
+        stage('dump', lambda data: sorted(i.symbol_sgml for i in data.values())),
+    ]
+
+
+def test_resume_after_failure(tmp_path):
+    calls = []
+    checkpoints = StageCheckpoints(str(tmp_path), 'test_db', 'alleles')
+    with pytest.raises(RuntimeError):
+        checkpoints.run_stages(make_stages(calls, fail_at='dump'))
+    assert calls == ['features', 'symbols', 'dump']
+    calls = []
+    checkpoints = StageCheckpoints(str(tmp_path), 'test_db', 'alleles', resume=True)
+    assert checkpoints.completed_stages() == ['features', 'symbols']
+    assert checkpoints.run_stages(make_stages(calls)) == ['fbal0000001']
+    assert calls == ['dump']
+    # The run is done, so a new run starts from scratch, even with resume.
+    assert checkpoints.completed_stages() == []
+    calls = []
+    StageCheckpoints(str(tmp_path), 'test_db', 'alleles', resume=True).run_stages(make_stages(calls))
+    assert calls == ['features', 'symbols', 'dump']
+
+
+def test_checkpoints_cleared_without_resume(tmp_path):
+    with pytest.raises(RuntimeError):
+        StageCheckpoints(str(tmp_path), 'test_db', 'alleles').run_stages(make_stages([], fail_at='dump'))
+    calls = []
+    StageCheckpoints(str(tmp_path), 'test_db', 'alleles').run_stages(make_stages(calls))
+    assert calls == ['features', 'symbols', 'dump']
+
+
+def test_changed_stages_and_other_database(tmp_path):
+    with pytest.raises(RuntimeError):
+        StageCheckpoints(str(tmp_path), 'test_db', 'alleles').run_stages(make_stages([], fail_at='dump'))
+    calls = []
+    stages = make_stages(calls)
+    StageCheckpoints(str(tmp_path), 'other_db', 'alleles', resume=True).run_stages(stages)
+    assert calls == ['features', 'symbols', 'dump']
+    calls.clear()
+    StageCheckpoints(str(tmp_path), 'test_db', 'alleles', resume=True).run_stages([stages[0], ('new', lambda data: None), stages[2]])
+    assert calls == ['dump']
+
+
+def test_disabled_checkpoints_just_run():
+    calls = []
+    checkpoints = StageCheckpoints(None, 'test_db', 'alleles')
+    assert checkpoints.run_stages(make_stages(calls)) == ['fbal0000001']
+    assert calls == ['features', 'symbols', 'dump']
+    assert checkpoints.completed_stages() == []
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `harvdev_utils` package uniquename_regex.py file."""
+import pytest
+
+from harvdev_utils.psycopg_functions import (
+    parse_uniquename_regex, rewrite_uniquename_regex_filters, rewrite_uniquename_regex_params
+)
+
+regex_bounds = {
+    r'^FBgn[0-9]{7}$': (['FBgn'], 11, 11),
+    r'^FBsf[0-9]{10}$': (['FBsf'], 14, 14),
+    r'^FB(al|ab|ti|tp)[0-9]{7}$': (['FBal', 'FBab', 'FBti', 'FBtp'], 11, 11),
+    r'^FB[a-z]{2}[0-9]{7,10}$': (['FB'], 11, 14),
+}
+
+
+@pytest.mark.parametrize('regex', regex_bounds.keys())
+def test_parse_uniquename_regex(regex):
+    bounds = parse_uniquename_regex(regex)
+    assert (bounds.prefixes, bounds.min_length, bounds.max_length) == regex_bounds[regex]
+
+
+@pytest.mark.parametrize('regex', [r'^FBgn', r'FBgn[0-9]{7}$', r'^FB(al|abc)[0-9]{7}$', r'^FBgn[0-9]+$', r'^FBbz[0-9]{7}$'])
+def test_unrecognized_regex(regex):
+    assert parse_uniquename_regex(regex) is None
+
+
+def test_rewrite_filters():
+    sql = "SELECT 1 FROM feature s WHERE s.uniquename ~ '^FBgn[0-9]{7}$' and o.uniquename ~ '^FBgn' and s.name ~ '^FBgn[0-9]{7}$';"
+    expected = ("SELECT 1 FROM feature s WHERE (s.uniquename >= 'FBgn' AND s.uniquename < 'FBgo' AND length(s.uniquename) = 11 AND "
+                "s.uniquename ~ '^FBgn[0-9]{7}$') and o.uniquename ~ '^FBgn' and s.name ~ '^FBgn[0-9]{7}$';")
+    assert rewrite_uniquename_regex_filters(sql) == expected
+
+
+def test_rewrite_params():
+    sql = "SELECT 1 FROM feature f WHERE f.uniquename ~ %(uname_regex)s;"
+    expected = ("SELECT 1 FROM feature f WHERE (f.uniquename >= 'FBal' AND f.uniquename < 'FBam' AND length(f.uniquename) = 11 AND "
+                "f.uniquename ~ %(uname_regex)s);")
+    assert rewrite_uniquename_regex_params(sql, {'uname_regex': r'^FBal[0-9]{7}$'}) == expected
+    assert rewrite_uniquename_regex_params(sql, {'uname_regex': r'^FBal'}) == sql